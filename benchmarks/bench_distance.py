@@ -0,0 +1,42 @@
+"""
+Compare the per-shop geodesic loop with the batch distance engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_distance [number_of_shops]
+"""
+import random
+import sys
+import time
+
+from recipe_mapper.distance import batch_distances, geodesic_km
+
+
+def main():
+    shop_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    user_location = (51.5074, -0.1278)
+    radius_km = 10.0
+    # Shops spread over a ~150 km wide region around the user
+    latitudes = [user_location[0] + rng.uniform(-0.7, 0.7) for _ in range(shop_count)]
+    longitudes = [user_location[1] + rng.uniform(-1.1, 1.1) for _ in range(shop_count)]
+
+    start = time.perf_counter()
+    loop_inside = [geodesic_km(user_location, (lat, lon)) <= radius_km
+                   for lat, lon in zip(latitudes, longitudes)]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_inside = (batch_distances(user_location, latitudes, longitudes, radius_km) <= radius_km).tolist()
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(loop_inside, batch_inside))
+    print(f"Shops: {shop_count}, within {radius_km} km: {sum(loop_inside)}")
+    print(f"geodesic loop:   {loop_seconds * 1000:10.1f} ms")
+    print(f"batch_distances: {batch_seconds * 1000:10.1f} ms")
+    print(f"speedup: {loop_seconds / batch_seconds:.0f}x, mismatched decisions: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Import time of the headless core, measured in fresh interpreters.
+
+The core (database, queries and what they pull in) must import in under
+IMPORT_BUDGET_MS and must not load the GUI or the heavy optional dependencies;
+those are imported on first use. Exits with status 1 when either check fails.
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time [runs]
+"""
+import json
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = 50.0
+CORE_MODULES = ['recipe_mapper.database', 'recipe_mapper.queries']
+HEAVY_MODULES = ['numpy', 'geopy', 'tqdm', 'reportlab', 'geocoder', 'tkinter']
+
+_PROBE = f'''
+import json, sys, time
+start = time.perf_counter()
+{'; '.join(f'import {module}' for module in CORE_MODULES)}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps([elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))
+'''
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _PROBE], capture_output=True, text=True, check=True).stdout
+        elapsed, heavy = json.loads(output)
+        timings.append(elapsed)
+        loaded.update(heavy)
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print(f"import {', '.join(CORE_MODULES)}: median {median:.1f} ms, "
+          f"min {timings[0]:.1f} ms, max {timings[-1]:.1f} ms over {runs} runs (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    print(f"heavy modules loaded at import: {', '.join(sorted(loaded)) or 'none'}")
+    if median > IMPORT_BUDGET_MS or loaded:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
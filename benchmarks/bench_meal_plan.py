@@ -0,0 +1,61 @@
+"""
+One aggregated meal-plan query vs one find_nearby_shops_for_recipe() call per
+recipe in the plan, on a synthetic city of shops in a temporary database.
+
+Run from the repository root:
+    python -m benchmarks.bench_meal_plan [recipes_in_plan] [shops] [repeats]
+"""
+import random
+import sys
+import tempfile
+import time
+
+from recipe_mapper import queries
+from recipe_mapper.database import Database
+
+INGREDIENT_COUNT = 120
+INGREDIENTS_PER_RECIPE = 8
+ITEMS_PER_SHOP = 60
+
+
+def main():
+    plan_size = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    shop_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    rng = random.Random(18)
+    user_location = (51.5074, -0.1278)
+    ingredients = [f"ingredient {i}" for i in range(INGREDIENT_COUNT)]
+
+    with tempfile.TemporaryDirectory() as directory, Database.in_directory(directory) as db:
+        recipe_ids = [db.add_recipe(f"recipe {r}", [
+            {'name': name, 'quantity': rng.choice([1, 2, 100, 250]), 'unit': rng.choice(['g', 'ml', ''])}
+            for name in rng.sample(ingredients, INGREDIENTS_PER_RECIPE)
+        ]) for r in range(plan_size)]
+        for s in range(shop_count):
+            db.add_shop(f"shop {s}", user_location[0] + rng.uniform(-0.1, 0.1),
+                        user_location[1] + rng.uniform(-0.15, 0.15), [
+                            {'name': name, 'quantity': rng.choice([1000, 5000]), 'unit': rng.choice(['g', 'ml', ''])}
+                            for name in rng.sample(ingredients, ITEMS_PER_SHOP)
+                        ])
+        meal_plan = [(recipe_id, rng.choice([1, 2, 4])) for recipe_id in recipe_ids]
+
+        separate, aggregated = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results = [queries.find_nearby_shops_for_recipe(db, recipe_id, user_location, 10)
+                       for recipe_id, _ in meal_plan]
+            separate.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            plan_result = queries.find_shops_for_meal_plan(db, meal_plan, user_location, 10)
+            aggregated.append(time.perf_counter() - start)
+
+    separate_shops = sum(len(result.get('shops', [])) for result in results)
+    print(f"{plan_size} recipes, {shop_count} shops, {repeats} runs")
+    print(f"separate queries: median {sorted(separate)[repeats // 2] * 1000:.1f} ms, "
+          f"{separate_shops} shop visits in {plan_size} trips")
+    print(f"meal plan query:  median {sorted(aggregated)[repeats // 2] * 1000:.1f} ms, "
+          f"{len(plan_result.get('shops', []))} shop visits in one trip ({plan_result['type']})")
+
+
+if __name__ == '__main__':
+    main()
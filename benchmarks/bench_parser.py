@@ -0,0 +1,81 @@
+"""
+Ingredient parser throughput: the original per-call regex vs the compiled,
+memoized parser, on a synthetic corpus where popular lines repeat the way
+they do in real recipe datasets.
+
+Run from the repository root:
+    python -m benchmarks.bench_parser [number_of_lines]
+"""
+import random
+import re
+import sys
+import time
+
+from recipe_mapper import ingredients
+
+QUANTITIES = ['1', '2', '3', '1/2', '1 1/2', '½', '1 ½', '2-3', '0.5', '250', '2 to 3', '¾']
+UNITS = ['cup', 'cups', 'tbsp', 'tsp', 'g', 'kg', 'oz', 'lb', 'cloves', 'ml', '']
+NAMES = ['flour', 'sugar', 'butter', 'olive oil', 'garlic', 'onion', 'salt', 'black pepper', 'milk',
+         'eggs', 'rice', 'tomatoes', 'chicken breast', 'lemon juice', 'parsley', 'cumin', 'honey']
+
+
+def legacy_parse_ingredient(ingredient_str):
+    """The parser as it was before the compiled grammar, kept for comparison."""
+    pattern = r'(?P<quantity>\d+(\.\d+)?)\s*(?P<unit>\w+)\s+(?:of\s+)?(?P<name>.+)'
+    match = re.match(pattern, ingredient_str)
+    if match:
+        quantity = float(match.group('quantity'))
+        unit = match.group('unit')
+        name = match.group('name').strip()
+        return {'quantity': quantity, 'unit': unit, 'name': name}
+    else:
+        return {'quantity': None, 'unit': None, 'name': ingredient_str.strip()}
+
+
+def make_corpus(line_count, seed=7):
+    rng = random.Random(seed)
+    distinct = []
+    for quantity in QUANTITIES:
+        for unit in UNITS:
+            for name in NAMES:
+                distinct.append(f"{quantity} {unit} {name}".replace('  ', ' '))
+    distinct.extend(f"{name} to taste" for name in NAMES)
+    rng.shuffle(distinct)
+    # Zipf-like popularity: a few lines make up most of the corpus
+    weights = [1.0 / (rank + 1) for rank in range(len(distinct))]
+    return rng.choices(distinct, weights=weights, k=line_count)
+
+
+def timed(label, parse, corpus):
+    start = time.perf_counter()
+    parse(corpus)
+    seconds = time.perf_counter() - start
+    rate = len(corpus) / seconds
+    print(f"{label:<28} {rate:>12,.0f} lines/s")
+    return rate
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    corpus = make_corpus(line_count)
+    print(f"{line_count} lines, {len(set(corpus))} distinct")
+
+    legacy = timed("legacy parse_ingredient", lambda lines: [legacy_parse_ingredient(s) for s in lines], corpus)
+
+    def uncached(lines):
+        parse = ingredients._parse_cached.__wrapped__
+        return [parse(s) for s in lines]
+    timed("compiled, no memo", uncached, corpus)
+
+    ingredients._parse_cached.cache_clear()
+    batched = timed("parse_many (cold memo)", ingredients.parse_many, corpus)
+    timed("parse_many (warm memo)", ingredients.parse_many, corpus)
+
+    recognised = sum(parsed['quantity'] is not None for parsed in ingredients.parse_many(corpus))
+    legacy_recognised = sum(legacy_parse_ingredient(s)['quantity'] is not None for s in corpus)
+    print(f"speedup vs legacy: {batched / legacy:.1f}x")
+    print(f"lines with a quantity: legacy {legacy_recognised}, new {recognised}")
+
+
+if __name__ == '__main__':
+    main()
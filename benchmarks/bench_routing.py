@@ -0,0 +1,46 @@
+"""
+Route planner latency and quality: the old order (shops sorted by distance
+from the user) vs nearest-neighbour alone vs the planned route.
+
+Run from the repository root:
+    python -m benchmarks.bench_routing [number_of_stops] [repeats]
+"""
+import random
+import sys
+import time
+
+from recipe_mapper import routing
+
+
+def main():
+    stop_count = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(11)
+    user_location = (51.5074, -0.1278)
+
+    timings = []
+    totals = {'by distance': 0.0, 'nearest neighbour': 0.0, 'planned': 0.0}
+    for _ in range(repeats):
+        shops = [{'latitude': user_location[0] + rng.uniform(-0.15, 0.15),
+                  'longitude': user_location[1] + rng.uniform(-0.25, 0.25)} for _ in range(stop_count)]
+        routing.distance_matrix.cache_clear()
+        start = time.perf_counter()
+        _, planned_km = routing.plan_route(user_location, shops)
+        timings.append(time.perf_counter() - start)
+
+        points = (user_location,) + tuple((shop['latitude'], shop['longitude']) for shop in shops)
+        matrix = routing.distance_matrix(points)
+        by_distance = [0] + sorted(range(1, len(points)), key=lambda stop: matrix[0][stop])
+        totals['by distance'] += routing.route_length(matrix, by_distance)
+        totals['nearest neighbour'] += routing.route_length(matrix, routing._nearest_neighbour(matrix))
+        totals['planned'] += planned_km
+
+    timings.sort()
+    print(f"{stop_count} stops, {repeats} trips")
+    print(f"plan_route: median {timings[len(timings) // 2] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms")
+    for label, total in totals.items():
+        print(f"{label:<18} {total / repeats:>8.2f} km per trip")
+
+
+if __name__ == '__main__':
+    main()
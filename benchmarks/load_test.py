@@ -0,0 +1,154 @@
+"""
+Load test for the HTTP service (recipe_mapper.server).
+
+Without a URL it fills a temporary database with a synthetic city of shops
+and recipes, starts a server for it on a free local port, and runs against
+that. Each of `concurrency` client threads keeps one HTTP/1.1 connection open
+and sends requests back to back: mostly Find Shops, some What's in Season,
+recipe listings and shop inventory updates. Reports throughput, latency
+percentiles and the responses by status.
+
+Run from the repository root:
+    python -m benchmarks.load_test [concurrency] [requests] [url]
+"""
+import http.client
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from recipe_mapper.database import Database
+from recipe_mapper.server import PlannerService, make_server
+
+INGREDIENT_COUNT = 200
+INGREDIENTS_PER_RECIPE = 8
+ITEMS_PER_SHOP = 80
+RECIPE_COUNT = 500
+SHOP_COUNT = 1000
+# Shops the write requests restock
+RESTOCKED_SHOPS = 50
+CENTER = (51.5074, -0.1278)
+
+
+def seed(directory, rng):
+    ingredients = [f"ingredient {i}" for i in range(INGREDIENT_COUNT)]
+    with Database.in_directory(directory) as db:
+        for r in range(RECIPE_COUNT):
+            db.add_recipe(f"recipe {r}", [
+                {'name': name, 'quantity': rng.choice([1, 2, 100, 250]), 'unit': rng.choice(['g', 'ml', ''])}
+                for name in rng.sample(ingredients, INGREDIENTS_PER_RECIPE)
+            ])
+        for s in range(SHOP_COUNT):
+            db.add_shop(f"shop {s}", CENTER[0] + rng.uniform(-0.1, 0.1), CENTER[1] + rng.uniform(-0.15, 0.15), [
+                {'name': name, 'quantity': rng.choice([1000, 5000]), 'unit': rng.choice(['g', 'ml', ''])}
+                for name in rng.sample(ingredients, ITEMS_PER_SHOP)
+            ])
+
+
+def random_location(rng):
+    return round(CENTER[0] + rng.uniform(-0.05, 0.05), 4), round(CENTER[1] + rng.uniform(-0.08, 0.08), 4)
+
+
+def next_request(rng, shops):
+    """(method, path, body) drawn from the request mix."""
+    draw = rng.random()
+    lat, lon = random_location(rng)
+    if draw < 0.75:
+        query = urlencode({'recipe_id': rng.randint(1, RECIPE_COUNT), 'lat': lat, 'lon': lon, 'radius': 5})
+        return 'GET', f'/find-shops?{query}', None
+    if draw < 0.85:
+        return 'GET', f"/in-season?{urlencode({'lat': lat, 'lon': lon, 'radius': 3})}", None
+    if draw < 0.95 or not shops:
+        return 'GET', f"/recipes?{urlencode({'prefix': f'recipe {rng.randint(1, 9)}', 'limit': 20})}", None
+    # Restock a shop: same name and position, new inventory
+    shop = rng.choice(shops)
+    return 'PUT', f"/shops/{shop['shop_id']}", {
+        'name': shop['name'], 'latitude': shop['latitude'], 'longitude': shop['longitude'],
+        'inventory': [{'name': f"ingredient {i}", 'quantity': rng.choice([1000, 5000]), 'unit': 'g'}
+                      for i in rng.sample(range(INGREDIENT_COUNT), ITEMS_PER_SHOP)],
+    }
+
+
+def client(host, port, requests, shops, seed_value, latencies, statuses, lock):
+    rng = random.Random(seed_value)
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    for _ in range(requests):
+        method, path, body = next_request(rng, shops)
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=data, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = 'connection error'
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+    conn.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run(host, port, concurrency, total_requests):
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    conn.request('GET', f'/shops?limit={RESTOCKED_SHOPS}')
+    shops = []
+    for shop in json.loads(conn.getresponse().read())['shops']:
+        conn.request('GET', f"/shops/{shop['shop_id']}")
+        shops.append(json.loads(conn.getresponse().read()))
+    conn.close()
+
+    latencies, statuses, lock = [], {}, threading.Lock()
+    per_client = max(1, total_requests // concurrency)
+    threads = [threading.Thread(target=client, args=(host, port, per_client, shops, n, latencies, statuses, lock))
+               for n in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} requests from {concurrency} concurrent clients in {elapsed:.1f}s: "
+          f"{len(latencies) / elapsed:.0f} requests/s")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"responses: {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))}")
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    total_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    if len(sys.argv) > 3:
+        url = urlsplit(sys.argv[3])
+        run(url.hostname, url.port or 80, concurrency, total_requests)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Seeding {RECIPE_COUNT} recipes and {SHOP_COUNT} shops...")
+        seed(directory, random.Random(20))
+        service = PlannerService(directory)
+        server = make_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            run('127.0.0.1', server.server_port, concurrency, total_requests)
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+
+if __name__ == '__main__':
+    main()
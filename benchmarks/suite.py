@@ -0,0 +1,228 @@
+"""
+Reproducible benchmark suite for the hot paths, across data size tiers.
+
+For every tier (the number of recipes; shops are SHOPS_PER_RECIPE of that) a
+fresh interpreter builds a temporary database from benchmarks.synthetic with
+the given seed and times:
+
+    populate_recipes   adding the recipes in batches of POPULATE_BATCH_SIZE
+    add_shop           adding the shops
+    find_shops         find_nearby_shops_for_recipe() without the result cache
+    whats_in_season    the What's in Season query
+    update_shop        restocking shops (a tenth of each inventory changes)
+
+Each path gets its p50/p95 latency and throughput; each tier gets its peak
+RSS (the child's, so tiers do not inherit each other's peak). The results are
+written to a JSON file. With a baseline file (an earlier results file, e.g.
+one saved with --save-baseline) every p95 latency and peak RSS that grew by
+more than --threshold is reported as a regression and the exit status is 1.
+
+Run from the repository root:
+    python -m benchmarks.suite [--tiers 1000,10000,100000] [--seed 22] [--output FILE]
+                               [--baseline FILE] [--save-baseline] [--threshold 0.25]
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import SyntheticData
+from recipe_mapper import queries
+from recipe_mapper.database import Database
+
+TIERS = (1000, 10000, 100000, 1000000)
+DEFAULT_TIERS = TIERS[:3]
+DEFAULT_SEED = 22
+DEFAULT_OUTPUT = 'benchmark-results.json'
+DEFAULT_BASELINE = 'benchmarks/baseline.json'
+# A p95 latency or peak RSS this much above the baseline is a regression
+DEFAULT_THRESHOLD = 0.25
+# ...and by at least this much, so timer noise on sub-millisecond paths is not flagged
+MIN_REGRESSION_MS = 0.5
+
+SHOPS_PER_RECIPE = 0.05
+MIN_SHOPS = 20
+POPULATE_BATCH_SIZE = 1000
+FIND_SHOPS_QUERIES = 300
+IN_SEASON_QUERIES = 30
+SHOP_UPDATES = 200
+RADIUS_KM = 5.0
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(latencies, items=None, unit='calls'):
+    """p50/p95 in ms and throughput in items (default: calls) per second of a list of latencies."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    items = len(ordered) if items is None else items
+    return {'count': len(ordered), 'p50_ms': percentile(ordered, 0.5) * 1000,
+            'p95_ms': percentile(ordered, 0.95) * 1000,
+            'throughput_per_s': items / total if total > 0 else 0.0, 'unit': unit}
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Not available on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_tier(recipe_count, seed):
+    """Build a tier's database and time every path. Runs in the child interpreter."""
+    data = SyntheticData(seed)
+    shop_count = max(MIN_SHOPS, int(recipe_count * SHOPS_PER_RECIPE))
+    paths = {}
+    with tempfile.TemporaryDirectory() as directory, Database.in_directory(directory) as db:
+        # Step 1: Recipes, in the batches an import would write
+        latencies = []
+        for start in range(0, recipe_count, POPULATE_BATCH_SIZE):
+            batch = data.recipes(min(POPULATE_BATCH_SIZE, recipe_count - start), start)
+            latencies.append(timed(db.populate_recipes, batch)[0])
+        paths['populate_recipes'] = summarize(latencies, recipe_count, 'recipes')
+
+        # Step 2: Shops
+        shops = data.shops(shop_count)
+        latencies = [timed(db.add_shop, *shop)[0] for shop in shops]
+        paths['add_shop'] = summarize(latencies, unit='shops')
+        shop_ids = [shop_id for shop_id, _ in db.get_all_shops()]
+
+        # Step 3: Find Shops at user locations around the cities
+        # (the first call also imports the distance engine, so warm it up first)
+        rng = data.rng('find_shops')
+        queries.get_nearby_shops(db, data.locations(1, 'warm_up')[0], RADIUS_KM)
+        latencies, outcomes = [], {}
+        for location in data.locations(FIND_SHOPS_QUERIES):
+            elapsed, result = timed(queries.find_nearby_shops_for_recipe, db, rng.randint(1, recipe_count), location,
+                                    RADIUS_KM)
+            latencies.append(elapsed)
+            outcomes[result['type']] = outcomes.get(result['type'], 0) + 1
+        paths['find_shops'] = {**summarize(latencies), 'outcomes': outcomes}
+
+        # Step 4: What's in Season
+        latencies = [timed(queries.whats_in_season, db, location, RADIUS_KM)[0]
+                     for location in data.locations(IN_SEASON_QUERIES, 'in_season')]
+        paths['whats_in_season'] = summarize(latencies)
+
+        # Step 5: Restock shops through the diff path
+        rng = data.rng('update_shop')
+        latencies = []
+        for _ in range(SHOP_UPDATES):
+            shop_id = rng.choice(shop_ids)
+            name, latitude, longitude, inventory = db.get_shop(shop_id)
+            items = [{'name': item, 'quantity': quantity, 'unit': unit} for item, quantity, unit in inventory]
+            for item in rng.sample(items, max(1, len(items) // 10)):
+                item['quantity'] = rng.randint(1, 50)
+            latencies.append(timed(db.update_shop, shop_id, name, latitude, longitude, items)[0])
+        paths['update_shop'] = summarize(latencies, unit='updates')
+
+        rows = {'recipes': recipe_count, 'shops': shop_count,
+                'recipe_ingredient_rows': db.conn_recipes.execute('SELECT COUNT(*) FROM RecipeIngredients')
+                .fetchone()[0],
+                'inventory_rows': db.conn_shops.execute('SELECT COUNT(*) FROM ShopInventory').fetchone()[0]}
+    return {'rows': rows, 'paths': paths, 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_suite(tiers, seed):
+    results = {'seed': seed, 'created': datetime.now(timezone.utc).isoformat(),
+               'machine': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                           'platform': platform.platform(), 'processor': platform.processor()},
+               'tiers': {}}
+    for recipe_count in tiers:
+        print(f"tier {recipe_count:,} recipes...", file=sys.stderr, flush=True)
+        # A fresh interpreter per tier, so peak RSS and caches are the tier's own
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--run-tier', str(recipe_count),
+                                 '--seed', str(seed)], capture_output=True, text=True, check=True).stdout
+        results['tiers'][str(recipe_count)] = tier = json.loads(output)
+        for path, stats in tier['paths'].items():
+            print(f"  {path:<17} p50 {stats['p50_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms  "
+                  f"{stats['throughput_per_s']:12,.1f} {stats['unit']}/s", file=sys.stderr)
+        if tier['peak_rss_mb'] is not None:
+            print(f"  peak RSS {tier['peak_rss_mb']:.0f} MB", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Regression messages for every p95 latency or peak RSS above the baseline
+    by more than threshold (latencies also by MIN_REGRESSION_MS).
+    """
+    regressions = []
+    for tier_name, tier in results['tiers'].items():
+        base_tier = baseline.get('tiers', {}).get(tier_name)
+        if base_tier is None:
+            continue
+        for path, stats in tier['paths'].items():
+            base_stats = base_tier['paths'].get(path)
+            if (base_stats and stats['p95_ms'] > base_stats['p95_ms'] * (1 + threshold)
+                    and stats['p95_ms'] - base_stats['p95_ms'] >= MIN_REGRESSION_MS):
+                regressions.append(f"tier {tier_name}: {path} p95 {stats['p95_ms']:.2f} ms, "
+                                   f"baseline {base_stats['p95_ms']:.2f} ms")
+        if (tier['peak_rss_mb'] is not None and base_tier.get('peak_rss_mb')
+                and tier['peak_rss_mb'] > base_tier['peak_rss_mb'] * (1 + threshold)):
+            regressions.append(f"tier {tier_name}: peak RSS {tier['peak_rss_mb']:.0f} MB, "
+                               f"baseline {base_tier['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tiers', default=','.join(map(str, DEFAULT_TIERS)),
+                        help=f"comma-separated recipe counts (default: {','.join(map(str, DEFAULT_TIERS))}; "
+                             f"the full set is {','.join(map(str, TIERS))})")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='results JSON file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results file to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results to the baseline file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--run-tier', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_tier is not None:
+        print(json.dumps(run_tier(args.run_tier, args.seed)))
+        return
+
+    results = run_suite([int(tier) for tier in args.tiers.split(',')], args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        return
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to store one.", file=sys.stderr)
+        return
+    if baseline.get('seed') != results['seed']:
+        print(f"Baseline was generated with seed {baseline.get('seed')}, not {results['seed']}.", file=sys.stderr)
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%}).", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
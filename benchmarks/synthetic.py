@@ -0,0 +1,122 @@
+"""
+Seeded generator of synthetic recipes, shops and user locations.
+
+Everything drawn from one SyntheticData(seed) is reproducible. Shops are
+spread around real city centres (more of them in bigger cities, normally
+distributed around the centre), and user locations are drawn the same way,
+so radius queries see realistic densities. Ingredient popularity follows a
+Zipf law: a few staples appear in most recipes and most shop inventories,
+and the long tail is rare. Every ingredient keeps one unit family, so shops
+stock it in units a recipe's quantity can be compared with.
+
+Recipes come as dataset entries ({'title', 'ingredients': [strings]}), the
+form importer.py and Database.populate_recipes() read; shops come as the
+arguments of Database.add_shop().
+"""
+import math
+import random
+
+# (latitude, longitude, relative number of shops)
+CITIES = [
+    (51.5074, -0.1278, 9.0),   # London
+    (53.4808, -2.2426, 2.8),   # Manchester
+    (52.4862, -1.8904, 2.9),   # Birmingham
+    (55.8642, -4.2518, 1.6),   # Glasgow
+    (53.8008, -1.5491, 1.8),   # Leeds
+    (51.4545, -2.5879, 1.0),   # Bristol
+    (53.4084, -2.9916, 1.2),   # Liverpool
+    (55.9533, -3.1883, 1.0),   # Edinburgh
+]
+# Standard deviation of the distance of a shop or user from the city centre
+CITY_SPREAD_KM = 6.0
+KM_PER_DEGREE_LATITUDE = 111.32
+
+ZIPF_EXPONENT = 1.07
+DEFAULT_INGREDIENT_COUNT = 2000
+INGREDIENTS_PER_RECIPE = (4, 14)
+ITEMS_PER_SHOP = (40, 250)
+
+_QUALIFIERS = ['red', 'green', 'smoked', 'fresh', 'dried', 'ground', 'whole', 'sweet', 'wild', 'baby',
+               'white', 'black', 'brown', 'plain', 'organic', 'frozen', 'roasted', 'pickled', 'sliced',
+               'chopped', 'toasted', 'spiced', 'salted', 'unsalted', 'light', 'dark', 'golden', 'young',
+               'aged', 'crushed', 'flaked', 'grated', 'minced', 'raw', 'candied', 'malted',
+               'blanched', 'soft', 'hard']
+_BASES = ['flour', 'sugar', 'butter', 'olive oil', 'garlic', 'onion', 'salt', 'pepper', 'milk', 'eggs', 'rice',
+          'tomatoes', 'chicken', 'lemon juice', 'parsley', 'cumin', 'honey', 'beans', 'lentils', 'carrots',
+          'potatoes', 'spinach', 'mushrooms', 'cheese', 'yoghurt', 'cream', 'stock', 'vinegar', 'mustard',
+          'ginger', 'chilli', 'paprika', 'oats', 'almonds', 'walnuts', 'raisins', 'apples', 'pears',
+          'bananas', 'peas', 'corn', 'pasta', 'noodles', 'bread', 'tofu', 'salmon', 'cod', 'prawns',
+          'beef', 'pork', 'lamb', 'basil', 'thyme', 'rosemary', 'coriander', 'cinnamon', 'nutmeg',
+          'cocoa', 'coconut milk', 'soy sauce']
+# Units per family: recipes use the small ones, shops sell in the large ones
+_RECIPE_UNITS = {'mass': ['g', 'g', 'oz'], 'volume': ['ml', 'tbsp', 'tsp', 'cup'], 'count': ['pieces']}
+_SHOP_UNITS = {'mass': [('kg', 5, 50)], 'volume': [('l', 5, 50)], 'count': [('', 50, 500)]}
+_RECIPE_QUANTITIES = {'g': (25, 500), 'oz': (1, 12), 'ml': (25, 500), 'tbsp': (1, 4), 'tsp': (1, 3),
+                      'cup': (1, 3), 'pieces': (1, 6)}
+
+
+class SyntheticData:
+
+    def __init__(self, seed, ingredient_count=DEFAULT_INGREDIENT_COUNT):
+        self.seed = seed
+        rng = random.Random(seed)
+        names = [f"{qualifier} {base}" for qualifier in _QUALIFIERS for base in _BASES]
+        rng.shuffle(names)
+        # Rank 1 is the most popular ingredient
+        self.ingredients = names[:ingredient_count]
+        self.families = {name: rng.choice(['mass', 'mass', 'volume', 'count']) for name in self.ingredients}
+        self._cumulative_weights = []
+        total = 0.0
+        for rank in range(1, len(self.ingredients) + 1):
+            total += 1.0 / rank ** ZIPF_EXPONENT
+            self._cumulative_weights.append(total)
+        self._city_weights = [city[2] for city in CITIES]
+
+    def rng(self, stream):
+        """An independent generator per purpose, so adding draws to one does not shift another."""
+        return random.Random(f"{self.seed}:{stream}")
+
+    def popular_ingredients(self, rng, count):
+        """count distinct ingredients drawn by Zipf popularity."""
+        chosen = {}
+        while len(chosen) < count:
+            for name in rng.choices(self.ingredients, cum_weights=self._cumulative_weights, k=count):
+                chosen.setdefault(name, None)
+        return list(chosen)[:count]
+
+    def location(self, rng):
+        """A (lat, lon) point around a city, weighted by city size."""
+        latitude, longitude, _ = rng.choices(CITIES, weights=self._city_weights)[0]
+        north_km, east_km = rng.gauss(0.0, CITY_SPREAD_KM), rng.gauss(0.0, CITY_SPREAD_KM)
+        return (latitude + north_km / KM_PER_DEGREE_LATITUDE,
+                longitude + east_km / (KM_PER_DEGREE_LATITUDE * math.cos(math.radians(latitude))))
+
+    def recipe(self, rng, number):
+        lines = []
+        for name in self.popular_ingredients(rng, rng.randint(*INGREDIENTS_PER_RECIPE)):
+            unit = rng.choice(_RECIPE_UNITS[self.families[name]])
+            low, high = _RECIPE_QUANTITIES[unit]
+            lines.append(f"{rng.randint(low, high)} {unit} {name}")
+        return {'title': f"Recipe {number}", 'ingredients': lines}
+
+    def recipes(self, count, start=0):
+        """Dataset entries for recipes start .. start + count - 1."""
+        rng = self.rng(f"recipes:{start}")
+        return [self.recipe(rng, number) for number in range(start, start + count)]
+
+    def inventory(self, rng, item_count=None):
+        items = []
+        for name in self.popular_ingredients(rng, item_count or rng.randint(*ITEMS_PER_SHOP)):
+            unit, low, high = rng.choice(_SHOP_UNITS[self.families[name]])
+            items.append({'name': name, 'quantity': rng.randint(low, high), 'unit': unit})
+        return items
+
+    def shops(self, count, start=0):
+        """(shop_name, latitude, longitude, inventory) for shops start .. start + count - 1."""
+        rng = self.rng(f"shops:{start}")
+        return [(f"Shop {number}", *self.location(rng), self.inventory(rng))
+                for number in range(start, start + count)]
+
+    def locations(self, count, stream='users'):
+        rng = self.rng(stream)
+        return [self.location(rng) for _ in range(count)]
@@ -0,0 +1,3 @@
+"""
+Core building blocks for Recipe Mapper that don't depend on the Tk GUI.
+"""
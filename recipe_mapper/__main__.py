@@ -0,0 +1,5 @@
+import sys
+
+from recipe_mapper.cli import main
+
+sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Shop plans for many (recipe_id, user_location, radius_km) requests at once.
+
+find_nearby_shops_for_recipe() answers one request with its own spatial scan
+and inventory query. find_shops_batch() groups the requests by the spatial
+grid cell of their location (and by recipe within a group), reads the shops
+around each group with one scan, computes each request's distances against
+those shops as one NumPy batch, and loads every shop's inventory and every
+recipe's ingredients at most once for the whole batch. Coverage is then
+checked in memory with the same unit-family and quantity rule as the SQL in
+queries.py, so the per-request results are the same dicts.
+
+Results are yielded as each request is planned, so a caller can write them
+out while the rest of the batch is still running.
+"""
+import json
+import logging
+import sqlite3
+
+from recipe_mapper import instrumentation, queries, spatial, units
+
+logger = logging.getLogger(__name__)
+
+
+def group_requests(requests):
+    """Lists of request indexes that share a grid cell, ordered by recipe within each list."""
+    groups = {}
+    for index, (recipe_id, user_location, radius_km) in enumerate(requests):
+        groups.setdefault(spatial.cell_for(*user_location), []).append(index)
+    return [sorted(group, key=lambda index: requests[index][0]) for group in groups.values()]
+
+
+def _enclosing_circle(locations_and_radii):
+    """A (center, radius_km) circle containing every (location, radius_km) circle."""
+    from recipe_mapper.distance import BOUNDARY_TOLERANCE, haversine_km
+
+    center = (sum(location[0] for location, _ in locations_and_radii) / len(locations_and_radii),
+              sum(location[1] for location, _ in locations_and_radii) / len(locations_and_radii))
+    radius_km = 0.0
+    for location, request_radius_km in locations_and_radii:
+        # Haversine can be short of the geodesic distance; pad it so no shop is missed
+        offset = float(haversine_km(center[0], center[1], location[0], location[1]))
+        radius_km = max(radius_km, offset * (1 + BOUNDARY_TOLERANCE) + request_radius_km)
+    return center, radius_km
+
+
+def _load_requirements(db, requirements, recipe_ids):
+    """Read the RecipeIngredients rows of recipes not yet in requirements."""
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in requirements]
+    if not missing:
+        return
+    for recipe_id in missing:
+        requirements[recipe_id] = []
+    rows = db.conn_recipes.execute('''
+        SELECT recipe_id, ingredient_id, quantity, unit, canonical_quantity, unit_family
+        FROM RecipeIngredients
+        WHERE recipe_id IN (SELECT value FROM json_each(?))
+        ORDER BY rowid
+    ''', (json.dumps(missing),))
+    for recipe_id, *row in rows:
+        requirements[recipe_id].append(tuple(row))
+
+
+def _load_inventories(db, inventories, shop_ids):
+    """
+    Read the inventories of shops not yet in inventories, as
+    {ingredient_id: [(canonical_quantity, unit_family), ...]} per shop.
+    """
+    missing = [shop_id for shop_id in shop_ids if shop_id not in inventories]
+    if not missing:
+        return
+    for shop_id in missing:
+        inventories[shop_id] = {}
+    rows = db.conn_shops.execute('''
+        SELECT shop_id, ingredient_id, canonical_quantity, unit_family
+        FROM ShopInventory
+        WHERE shop_id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(missing),))
+    for shop_id, ingredient_id, canonical_quantity, unit_family in rows:
+        inventories[shop_id].setdefault(ingredient_id, []).append((canonical_quantity, unit_family))
+
+
+def _stocks(stock, details):
+    """The in-memory form of the inventory test in find_nearby_shops_for_recipe()."""
+    needed = details['canonical_quantity']
+    family = details['unit_family']
+    for canonical_quantity, unit_family in stock:
+        # NULLs never compare equal in the SQL version either
+        if family is None or unit_family != family:
+            continue
+        if needed is None or (canonical_quantity is not None
+                              and canonical_quantity >= needed * (1 - units.QUANTITY_TOLERANCE)):
+            return True
+    return False
+
+
+def _plan_request(db, required_ingredients, nearby_shops, inventories):
+    if not required_ingredients:
+        return {'type': 'no_ingredients', 'message': 'No ingredients found for the selected recipe.'}
+    if not nearby_shops:
+        return {'type': 'no_shops', 'message': 'No shops found within the specified radius.'}
+    ingredients_needed, ingredient_ids = queries.ingredient_requirements(db, required_ingredients)
+    coverage = {}
+    for shop in nearby_shops:
+        inventory = inventories[shop['shop_id']]
+        covered = {ingredient for ingredient, details in ingredients_needed.items()
+                   if _stocks(inventory.get(ingredient_ids[ingredient], ()), details)}
+        if covered:
+            coverage[shop['shop_id']] = covered
+    return queries.plan_result(nearby_shops, coverage, ingredients_needed)
+
+
+def find_shops_batch(db, requests):
+    """
+    Plan shops for every (recipe_id, user_location, radius_km) request in the
+    list. Yields (index into requests, result) pairs as requests complete,
+    grouped by location rather than in input order; each result is the dict
+    find_nearby_shops_for_recipe() would return.
+    """
+    requirements = {}
+    inventories = {}
+    for group in group_requests(requests):
+        try:
+            with instrumentation.trace('find_shops_batch', requests=len(group)):
+                nearby_by_request = _scan_group(db, requests, group, requirements, inventories)
+                instrumentation.set_result('scanned')
+        except sqlite3.Error as db_error:
+            logger.error("Database error: %s", db_error)
+            for index in group:
+                yield index, {'type': 'error', 'message': 'An error occurred while accessing the database.'}
+            continue
+
+        # Step 5: Plan each request in memory
+        for index in group:
+            with instrumentation.trace('find_shops', recipe_id=requests[index][0], radius_km=requests[index][2]):
+                try:
+                    with instrumentation.stage('planning'):
+                        result = _plan_request(db, requirements[requests[index][0]], nearby_by_request[index],
+                                               inventories)
+                except Exception:
+                    logger.exception("Unexpected error")
+                    result = {'type': 'error', 'message': 'An unexpected error occurred.'}
+                instrumentation.set_result(result['type'])
+            yield index, result
+
+
+def _scan_group(db, requests, group, requirements, inventories):
+    """Steps 1-4 of find_shops_batch() for one group. Returns {request index: nearby shops}."""
+    import numpy as np
+
+    from recipe_mapper.distance import batch_distances
+
+    # Step 1: Ingredients of the group's recipes, unless an earlier group read them
+    with instrumentation.stage('ingredients'):
+        _load_requirements(db, requirements, {requests[index][0] for index in group})
+
+    # Step 2: One spatial scan around the whole group
+    with instrumentation.stage('shop_scan'):
+        center, radius_km = _enclosing_circle([(requests[index][1], requests[index][2]) for index in group])
+        candidates = spatial.candidate_shops(db.conn_shops.cursor(), center, radius_km)
+        latitudes = np.array([shop[2] for shop in candidates], dtype=float)
+        longitudes = np.array([shop[3] for shop in candidates], dtype=float)
+    instrumentation.count('rows_scanned', len(candidates))
+
+    # Step 3: Each request's distances against the group's shops in one batch
+    nearby_by_request = {}
+    with instrumentation.stage('radius_filter'):
+        for index in group:
+            _, user_location, request_radius_km = requests[index]
+            distances = batch_distances(user_location, latitudes, longitudes, request_radius_km)
+            nearby_by_request[index] = [
+                {'shop_id': shop_id, 'shop_name': shop_name, 'latitude': shop_lat,
+                 'longitude': shop_lon, 'distance': distance}
+                for (shop_id, shop_name, shop_lat, shop_lon), distance in zip(candidates, distances.tolist())
+                if distance <= request_radius_km
+            ]
+
+    # Step 4: Inventories of the shops any request needs, each read once per batch
+    with instrumentation.stage('inventory_fetch'):
+        inventory_shops = len(inventories)
+        _load_inventories(db, inventories,
+                          {shop['shop_id'] for shops in nearby_by_request.values() for shop in shops})
+    instrumentation.count('inventories_loaded', len(inventories) - inventory_shops)
+    return nearby_by_request
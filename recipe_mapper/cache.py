@@ -0,0 +1,155 @@
+"""
+Bounded result cache for find_nearby_shops_for_recipe().
+
+Entries are keyed on (recipe_id, quantized user location, radius_km). The
+location is rounded to LOCATION_DECIMALS places (about 110 m) and the query is
+run from the rounded point, so every location that shares a key gets the
+same answer. Entries expire after ttl_seconds, and the least recently used
+one is evicted once max_entries are stored.
+
+Invalidation is driven by the Database write methods: changing or deleting a
+recipe drops that recipe's entries, and adding, changing or deleting a shop
+drops the entries whose search area contains the shop's old or new position.
+The area test is the bounding box the spatial index scans, so it can drop an
+entry the shop was just outside of, but never keeps one it could affect. When
+only a shop's inventory changed, entries that need none of the touched
+ingredients are kept as well.
+
+One QueryCache can be shared by several Database objects (e.g. the GUI's and
+the query worker's); it is thread-safe.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from recipe_mapper import instrumentation, spatial
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 300.0
+LOCATION_DECIMALS = 3
+
+# Result types that depend on the data alone; 'error' results are never cached
+CACHEABLE_TYPES = ('single', 'multiple', 'unavailable', 'no_shops', 'no_ingredients')
+
+
+def quantize_location(user_location):
+    return (round(user_location[0], LOCATION_DECIMALS), round(user_location[1], LOCATION_DECIMALS))
+
+
+def _area_contains(location, radius_km, latitude, longitude):
+    return any(min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+               for min_lat, max_lat, min_lon, max_lon in spatial.bounding_boxes(location, radius_km))
+
+
+def _needs_any(result, ingredients):
+    needed = result.get('ingredients_needed')
+    if needed is None:
+        # 'no_shops' and the like: any stocked ingredient could change them
+        return result.get('type') != 'no_ingredients'
+    # Ingredients listed in two unit families are shown as "name (family)"
+    return any(name in needed or any(key.startswith(name + ' (') for key in needed) for name in ingredients)
+
+
+class QueryCache:
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, result), least recently used first
+        self._keys_by_recipe = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a result computed while the data
+        # changed underneath it is not stored
+        self._version = 0
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get_or_compute(self, recipe_id, user_location, radius_km, compute):
+        """
+        Return the cached result for the key, or compute(quantized location),
+        store it if cacheable, and return it. Callers get their own copy.
+        """
+        location = quantize_location(user_location)
+        key = (recipe_id, location, float(radius_km))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                self._counters['expirations'] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                instrumentation.count('cache_hits')
+                return copy.deepcopy(entry[1])
+            self._counters['misses'] += 1
+            instrumentation.count('cache_misses')
+            version = self._version
+
+        result = compute(location)
+        if result.get('type') not in CACHEABLE_TYPES:
+            return result
+
+        with self._lock:
+            if version == self._version:
+                self._remove(key)
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(result))
+                self._keys_by_recipe.setdefault(recipe_id, set()).add(key)
+                while len(self._entries) > self.max_entries:
+                    self._remove(next(iter(self._entries)))
+                    self._counters['evictions'] += 1
+        return result
+
+    def _remove(self, key):
+        if self._entries.pop(key, None) is None:
+            return
+        keys = self._keys_by_recipe.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_recipe[key[0]]
+
+    def invalidate_recipe(self, recipe_id):
+        """Drop every entry for a recipe whose ingredients changed or that was deleted."""
+        with self._lock:
+            self._version += 1
+            for key in list(self._keys_by_recipe.get(recipe_id, ())):
+                self._remove(key)
+                self._counters['invalidations'] += 1
+
+    def invalidate_location(self, latitude, longitude, ingredients=None):
+        """
+        Drop every entry whose search area contains a shop that was added,
+        changed or deleted here. If ingredients (names) is given, only that
+        part of the shop's inventory changed, and entries needing none of
+        them are kept.
+        """
+        with self._lock:
+            self._version += 1
+            for key in [key for key, (_, result) in self._entries.items()
+                        if _area_contains(key[1], key[2], latitude, longitude)
+                        and (ingredients is None or _needs_any(result, ingredients))]:
+                self._remove(key)
+                self._counters['invalidations'] += 1
+
+    def invalidate_locations(self, positions):
+        """invalidate_location() for many (latitude, longitude) positions at once, e.g. after a bulk load."""
+        with self._lock:
+            self._version += 1
+            for key in list(self._entries):
+                boxes = spatial.bounding_boxes(key[1], key[2])
+                if any(min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+                       for latitude, longitude in positions for min_lat, max_lat, min_lon, max_lon in boxes):
+                    self._remove(key)
+                    self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._keys_by_recipe.clear()
+
+    def stats(self):
+        """Counters for monitoring: hits, misses, evictions, expirations, invalidations and entries."""
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries)}
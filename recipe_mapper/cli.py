@@ -0,0 +1,271 @@
+"""
+Headless command-line entry point for pipelines and shell scripts.
+
+    python -m recipe_mapper [--data-dir DIR] <command> ...
+
+    import FILE           stream a JSON recipe dataset in (resumes an interrupted import)
+    import-shops FILE     load a CSV, JSON or JSONL shop and inventory feed (see shop_feed.py)
+    find-shops [QUERIES]  {"recipe_id", "lat", "lon"[, "radius"][, "id"]} per line
+    in-season [QUERIES]   {"lat", "lon"[, "radius"][, "id"]} per line
+    export {recipes,shops,shopping-lists} [--format {jsonl,csv,pdf}] [--output FILE]
+                          shopping-lists takes find-shops queries with --queries
+    stats
+
+Query files are JSONL (one JSON object per line, '-' or no file for stdin),
+and every command writes JSONL records to stdout as they are produced: the
+query result dicts with their 'type' key, plus the query's "id" (its line
+number if it has none). A bad line gives an 'error' record and the batch
+carries on. Progress and messages go to stderr. export writes JSONL by
+default too, or CSV, or a PDF to --output (see exporters.py).
+
+Only the modules a command needs are imported, so a single query starts
+quickly; find-shops plans large query files in batches that share their
+spatial scans (see batch.py).
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+
+DEFAULT_RADIUS_KM = 5.0
+# Queries read and planned together by find-shops
+FIND_SHOPS_BATCH_SIZE = 1000
+
+
+def _write(record):
+    sys.stdout.write(json.dumps(record) + '\n')
+    sys.stdout.flush()
+
+
+def _error(record_id, message):
+    return {'id': record_id, 'type': 'error', 'message': message}
+
+
+def _read_queries(path):
+    """Yield (id, query dict or None, error message) for every non-blank line."""
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(query, dict):
+                yield line_number, None, 'A query must be a JSON object.'
+                continue
+            yield query.get('id', line_number), query, None
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _location_and_radius(query, default_radius_km):
+    """
+    ((lat, lon), radius_km) of a query. Raises ValueError unless the
+    coordinates are in range and the radius is a positive number; NaN and
+    infinities would otherwise abort the whole batch in the grid lookup.
+    """
+    from recipe_mapper import spatial
+
+    return (spatial.checked_location(query['lat'], query['lon']),
+            spatial.checked_radius(query.get('radius', default_radius_km)))
+
+
+def _open_database(args):
+    from recipe_mapper.database import Database
+    return Database.in_directory(args.data_dir)
+
+
+def run_import(db, args):
+    def report(progress):
+        eta = '' if progress['eta_seconds'] is None else f", about {progress['eta_seconds']:.0f}s left"
+        print(f"{progress['records']} entries, {progress['fraction']:.0%}{eta}", file=sys.stderr)
+
+    options = {'chunk_size': args.chunk_size} if args.chunk_size else {}
+    stats = db.import_recipes(args.file, defer_indexes=args.defer_indexes, workers=args.workers, progress=report,
+                              **options)
+    _write({'type': 'import', **stats})
+
+
+def run_import_shops(db, args):
+    def report(progress):
+        print(f"{progress['shops']} shops, {progress['lines']} inventory lines", file=sys.stderr)
+
+    options = {'chunk_size': args.chunk_size} if args.chunk_size else {}
+    stats = db.import_shops(args.file, file_format=args.format, mode=args.mode, progress=report, **options)
+    for reject in stats['rejects']:
+        print(f"Rejected {reject['where']}: {reject['reason']}", file=sys.stderr)
+    _write({'type': 'shop_import', **stats})
+
+
+def run_find_shops(db, args):
+    from recipe_mapper import routing
+    from recipe_mapper.batch import find_shops_batch
+
+    def plan(chunk):
+        requests = [(recipe_id, location, radius_km) for _, recipe_id, location, radius_km in chunk]
+        for index, result in find_shops_batch(db, requests):
+            record_id, _, location, _ = chunk[index]
+            if args.route:
+                routing.add_route(result, location)
+            _write({'id': record_id, **result})
+
+    # Step 1: Read valid queries into chunks, reporting bad lines straight away
+    chunk = []
+    for record_id, query, problem in _read_queries(args.queries):
+        if problem is None:
+            try:
+                chunk.append((record_id, int(query['recipe_id']), *_location_and_radius(query, args.radius)))
+            except (KeyError, TypeError, ValueError) as e:
+                problem = f"Invalid query: {e!r}"
+        if problem is not None:
+            _write(_error(record_id, problem))
+
+        # Step 2: Plan each full chunk as one batch
+        if len(chunk) >= FIND_SHOPS_BATCH_SIZE:
+            plan(chunk)
+            chunk = []
+    if chunk:
+        plan(chunk)
+
+
+def run_in_season(db, args):
+    from recipe_mapper import queries
+
+    for record_id, query, problem in _read_queries(args.queries):
+        if problem is None:
+            try:
+                location, radius_km = _location_and_radius(query, args.radius)
+            except (KeyError, TypeError, ValueError) as e:
+                problem = f"Invalid query: {e!r}"
+        if problem is not None:
+            _write(_error(record_id, problem))
+            continue
+        try:
+            result = queries.whats_in_season(db, location, radius_km)
+        except (sqlite3.Error, ValueError) as e:
+            _write(_error(record_id, f"Query failed: {e}"))
+            continue
+        _write({'id': record_id, **result})
+
+
+def _shopping_list_requests(args):
+    """(id, recipe_id, location, radius_km) for every valid find-shops query; bad lines go to stderr."""
+    for record_id, query, problem in _read_queries(args.queries):
+        if problem is None:
+            try:
+                yield (record_id, int(query['recipe_id']), *_location_and_radius(query, args.radius))
+                continue
+            except (KeyError, TypeError, ValueError) as e:
+                problem = f"Invalid query: {e!r}"
+        print(f"{record_id}: {problem}", file=sys.stderr)
+
+
+def run_export(db, args):
+    """Stream every recipe or shop, or the shopping lists of a query file, as JSONL, CSV or PDF."""
+    from recipe_mapper import exporters
+
+    if args.format == 'pdf' and args.output in (None, '-'):
+        raise ValueError('A PDF export needs --output FILE.')
+    if args.kind == 'shopping-lists' and args.queries is None:
+        raise ValueError("A shopping-lists export needs --queries FILE (or '-' for stdin).")
+    requests = _shopping_list_requests(args) if args.kind == 'shopping-lists' else None
+
+    if args.format == 'pdf':
+        count = exporters.export(db, args.kind, 'pdf', args.output, requests)
+    elif args.output in (None, '-'):
+        count = exporters.export(db, args.kind, args.format, sys.stdout, requests)
+    else:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            count = exporters.export(db, args.kind, args.format, f, requests)
+    unit = {'jsonl': 'records', 'csv': 'rows', 'pdf': 'lines'}[args.format]
+    print(f"Exported {count} {unit}.", file=sys.stderr)
+
+
+def run_stats(db, args):
+    from recipe_mapper import migrations
+
+    def count(conn, table):
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    _write({'type': 'stats',
+            'recipes': count(db.conn_recipes, 'Recipes'),
+            'recipe_ingredient_rows': count(db.conn_recipes, 'RecipeIngredients'),
+            'shops': count(db.conn_shops, 'Shops'),
+            'inventory_rows': count(db.conn_shops, 'ShopInventory'),
+            'ingredients': count(db.conn_recipes, 'dictionary.Ingredients'),
+            'recipes_schema_version': migrations.get_schema_version(db.conn_recipes),
+            'shops_schema_version': migrations.get_schema_version(db.conn_shops)})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='recipe_mapper', description='Recipe Mapper without the GUI.')
+    parser.add_argument('--data-dir', default='.',
+                        help='directory holding recipes.db, shops.db and ingredients.db (default: .)')
+    parser.add_argument('--trace', action='store_true', help='log the stage timings of every query to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('import', help='import a JSON recipe dataset')
+    command.add_argument('file')
+    command.add_argument('--chunk-size', type=int, help='recipes per committed chunk')
+    command.add_argument('--defer-indexes', action='store_true', help='rebuild the indexes once at the end')
+    command.add_argument('--workers', type=int, help='parsing processes (default: one per CPU)')
+    command.set_defaults(run=run_import)
+
+    command = commands.add_parser('import-shops', help='load a shop and inventory feed')
+    command.add_argument('file')
+    command.add_argument('--format', choices=['csv', 'json', 'jsonl'], help='default: from the file extension')
+    command.add_argument('--mode', choices=['replace', 'merge'], default='replace',
+                         help="replace each feed shop's inventory (default) or merge the feed's lines into it")
+    command.add_argument('--chunk-size', type=int, help='inventory lines per committed chunk')
+    command.set_defaults(run=run_import_shops)
+
+    command = commands.add_parser('find-shops', help='plan shops for recipe queries')
+    command.add_argument('queries', nargs='?', default='-', help="JSONL query file (default: '-', stdin)")
+    command.add_argument('--radius', type=float, default=DEFAULT_RADIUS_KM, help='km, for queries without one')
+    command.add_argument('--route', action='store_true', help='put the shops in route order and add route_km')
+    command.set_defaults(run=run_find_shops)
+
+    command = commands.add_parser('in-season', help="find the recipes in season around locations")
+    command.add_argument('queries', nargs='?', default='-', help="JSONL query file (default: '-', stdin)")
+    command.add_argument('--radius', type=float, default=DEFAULT_RADIUS_KM, help='km, for queries without one')
+    command.set_defaults(run=run_in_season)
+
+    command = commands.add_parser('export', help='write every recipe or shop, or shopping lists, to a file')
+    command.add_argument('kind', choices=['recipes', 'shops', 'shopping-lists'])
+    command.add_argument('--format', choices=['jsonl', 'csv', 'pdf'], default='jsonl')
+    command.add_argument('--output', help="file to write (default: stdout; required for pdf)")
+    command.add_argument('--queries', help="shopping-lists: JSONL find-shops query file ('-' for stdin)")
+    command.add_argument('--radius', type=float, default=DEFAULT_RADIUS_KM, help='km, for queries without one')
+    command.set_defaults(run=run_export)
+
+    command = commands.add_parser('stats', help='row counts and schema versions')
+    command.set_defaults(run=run_stats)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(format='%(name)s: %(message)s')
+    if args.trace:
+        from recipe_mapper import instrumentation
+        logging.getLogger(instrumentation.__name__).setLevel(logging.DEBUG)
+        instrumentation.add_hook(instrumentation.log_trace)
+    try:
+        with _open_database(args) as db:
+            args.run(db, args)
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); nothing left to write to
+        sys.stderr.close()
+        return 1
+    except sqlite3.Error as db_error:
+        print(f"Database error: {db_error}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,381 @@
+"""
+The recipe and shop data layer, without any GUI.
+
+A Database owns explicit connections to recipes.db, shops.db and the shared
+ingredient dictionary. Opening one upgrades the files through the migrations
+and resyncs the derived indexes. Every write method runs in its own
+transaction: it commits on success, and on error rolls back and re-raises
+(e.g. sqlite3.IntegrityError for a duplicate recipe or shop name), leaving
+the reporting to the caller.
+
+Ingredients are passed in and out as dicts with 'name', 'quantity' and 'unit'.
+Lines repeating an ingredient in the same unit family are merged into one row
+(see units.merge_lines()). Updates diff the new list against the stored rows,
+only write the rows that differ, and return the change set.
+
+A Database can be given a cache.QueryCache, which the write methods keep up
+to date once their transaction has committed.
+
+A read_only Database opens its connections with SQLite's mode=ro and skips
+the migrations, so the files must already have been opened by a writable
+one. Its connections may be used from any thread (one at a time), which lets
+a pool hand them out to request threads; the write methods raise
+sqlite3.OperationalError.
+"""
+import os
+import pathlib
+import sqlite3
+import uuid
+
+from recipe_mapper import migrations, paging, recipe_index, spatial, units
+from recipe_mapper.dictionary import IngredientDictionary, attach_dictionary
+from recipe_mapper.ingredients import parse_many
+
+RECIPES_DB = 'recipes.db'
+SHOPS_DB = 'shops.db'
+INGREDIENTS_DB = 'ingredients.db'
+
+
+class Database:
+
+    def __init__(self, recipes_db_path, shops_db_path, ingredients_db_path, query_cache=None, read_only=False):
+        self.query_cache = query_cache
+        self.read_only = read_only
+
+        # Ingredient names shared by both databases, stored as integer ids
+        self.dictionary = IngredientDictionary(ingredients_db_path)
+
+        self.conn_recipes = self._connect(recipes_db_path)
+        attach_dictionary(self.conn_recipes, ingredients_db_path)
+
+        self.conn_shops = self._connect(shops_db_path)
+        attach_dictionary(self.conn_shops, ingredients_db_path)
+
+        if read_only:
+            return
+
+        # Create the tables or upgrade existing database files in place
+        migrations.apply_migrations(self.conn_recipes, migrations.RECIPES_MIGRATIONS)
+        migrations.apply_migrations(self.conn_shops, migrations.SHOPS_MIGRATIONS)
+
+        # Resync the derived indexes if data was written by an older build, and
+        # restore indexes a bulk import dropped if it was killed before the end
+        with self.conn_recipes:
+            for index_ddl in migrations.RECIPE_INDEXES.values():
+                self.conn_recipes.execute(index_ddl)
+            recipe_index.ensure_recipe_counts(self.conn_recipes.cursor())
+        with self.conn_shops:
+            spatial.ensure_spatial_index(self.conn_shops.cursor())
+
+    def _connect(self, path):
+        if not self.read_only:
+            conn = sqlite3.connect(path)
+            migrations.configure_connection(conn)
+            return conn
+        conn = sqlite3.connect(f'{pathlib.Path(path).absolute().as_uri()}?mode=ro', uri=True,
+                               check_same_thread=False)
+        migrations.configure_reader(conn)
+        return conn
+
+    @classmethod
+    def in_directory(cls, directory, query_cache=None, read_only=False):
+        """Open the database files with their standard names inside directory."""
+        return cls(os.path.join(directory, RECIPES_DB),
+                   os.path.join(directory, SHOPS_DB),
+                   os.path.join(directory, INGREDIENTS_DB),
+                   query_cache, read_only)
+
+    def close(self):
+        self.conn_recipes.close()
+        self.conn_shops.close()
+        self.dictionary.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Ingredient lines, shared by recipes and shop inventories
+
+    def _merged_lines(self, items):
+        """Intern the names of item dicts and merge them into (ingredient_id, quantity, unit, canonical, family) rows."""
+        ingredient_ids = self.dictionary.intern_many([item['name'] for item in items])
+        return units.merge_lines((ingredient_id, item['quantity'], item['unit'])
+                                 for item, ingredient_id in zip(items, ingredient_ids))
+
+    def _insert_lines(self, cursor, table, owner_column, owner_id, items):
+        cursor.executemany(f'''
+        INSERT INTO {table} ({owner_column}, ingredient_id, quantity, unit, canonical_quantity, unit_family)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(owner_id, *line) for line in self._merged_lines(items)])
+
+    def _sync_lines(self, cursor, table, owner_column, owner_id, items):
+        """
+        Make the owner's rows in table match items, deleting, updating and
+        inserting only the rows that differ. Returns {'added', 'removed',
+        'changed'}, each a list of ingredient names.
+        """
+        new_lines = {(ingredient_id, family): (quantity, unit, canonical)
+                     for ingredient_id, quantity, unit, canonical, family in self._merged_lines(items)}
+        old_lines = {}
+        stale_rowids = []
+        cursor.execute(f'''
+        SELECT rowid, ingredient_id, unit_family, quantity, unit FROM {table} WHERE {owner_column} = ?
+        ''', (owner_id,))
+        for rowid, ingredient_id, family, quantity, unit in cursor.fetchall():
+            if (ingredient_id, family) in old_lines:
+                # Blank names are not covered by the unique index
+                stale_rowids.append(rowid)
+            else:
+                old_lines[(ingredient_id, family)] = (rowid, quantity, unit)
+
+        removed = [key for key in old_lines if key not in new_lines]
+        added = [key for key in new_lines if key not in old_lines]
+        changed = [key for key in new_lines if key in old_lines and old_lines[key][1:] != new_lines[key][:2]]
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = ?',
+                           [(old_lines[key][0],) for key in removed] + [(rowid,) for rowid in stale_rowids])
+        cursor.executemany(f'UPDATE {table} SET quantity = ?, unit = ?, canonical_quantity = ? WHERE rowid = ?',
+                           [(*new_lines[key], old_lines[key][0]) for key in changed])
+        cursor.executemany(f'''
+        INSERT INTO {table} ({owner_column}, ingredient_id, quantity, unit, canonical_quantity, unit_family)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(owner_id, key[0], *new_lines[key], key[1]) for key in added])
+
+        ingredient_ids = list({key[0] for key in removed + added + changed})
+        names = dict(zip(ingredient_ids, self.dictionary.names_of(ingredient_ids)))
+        return {'added': [names[key[0]] for key in added],
+                'removed': [names[key[0]] for key in removed],
+                'changed': [names[key[0]] for key in changed]}
+
+    # Recipes
+
+    def _insert_recipe_ingredients(self, cursor, recipe_id, ingredients):
+        self._insert_lines(cursor, 'RecipeIngredients', 'recipe_id', recipe_id, ingredients)
+
+    def add_recipe(self, recipe_name, ingredients):
+        """Add a recipe and return its recipe_id."""
+        with self.conn_recipes:
+            cursor = self.conn_recipes.cursor()
+            cursor.execute('INSERT INTO Recipes (recipe_name) VALUES (?)', (recipe_name,))
+            recipe_id = cursor.lastrowid
+            self._insert_recipe_ingredients(cursor, recipe_id, ingredients)
+            recipe_index.refresh_recipe_counts(cursor, [recipe_id])
+        return recipe_id
+
+    def get_all_recipes(self):
+        return self.conn_recipes.execute('SELECT recipe_id, recipe_name FROM Recipes').fetchall()
+
+    def recipes_page(self, prefix='', after=None, limit=paging.PAGE_SIZE):
+        """One keyset page of (recipe_id, recipe_name) in name order; see paging.name_page()."""
+        return paging.name_page(self.conn_recipes, 'Recipes', 'recipe_id', 'recipe_name', prefix, after, limit)
+
+    def recipe_lines(self):
+        """
+        Cursor over (recipe_id, recipe_name, ingredient name, quantity, unit,
+        canonical_quantity, unit_family) for every ingredient line, in recipe
+        name order with each recipe's lines together. A recipe without
+        ingredients gives one row with None for the ingredient columns.
+        """
+        return self.conn_recipes.execute('''
+        SELECT r.recipe_id, r.recipe_name, i.canonical_name, ri.quantity, ri.unit, ri.canonical_quantity,
+               ri.unit_family
+        FROM Recipes r
+        LEFT JOIN RecipeIngredients ri ON ri.recipe_id = r.recipe_id
+        LEFT JOIN dictionary.Ingredients i ON i.ingredient_id = ri.ingredient_id
+        ORDER BY r.recipe_name COLLATE NOCASE, r.recipe_id, ri.rowid
+        ''')
+
+    def has_recipes(self):
+        return self.conn_recipes.execute('SELECT 1 FROM Recipes LIMIT 1').fetchone() is not None
+
+    def get_recipe(self, recipe_id):
+        """Return (recipe_name, [(ingredient name, quantity, unit), ...]) or None."""
+        row = self.conn_recipes.execute('SELECT recipe_name FROM Recipes WHERE recipe_id = ?',
+                                        (recipe_id,)).fetchone()
+        if row is None:
+            return None
+        ingredients = self.conn_recipes.execute('''
+        SELECT i.canonical_name, ri.quantity, ri.unit
+        FROM RecipeIngredients ri LEFT JOIN dictionary.Ingredients i ON i.ingredient_id = ri.ingredient_id
+        WHERE ri.recipe_id = ?
+        ORDER BY ri.rowid
+        ''', (recipe_id,)).fetchall()
+        return row[0], ingredients
+
+    def update_recipe(self, recipe_id, new_name, new_ingredients):
+        """
+        Rename a recipe and bring its ingredients in line with new_ingredients.
+        Returns the change set: {'renamed': bool, 'added', 'removed',
+        'changed': lists of ingredient names}, or None (writing nothing) if
+        there is no such recipe.
+        """
+        with self.conn_recipes:
+            cursor = self.conn_recipes.cursor()
+            cursor.execute('SELECT 1 FROM Recipes WHERE recipe_id = ?', (recipe_id,))
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('UPDATE Recipes SET recipe_name = ? WHERE recipe_id = ? AND recipe_name IS NOT ?',
+                           (new_name, recipe_id, new_name))
+            changes = {'renamed': cursor.rowcount > 0}
+            changes.update(self._sync_lines(cursor, 'RecipeIngredients', 'recipe_id', recipe_id, new_ingredients))
+            if changes['added'] or changes['removed']:
+                recipe_index.refresh_recipe_counts(cursor, [recipe_id])
+        # Results do not show the recipe name, so only ingredient changes matter
+        if self.query_cache is not None and (changes['added'] or changes['removed'] or changes['changed']):
+            self.query_cache.invalidate_recipe(recipe_id)
+        return changes
+
+    def delete_recipe(self, recipe_id):
+        """Delete a recipe. Returns False (writing nothing) if there is no such recipe."""
+        with self.conn_recipes:
+            cursor = self.conn_recipes.cursor()
+            cursor.execute('SELECT 1 FROM Recipes WHERE recipe_id = ?', (recipe_id,))
+            if cursor.fetchone() is None:
+                return False
+            cursor.execute('DELETE FROM RecipeIngredients WHERE recipe_id = ?', (recipe_id,))
+            cursor.execute('DELETE FROM Recipes WHERE recipe_id = ?', (recipe_id,))
+            recipe_index.refresh_recipe_counts(cursor, [recipe_id])
+        if self.query_cache is not None:
+            self.query_cache.invalidate_recipe(recipe_id)
+        return True
+
+    def populate_recipes(self, recipes):
+        """
+        Add already loaded dataset entries ({'title', 'ingredients'} dicts with
+        ingredient strings), skipping names that exist. Returns the new recipe_ids.
+        """
+        added_recipe_ids = []
+        with self.conn_recipes:
+            cursor = self.conn_recipes.cursor()
+            for recipe in recipes:
+                cursor.execute('INSERT OR IGNORE INTO Recipes (recipe_name) VALUES (?)', (recipe['title'].strip(),))
+                if not cursor.rowcount:
+                    continue
+                recipe_id = cursor.lastrowid
+                added_recipe_ids.append(recipe_id)
+                self._insert_recipe_ingredients(cursor, recipe_id, parse_many(recipe['ingredients']))
+            recipe_index.refresh_recipe_counts(cursor, added_recipe_ids)
+        return added_recipe_ids
+
+    def import_recipes(self, file_path, **options):
+        """Stream a JSON recipe dataset in; see importer.bulk_import() for the options."""
+        from recipe_mapper.importer import bulk_import
+        return bulk_import(self.conn_recipes, self.dictionary, file_path, **options)
+
+    # Shops
+
+    def import_shops(self, file_path, **options):
+        """Stream a supplier feed of shops and inventories in; see shop_feed.load_feed() for the options."""
+        from recipe_mapper.shop_feed import load_feed
+        return load_feed(self.conn_shops, self.dictionary, file_path, query_cache=self.query_cache, **options)
+
+    def _insert_inventory(self, cursor, shop_id, inventory):
+        self._insert_lines(cursor, 'ShopInventory', 'shop_id', shop_id, inventory)
+
+    def add_shop(self, shop_name, latitude, longitude, inventory):
+        """Add a shop and return its shop_id."""
+        shop_id = str(uuid.uuid4())
+        with self.conn_shops:
+            cursor = self.conn_shops.cursor()
+            cursor.execute('''
+            INSERT INTO Shops (shop_id, shop_name, latitude, longitude)
+            VALUES (?, ?, ?, ?)
+            ''', (shop_id, shop_name, latitude, longitude))
+            self._insert_inventory(cursor, shop_id, inventory)
+            spatial.index_shop(cursor, shop_id, latitude, longitude)
+        self._invalidate_shop_positions([(latitude, longitude)])
+        return shop_id
+
+    def get_all_shops(self):
+        return self.conn_shops.execute('SELECT shop_id, shop_name FROM Shops').fetchall()
+
+    def shops_page(self, prefix='', after=None, limit=paging.PAGE_SIZE):
+        """One keyset page of (shop_id, shop_name) in name order; see paging.name_page()."""
+        return paging.name_page(self.conn_shops, 'Shops', 'shop_id', 'shop_name', prefix, after, limit)
+
+    def inventory_lines(self):
+        """
+        Cursor over (shop_id, shop_name, latitude, longitude, external_id,
+        ingredient name, quantity, unit) for every inventory line, in shop
+        name order with each shop's lines together, like recipe_lines().
+        """
+        return self.conn_shops.execute('''
+        SELECT s.shop_id, s.shop_name, s.latitude, s.longitude, s.external_id, i.canonical_name, si.quantity,
+               si.unit
+        FROM Shops s
+        LEFT JOIN ShopInventory si ON si.shop_id = s.shop_id
+        LEFT JOIN dictionary.Ingredients i ON i.ingredient_id = si.ingredient_id
+        ORDER BY s.shop_name COLLATE NOCASE, s.shop_id, si.rowid
+        ''')
+
+    def get_shop(self, shop_id):
+        """Return (shop_name, latitude, longitude, [(ingredient name, quantity, unit), ...]) or None."""
+        row = self.conn_shops.execute('SELECT shop_name, latitude, longitude FROM Shops WHERE shop_id = ?',
+                                      (shop_id,)).fetchone()
+        if row is None:
+            return None
+        inventory = self.conn_shops.execute('''
+        SELECT i.canonical_name, si.quantity, si.unit
+        FROM ShopInventory si LEFT JOIN dictionary.Ingredients i ON i.ingredient_id = si.ingredient_id
+        WHERE si.shop_id = ?
+        ORDER BY si.rowid
+        ''', (shop_id,)).fetchall()
+        return (*row, inventory)
+
+    def _shop_position(self, cursor, shop_id):
+        return cursor.execute('SELECT latitude, longitude FROM Shops WHERE shop_id = ?', (shop_id,)).fetchone()
+
+    def _invalidate_shop_positions(self, positions):
+        if self.query_cache is None:
+            return
+        for position in positions:
+            if position is not None:
+                self.query_cache.invalidate_location(*position)
+
+    def update_shop(self, shop_id, new_name, new_latitude, new_longitude, new_inventory):
+        """
+        Update a shop and bring its inventory in line with new_inventory.
+        Returns the change set: {'renamed': bool, 'moved': bool, 'added',
+        'removed', 'changed': lists of ingredient names}, or None (writing
+        nothing) if there is no such shop.
+        """
+        with self.conn_shops:
+            cursor = self.conn_shops.cursor()
+            cursor.execute('SELECT shop_name, latitude, longitude FROM Shops WHERE shop_id = ?', (shop_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            old_name, *old_position = row
+            changes = {'renamed': old_name != new_name,
+                       'moved': old_position != [new_latitude, new_longitude]}
+            if changes['renamed'] or changes['moved']:
+                cursor.execute('''
+                UPDATE Shops
+                SET shop_name = ?, latitude = ?, longitude = ?
+                WHERE shop_id = ?
+                ''', (new_name, new_latitude, new_longitude, shop_id))
+            changes.update(self._sync_lines(cursor, 'ShopInventory', 'shop_id', shop_id, new_inventory))
+            if changes['moved']:
+                spatial.index_shop(cursor, shop_id, new_latitude, new_longitude)
+
+        if changes['renamed'] or changes['moved']:
+            self._invalidate_shop_positions([tuple(old_position), (new_latitude, new_longitude)])
+        elif self.query_cache is not None and (changes['added'] or changes['removed'] or changes['changed']):
+            # Only results that need one of the touched ingredients can change
+            self.query_cache.invalidate_location(new_latitude, new_longitude,
+                                                 changes['added'] + changes['removed'] + changes['changed'])
+        return changes
+
+    def delete_shop(self, shop_id):
+        """Delete a shop. Returns False (writing nothing) if there is no such shop."""
+        with self.conn_shops:
+            cursor = self.conn_shops.cursor()
+            old_position = self._shop_position(cursor, shop_id)
+            if old_position is None:
+                return False
+            cursor.execute('DELETE FROM ShopInventory WHERE shop_id = ?', (shop_id,))
+            cursor.execute('DELETE FROM Shops WHERE shop_id = ?', (shop_id,))
+            spatial.unindex_shop(cursor, shop_id)
+        self._invalidate_shop_positions([old_position])
+        return True
@@ -0,0 +1,117 @@
+"""
+Shared ingredient dictionary.
+
+Every ingredient name is interned once in Ingredients(ingredient_id,
+canonical_name). The table lives in its own database file, ingredients.db,
+which is attached to both the recipes and the shops connection as the
+"dictionary" schema. RecipeIngredients and ShopInventory only store the
+integer ingredient_id, so matching recipes against shop inventories compares
+integers, and the two databases agree on the ids.
+
+Names are canonicalized by collapsing whitespace and lower-casing. New names
+are written through the dictionary's own autocommit connection, so an id that
+has been handed out is never rolled back together with a data transaction and
+can be cached for the life of the process.
+"""
+import json
+import sqlite3
+import threading
+
+SCHEMA = 'dictionary'
+
+# Names are resolved in batches of this size when talking to SQLite
+LOOKUP_BATCH_SIZE = 5000
+
+
+def canonical_name(name):
+    """Collapse whitespace and case so "Olive  Oil" and "olive oil" intern to the same id."""
+    if name is None:
+        return None
+    canonical = ' '.join(name.split()).lower()
+    return canonical or None
+
+
+def attach_dictionary(conn, path):
+    """Attach ingredients.db to a data connection so SQL can join Ingredients by id."""
+    conn.execute(f'ATTACH DATABASE ? AS {SCHEMA}', (path,))
+
+
+class IngredientDictionary:
+    """Process-wide view of the Ingredients table with name <-> id caches."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS Ingredients (
+            ingredient_id INTEGER PRIMARY KEY,
+            canonical_name TEXT NOT NULL UNIQUE
+        )
+        ''')
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._names = {}
+
+    @classmethod
+    def for_attached(cls, cursor):
+        """Open the dictionary that is attached to the cursor's connection."""
+        cursor.execute('PRAGMA database_list')
+        for _, name, path in cursor.fetchall():
+            if name == SCHEMA:
+                return cls(path)
+        raise sqlite3.OperationalError(f"No '{SCHEMA}' database is attached")
+
+    def close(self):
+        self.conn.close()
+
+    def intern(self, name):
+        return self.intern_many([name])[0]
+
+    def intern_many(self, names):
+        """Return the ingredient_id of every name, adding unknown names. None stays None."""
+        return self._resolve(names, create=True)
+
+    def lookup_many(self, names):
+        """Like intern_many() but unknown names map to None instead of being added."""
+        return self._resolve(names, create=False)
+
+    def _resolve(self, names, create):
+        canonical = [canonical_name(name) for name in names]
+        with self._lock:
+            missing = list({name for name in canonical if name is not None and name not in self._ids})
+            for start in range(0, len(missing), LOOKUP_BATCH_SIZE):
+                batch = missing[start:start + LOOKUP_BATCH_SIZE]
+                if create:
+                    self.conn.execute('BEGIN')
+                    self.conn.executemany('INSERT OR IGNORE INTO Ingredients (canonical_name) VALUES (?)',
+                                          [(name,) for name in batch])
+                    self.conn.execute('COMMIT')
+                rows = self.conn.execute('''
+                    SELECT ingredient_id, canonical_name FROM Ingredients
+                    WHERE canonical_name IN (SELECT value FROM json_each(?))
+                ''', (json.dumps(batch),)).fetchall()
+                self._remember(rows)
+            return [self._ids.get(name) for name in canonical]
+
+    def name_of(self, ingredient_id):
+        return self.names_of([ingredient_id])[0]
+
+    def names_of(self, ingredient_ids):
+        """Return the canonical name of every id (None for None or unknown ids)."""
+        with self._lock:
+            missing = list({ingredient_id for ingredient_id in ingredient_ids
+                            if ingredient_id is not None and ingredient_id not in self._names})
+            for start in range(0, len(missing), LOOKUP_BATCH_SIZE):
+                rows = self.conn.execute('''
+                    SELECT ingredient_id, canonical_name FROM Ingredients
+                    WHERE ingredient_id IN (SELECT value FROM json_each(?))
+                ''', (json.dumps(missing[start:start + LOOKUP_BATCH_SIZE]),)).fetchall()
+                self._remember(rows)
+            return [self._names.get(ingredient_id) for ingredient_id in ingredient_ids]
+
+    def _remember(self, rows):
+        for ingredient_id, name in rows:
+            self._ids[name] = ingredient_id
+            self._names[ingredient_id] = name
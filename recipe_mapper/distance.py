@@ -0,0 +1,90 @@
+"""
+Batch distance engine for radius queries.
+
+Instead of one geodesic per shop, distances are computed for whole arrays of
+shop coordinates: a bounding-box test rejects clear misses, NumPy haversine
+handles the rest, and the exact WGS84 geodesic is only evaluated for shops
+whose haversine distance lies close enough to radius_km that the spherical
+approximation could flip the inside/outside decision.
+"""
+import math
+
+import numpy as np
+
+from recipe_mapper import instrumentation, spatial
+
+# IUGG mean Earth radius, the best single radius for haversine on WGS84
+EARTH_MEAN_RADIUS_KM = 6371.0088
+
+# Haversine on the mean radius differs from the WGS84 geodesic by at most
+# ~0.56%. Anything within this relative band of the radius is re-checked exactly.
+BOUNDARY_TOLERANCE = 0.0075
+
+
+def geodesic_km(coord1, coord2):
+    # Only needed for shops near the boundary. geopy computes it with
+    # geographiclib; calling that directly skips importing geopy's geocoders
+    # (and requests), which dominated the start-up of one-off CLI queries.
+    try:
+        from geographiclib.geodesic import Geodesic
+    except ImportError:
+        from geopy.distance import geodesic
+        return geodesic(coord1, coord2).kilometers
+    return Geodesic.WGS84.Inverse(coord1[0], coord1[1], coord2[0], coord2[1], Geodesic.DISTANCE)['s12'] / 1000.0
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - math.radians(longitude)
+    h = np.sin(dlat / 2.0) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_MEAN_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def bounding_box_mask(user_location, latitudes, longitudes, radius_km):
+    mask = np.zeros(latitudes.shape, dtype=bool)
+    for min_lat, max_lat, min_lon, max_lon in spatial.bounding_boxes(user_location, radius_km):
+        mask |= ((latitudes >= min_lat) & (latitudes <= max_lat)
+                 & (longitudes >= min_lon) & (longitudes <= max_lon))
+    return mask
+
+
+def batch_distances(user_location, latitudes, longitudes, radius_km):
+    """
+    Return an array with the distance in km from user_location to each shop,
+    or inf for shops further away than radius_km.
+
+    `distances <= radius_km` gives exactly the same decisions as comparing the
+    geodesic distance of every shop. Distances of shops well inside the radius
+    are haversine values (within 0.6% of the geodesic); shops near the
+    boundary get the exact geodesic distance.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    distances = np.full(latitudes.shape, np.inf)
+    if latitudes.size == 0 or radius_km < 0:
+        return distances
+
+    # Step 1: Reject clear misses with the bounding box
+    candidates = np.flatnonzero(bounding_box_mask(user_location, latitudes, longitudes, radius_km))
+    if candidates.size == 0:
+        return distances
+
+    # Step 2: Vectorized haversine for the remaining shops
+    approx = haversine_km(user_location[0], user_location[1], latitudes[candidates], longitudes[candidates])
+    instrumentation.count('haversine_distances', int(candidates.size))
+    margin = radius_km * BOUNDARY_TOLERANCE
+    inside = approx < radius_km - margin
+    distances[candidates[inside]] = approx[inside]
+
+    # Step 3: Exact geodesic only for shops in the boundary band
+    boundary = candidates[np.abs(approx - radius_km) <= margin]
+    instrumentation.count('geodesic_distances', int(boundary.size))
+    for index in boundary:
+        distance = geodesic_km(user_location, (latitudes[index], longitudes[index]))
+        if distance <= radius_km:
+            distances[index] = distance
+
+    return distances
@@ -0,0 +1,118 @@
+"""
+Background execution of read queries for an event-loop GUI.
+
+A QueryExecutor runs query functions on one worker thread that opens its own
+Database, so the GUI thread's connections are never shared across threads.
+Every submit() starts a new generation and cancels the previous one: a job
+that has not started yet is skipped, and one that is inside SQLite is
+interrupted through sqlite3.Connection.interrupt(). Interrupting only stops a
+statement that is already running, so the worker's connections also get a
+progress handler that aborts any statement a superseded job starts later.
+Results come back through
+a queue that the GUI thread drains with deliver() (e.g. from a Tk
+root.after() loop), and results of superseded generations are dropped, so a
+slow old search can never overwrite a newer one.
+"""
+import queue
+import threading
+
+# SQLite VM instructions between checks for a superseded job
+PROGRESS_STEPS = 1000
+
+
+class QueryExecutor:
+
+    def __init__(self, open_database):
+        self._open_database = open_database
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._delivered = 0
+        self._running = None
+        self._db = None
+        self._thread = threading.Thread(target=self._run, name='query-executor', daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args, on_result=None, on_error=None):
+        """
+        Run function(db, *args) on the worker, cancelling the previous job.
+        on_result(result) or on_error(exception) is called from deliver().
+        Returns the job's generation.
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._interrupt_running()
+        self._jobs.put((generation, function, args, on_result, on_error))
+        return generation
+
+    def cancel(self):
+        """Drop the current job: skip it if queued, interrupt it if running, ignore its result."""
+        with self._lock:
+            self._generation += 1
+            self._delivered = self._generation
+            self._interrupt_running()
+
+    def _interrupt_running(self):
+        # Called with the lock held, so the worker cannot start the next job
+        # in between and be interrupted by mistake.
+        if self._running is not None and self._running != self._generation and self._db is not None:
+            self._db.conn_recipes.interrupt()
+            self._db.conn_shops.interrupt()
+
+    @property
+    def busy(self):
+        """True while the latest job's result has not been delivered."""
+        return self._delivered != self._generation
+
+    def deliver(self):
+        """
+        Call on the GUI thread: run the callbacks of finished jobs that are
+        still current. Returns busy.
+        """
+        while True:
+            try:
+                generation, callback, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._generation:
+                continue  # Superseded by a newer search
+            self._delivered = generation
+            if callback is not None:
+                callback(value)
+        return self.busy
+
+    def shutdown(self):
+        self.cancel()
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _superseded(self):
+        # SQLite progress handler: a non-zero return aborts the statement.
+        return self._running is not None and self._running != self._generation
+
+    def _run(self):
+        self._db = self._open_database()
+        for conn in (self._db.conn_recipes, self._db.conn_shops):
+            conn.set_progress_handler(self._superseded, PROGRESS_STEPS)
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                generation, function, args, on_result, on_error = job
+                with self._lock:
+                    if generation != self._generation:
+                        continue  # Cancelled before it started
+                    self._running = generation
+                try:
+                    outcome = (on_result, function(self._db, *args))
+                except Exception as e:
+                    outcome = (on_error, e)
+                finally:
+                    with self._lock:
+                        self._running = None
+                self._results.put((generation, *outcome))
+        finally:
+            self._db.close()
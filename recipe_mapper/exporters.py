@@ -0,0 +1,313 @@
+"""
+Streaming exports of the catalogue and of shopping lists as CSV, JSONL or PDF.
+
+Three kinds of record can be exported:
+
+    recipes          every recipe with its parsed ingredient lines
+    shops            every shop with its inventory
+    shopping lists   the shops and items to buy for a batch of
+                     (recipe_id, location, radius) requests
+
+The catalogue records are grouped straight off the ordered cursors of
+Database.recipe_lines() and Database.inventory_lines(), one recipe or shop at a
+time, and shopping lists come out of batch.find_shops_batch() as each request
+is planned. Every writer writes a record as soon as it gets it, so the rows
+are never collected into lists and memory stays flat however many there are.
+PDFs are written a page at a time by a small writer of their own (reportlab
+keeps every page of a document until it saves it), in the built-in Courier
+font: it is monospaced, so lines wrap by their number of characters.
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        export(db, 'recipes', 'csv', f)
+"""
+import csv
+import itertools
+import json
+import textwrap
+import zlib
+
+RECIPE_FIELDS = ['recipe_id', 'recipe_name', 'ingredient', 'quantity', 'unit', 'canonical_quantity', 'unit_family']
+SHOP_FIELDS = ['shop_id', 'shop_name', 'latitude', 'longitude', 'external_id', 'ingredient', 'quantity', 'unit']
+SHOPPING_LIST_FIELDS = ['id', 'recipe_id', 'type', 'route_km', 'stop', 'shop_name', 'ingredient', 'quantity', 'unit']
+
+# Shopping list requests planned together; see batch.py
+SHOPPING_LIST_BATCH_SIZE = 1000
+
+# US Letter, in points
+PDF_PAGE_SIZE = (612, 792)
+PDF_FONT_SIZE = 9
+PDF_TITLE_FONT_SIZE = 14
+PDF_LEADING = 12
+PDF_MARGIN = 50
+# Every Courier glyph is 0.6 em wide
+_COURIER_ADVANCE = 0.6
+
+
+def _amount(quantity, unit):
+    """'250 g', or just '2' for a count."""
+    return ' '.join(part for part in ('' if quantity is None else f"{quantity:g}", unit or '') if part)
+
+
+# Records
+
+def recipe_records(db):
+    """Yield {'type': 'recipe', 'recipe_id', 'name', 'ingredients': [...]} for every recipe, in name order."""
+    for (recipe_id, recipe_name), rows in itertools.groupby(db.recipe_lines(), key=lambda row: row[:2]):
+        yield {'type': 'recipe', 'recipe_id': recipe_id, 'name': recipe_name, 'ingredients': [
+            {'name': name, 'quantity': quantity, 'unit': unit, 'canonical_quantity': canonical_quantity,
+             'unit_family': family}
+            for _, _, name, quantity, unit, canonical_quantity, family in rows if name is not None]}
+
+
+def shop_records(db):
+    """
+    Yield {'type': 'shop', 'shop_id', 'name', 'latitude', 'longitude',
+    'external_id', 'inventory': [...]} for every shop, in name order.
+    """
+    for (shop_id, shop_name, latitude, longitude, external_id), rows in itertools.groupby(
+            db.inventory_lines(), key=lambda row: row[:5]):
+        yield {'type': 'shop', 'shop_id': shop_id, 'name': shop_name, 'latitude': latitude, 'longitude': longitude,
+               'external_id': external_id, 'inventory': [{'name': name, 'quantity': quantity, 'unit': unit}
+                                                         for *_, name, quantity, unit in rows if name is not None]}
+
+
+def shopping_list(result):
+    """
+    The items of a 'single' or 'multiple' find-shops result as dicts with
+    'stop', 'shop_id', 'shop_name', 'ingredient', 'quantity' and 'unit',
+    ordered by the stop (the position of the shop in result['shops']).
+    """
+    stop_numbers = {shop['shop_id']: stop for stop, shop in enumerate(result['shops'], start=1)}
+    items = [{'stop': stop_numbers[shop['shop_id']], 'shop_id': shop['shop_id'], 'shop_name': shop['shop_name'],
+              'ingredient': ingredient, 'quantity': result['ingredients_needed'][ingredient]['quantity'],
+              'unit': result['ingredients_needed'][ingredient]['unit']}
+             for ingredient, shop in result['ingredient_to_shop'].items()]
+    items.sort(key=lambda item: item['stop'])
+    return items
+
+
+def shopping_list_records(db, requests, batch_size=SHOPPING_LIST_BATCH_SIZE):
+    """
+    Plan (id, recipe_id, user_location, radius_km) requests in batches and
+    yield one record per request as it is planned: {'id', 'recipe_id', 'type'
+    (the find-shops result type), 'items': shopping_list()} plus 'route_km'
+    for a route, or the result's 'message' / 'ingredient' when there is none.
+    requests can be any iterable; only one batch is held at a time.
+    """
+    from recipe_mapper import routing
+    from recipe_mapper.batch import find_shops_batch
+
+    requests = iter(requests)
+    while True:
+        chunk = list(itertools.islice(requests, batch_size))
+        if not chunk:
+            return
+        for index, result in find_shops_batch(db, [request[1:] for request in chunk]):
+            request_id, recipe_id, user_location, _ = chunk[index]
+            record = {'id': request_id, 'recipe_id': recipe_id, 'type': result['type'], 'items': []}
+            if result['type'] in ('single', 'multiple'):
+                routing.add_route(result, user_location)
+                record['route_km'] = result['route_km']
+                record['items'] = shopping_list(result)
+            for key in ('message', 'ingredient'):
+                if key in result:
+                    record[key] = result[key]
+            yield record
+
+
+# Flat rows (CSV) and text lines (PDF) of one record
+
+def _recipe_rows(record):
+    base = {'recipe_id': record['recipe_id'], 'recipe_name': record['name']}
+    if not record['ingredients']:
+        return [base]
+    return [{**base, 'ingredient': item['name'], 'quantity': item['quantity'], 'unit': item['unit'],
+             'canonical_quantity': item['canonical_quantity'], 'unit_family': item['unit_family']}
+            for item in record['ingredients']]
+
+
+def _recipe_lines(record):
+    return [record['name'], *(f"    {_amount(item['quantity'], item['unit'])} {item['name']}"
+                              for item in record['ingredients']), '']
+
+
+def _shop_rows(record):
+    base = {'shop_id': record['shop_id'], 'shop_name': record['name'], 'latitude': record['latitude'],
+            'longitude': record['longitude'], 'external_id': record['external_id']}
+    if not record['inventory']:
+        return [base]
+    return [{**base, 'ingredient': item['name'], 'quantity': item['quantity'], 'unit': item['unit']}
+            for item in record['inventory']]
+
+
+def _shop_lines(record):
+    return [f"{record['name']} ({record['latitude']:.5f}, {record['longitude']:.5f})",
+            *(f"    {_amount(item['quantity'], item['unit'])} {item['name']}" for item in record['inventory']), '']
+
+
+def _shopping_list_rows(record):
+    base = {'id': record['id'], 'recipe_id': record['recipe_id'], 'type': record['type'],
+            'route_km': record.get('route_km')}
+    if not record['items']:
+        # An 'unavailable' list names the ingredient no shop nearby has
+        if 'ingredient' in record:
+            return [{**base, 'ingredient': record['ingredient']}]
+        return [base]
+    return [{**base, 'stop': item['stop'], 'shop_name': item['shop_name'], 'ingredient': item['ingredient'],
+             'quantity': item['quantity'], 'unit': item['unit']}
+            for item in record['items']]
+
+
+def shopping_list_line(item):
+    """One item of shopping_list() as a line of text."""
+    return (f"Stop {item['stop']}: {item['ingredient']}: {_amount(item['quantity'], item['unit'])} "
+            f"- Buy from {item['shop_name']}")
+
+
+def _shopping_list_lines(record):
+    heading = f"{record['id']}: recipe {record['recipe_id']}"
+    if 'route_km' in record:
+        heading += f", route {record['route_km']:.2f} km"
+    elif 'ingredient' in record:
+        heading += f": {record['ingredient']} is not available in any nearby shop"
+    else:
+        heading += f": {record.get('message') or record['type']}"
+    return [heading, *(f"    {shopping_list_line(item)}" for item in record['items']), '']
+
+
+_LAYOUTS = {
+    'recipes': (RECIPE_FIELDS, _recipe_rows, _recipe_lines, 'Recipes'),
+    'shops': (SHOP_FIELDS, _shop_rows, _shop_lines, 'Shops'),
+    'shopping-lists': (SHOPPING_LIST_FIELDS, _shopping_list_rows, _shopping_list_lines, 'Shopping Lists'),
+}
+
+
+# Writers
+
+def write_csv(rows, fieldnames, stream):
+    """Write dict rows under a header of fieldnames; returns the number of rows."""
+    writer = csv.DictWriter(stream, fieldnames=fieldnames)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(records, stream):
+    """Write one JSON object per line; returns the number of records."""
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record) + '\n')
+        count += 1
+    return count
+
+
+def _pdf_string(text):
+    data = text.encode('cp1252', errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _text(font_size, x, y, text):
+    """Content stream operators drawing text at (x, y)."""
+    return f"BT /F1 {font_size} Tf {x:.1f} {y:.1f} Td {_pdf_string(text).decode('latin-1')} Tj ET"
+
+
+class _PdfWriter:
+    """
+    Writes a PDF to a binary stream one page at a time. Only the byte offset
+    of every object is kept for the cross-reference table at the end.
+    """
+
+    _CATALOG, _PAGES, _FONT, _INFO = 1, 2, 3, 4
+
+    def __init__(self, stream, title):
+        self._stream = stream
+        self._offsets = {}
+        self._page_ids = []
+        stream.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._write_object(self._CATALOG, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self._write_object(self._FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier '
+                                       b'/Encoding /WinAnsiEncoding >>')
+        self._write_object(self._INFO, b'<< /Title ' + _pdf_string(title) + b' /Producer (Recipe Mapper) >>')
+
+    def _write_object(self, object_id, body):
+        self._offsets[object_id] = self._stream.tell()
+        self._stream.write(b'%d 0 obj\n' % object_id + body + b'\nendobj\n')
+
+    def add_page(self, content):
+        """Add a page drawn by content, a list of PDF content stream operators."""
+        data = zlib.compress('\n'.join(content).encode('latin-1'))
+        content_id = len(self._offsets) + 2  # Object 2 (the page tree) is written last
+        self._write_object(content_id, b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(data) + data
+                           + b'\nendstream')
+        self._page_ids.append(content_id + 1)
+        self._write_object(content_id + 1, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+                                           b'/Resources << /Font << /F1 3 0 R >> >> >>'
+                           % (*PDF_PAGE_SIZE, content_id))
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self._page_ids)
+        self._write_object(self._PAGES, b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % len(self._page_ids))
+        xref_offset = self._stream.tell()
+        self._stream.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(self._offsets) + 1))
+        for object_id in range(1, len(self._offsets) + 1):
+            self._stream.write(b'%010d 00000 n \n' % self._offsets[object_id])
+        self._stream.write(b'trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                           % (len(self._offsets) + 1, xref_offset))
+
+
+def write_pdf(lines, path, title):
+    """
+    Write text lines to a PDF at path under a title, wrapping lines wider than
+    the page (leading spaces indent the line and its continuations) and
+    starting new pages as needed. Returns the number of lines.
+    """
+    width, height = PDF_PAGE_SIZE
+    columns = int((width - 2 * PDF_MARGIN) / (PDF_FONT_SIZE * _COURIER_ADVANCE))
+    top = height - PDF_MARGIN
+    count = 0
+    with open(path, 'wb') as f:
+        pdf = _PdfWriter(f, title)
+        content = [_text(PDF_TITLE_FONT_SIZE, PDF_MARGIN, top, title)]
+        y = top - 2 * PDF_LEADING
+        for line in lines:
+            count += 1
+            text = line.lstrip(' ')
+            indent = min(len(line) - len(text), columns // 2)
+            for piece in textwrap.wrap(text, columns - indent) or ['']:
+                if y < PDF_MARGIN:
+                    pdf.add_page(content)
+                    content, y = [], top
+                content.append(_text(PDF_FONT_SIZE, PDF_MARGIN + indent * PDF_FONT_SIZE * _COURIER_ADVANCE, y, piece))
+                y -= PDF_LEADING
+        pdf.add_page(content)
+        pdf.close()
+    return count
+
+
+def export(db, kind, export_format, output, requests=None):
+    """
+    Export every record of kind ('recipes', 'shops' or 'shopping-lists', which
+    also needs the requests of shopping_list_records()) as export_format.
+    output is a text stream for 'csv' and 'jsonl' and a file path for 'pdf'.
+    Returns the number of records, rows or lines written.
+    """
+    if kind == 'recipes':
+        records = recipe_records(db)
+    elif kind == 'shops':
+        records = shop_records(db)
+    elif kind == 'shopping-lists':
+        records = shopping_list_records(db, requests)
+    else:
+        raise ValueError(f"Unknown export kind: {kind!r}")
+    fieldnames, to_rows, to_lines, title = _LAYOUTS[kind]
+
+    if export_format == 'jsonl':
+        return write_jsonl(records, output)
+    if export_format == 'csv':
+        return write_csv((row for record in records for row in to_rows(record)), fieldnames, output)
+    if export_format == 'pdf':
+        return write_pdf((line for record in records for line in to_lines(record)), output, title)
+    raise ValueError(f"Unknown export format: {export_format!r}")
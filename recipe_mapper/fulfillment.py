@@ -0,0 +1,195 @@
+"""
+Choosing which shops to visit for a shopping list.
+
+This is a weighted set cover: every shop covers some of the required
+ingredients, and the goal is to cover all of them with as few shops as
+possible, breaking ties by the smallest total distance to the shops.
+
+Strategies are plain functions registered in OPTIMIZERS:
+
+    strategy(candidates, required_mask, deadline) -> list of candidate indexes
+
+where candidates is a list of (mask, distance) pairs, one per shop, with bit i
+of mask set when the shop covers ingredient i. 'greedy' is the classic
+greedy set cover; 'exact' is a branch-and-bound that proves the optimum for
+small instances and returns the best cover found so far when the time budget
+runs out. 'auto' (the default) uses the exact search when there are at most
+EXACT_MAX_SHOPS useful shops and the greedy cover otherwise.
+"""
+import time
+
+DEFAULT_TIME_BUDGET = 0.5  # seconds
+EXACT_MAX_SHOPS = 40
+# Above this many shops the dominance filter runs in NumPy
+VECTORIZE_MIN_SHOPS = 200
+
+
+def _cost(candidates, chosen):
+    return len(chosen), sum(candidates[index][1] for index in chosen)
+
+
+def _drop_redundant(candidates, chosen, required_mask):
+    """Remove shops whose ingredients are all covered by the other chosen shops, farthest first."""
+    chosen = sorted(chosen, key=lambda index: candidates[index][1], reverse=True)
+    for index in list(chosen):
+        others = 0
+        for other in chosen:
+            if other != index:
+                others |= candidates[other][0]
+        if others & required_mask == required_mask:
+            chosen.remove(index)
+    return chosen
+
+
+def greedy_cover(candidates, required_mask, deadline=None):
+    """Repeatedly take the shop covering the most uncovered ingredients, the closest on ties."""
+    uncovered = required_mask
+    chosen = []
+    while uncovered:
+        best_index = None
+        best_key = None
+        for index, (mask, distance) in enumerate(candidates):
+            gain = bin(mask & uncovered).count('1')
+            if gain and (best_key is None or (gain, -distance) > best_key):
+                best_index, best_key = index, (gain, -distance)
+        if best_index is None:
+            return None
+        chosen.append(best_index)
+        uncovered &= ~candidates[best_index][0]
+    return _drop_redundant(candidates, chosen, required_mask)
+
+
+def exact_cover(candidates, required_mask, deadline=None):
+    """
+    Branch-and-bound over the shops covering the hardest remaining ingredient,
+    seeded with the greedy cover as the incumbent.
+    """
+    best = greedy_cover(candidates, required_mask)
+    if best is None:
+        return None
+    best_cost = _cost(candidates, best)
+    max_gain = max(bin(mask & required_mask).count('1') for mask, _ in candidates)
+
+    # Shops that cover each ingredient bit, most useful and closest first
+    covering = {}
+    bit = 1
+    while bit <= required_mask:
+        if bit & required_mask:
+            covering[bit] = sorted((index for index, (mask, _) in enumerate(candidates) if mask & bit),
+                                   key=lambda index: (-bin(candidates[index][0] & required_mask).count('1'),
+                                                      candidates[index][1]))
+        bit <<= 1
+
+    def search(chosen, uncovered, distance):
+        nonlocal best, best_cost
+        if deadline is not None and time.perf_counter() > deadline:
+            return
+        if not uncovered:
+            if (len(chosen), distance) < best_cost:
+                best, best_cost = list(chosen), (len(chosen), distance)
+            return
+        # Every further shop covers at most max_gain ingredients
+        remaining = bin(uncovered).count('1')
+        lower_bound = len(chosen) + -(-remaining // max_gain)
+        if (lower_bound, distance) >= best_cost:
+            return
+        hardest = min((bit for bit in covering if bit & uncovered), key=lambda bit: len(covering[bit]))
+        for index in covering[hardest]:
+            chosen.append(index)
+            search(chosen, uncovered & ~candidates[index][0], distance + candidates[index][1])
+            chosen.pop()
+
+    search([], required_mask, 0.0)
+    return best
+
+
+def auto_cover(candidates, required_mask, deadline=None):
+    if len(candidates) <= EXACT_MAX_SHOPS:
+        return exact_cover(candidates, required_mask, deadline)
+    return greedy_cover(candidates, required_mask, deadline)
+
+
+OPTIMIZERS = {
+    'greedy': greedy_cover,
+    'exact': exact_cover,
+    'auto': auto_cover,
+}
+
+
+def _useful_candidates(shops, coverage, bits):
+    """
+    Turn shops into (mask, distance) candidates, dropping shops that cover
+    nothing and shops dominated by a closer shop covering a superset.
+    """
+    masked_shops = []
+    for shop in sorted(shops, key=lambda shop: shop['distance']):
+        mask = 0
+        for ingredient in coverage.get(shop['shop_id'], ()):
+            mask |= bits.get(ingredient, 0)
+        if mask:
+            masked_shops.append((mask, shop))
+    if len(bits) <= 64 and len(masked_shops) > VECTORIZE_MIN_SHOPS:
+        return _undominated_numpy(masked_shops)
+
+    candidates = []
+    for mask, shop in masked_shops:
+        if not any(other_mask | mask == other_mask for other_mask, _, _ in candidates):
+            candidates.append((mask, shop['distance'], shop))
+    return candidates
+
+
+def _undominated_numpy(masked_shops):
+    """
+    The dominance filter of _useful_candidates() for masks of up to 64 bits:
+    each shop is compared with all kept shops in one NumPy operation, so a
+    meal plan with thousands of nearby shops does not pay a quadratic
+    Python loop.
+    """
+    import numpy as np
+
+    kept = np.empty(len(masked_shops), dtype=np.uint64)
+    candidates = []
+    for mask, shop in masked_shops:
+        value = np.uint64(mask)
+        previous = kept[:len(candidates)]
+        if ((previous | value) == previous).any():
+            continue
+        kept[len(candidates)] = value
+        candidates.append((mask, shop['distance'], shop))
+    return candidates
+
+
+def plan_fulfillment(shops, coverage, ingredients, strategy='auto', time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Choose the shops to visit.
+
+    shops are dicts with at least 'shop_id' and 'distance'; coverage maps a
+    shop_id to the ingredients that shop can supply in sufficient quantity.
+    Returns (selected_shops sorted by distance, ingredient_to_shop) where every
+    ingredient goes to the closest selected shop that has it. Raises
+    ValueError when an ingredient is not available in any of the shops.
+    """
+    ingredients = list(ingredients)
+    bits = {ingredient: 1 << position for position, ingredient in enumerate(ingredients)}
+    required_mask = (1 << len(ingredients)) - 1
+    useful = _useful_candidates(shops, coverage, bits)
+
+    available = 0
+    for mask, _, _ in useful:
+        available |= mask
+    for ingredient in ingredients:
+        if not available & bits[ingredient]:
+            raise ValueError(f"Ingredient '{ingredient}' is not available in any shop")
+    if not ingredients:
+        return [], {}
+
+    candidates = [(mask, distance) for mask, distance, _ in useful]
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    chosen = OPTIMIZERS[strategy](candidates, required_mask, deadline)
+
+    selected_shops = sorted((useful[index][2] for index in chosen), key=lambda shop: shop['distance'])
+    ingredient_to_shop = {}
+    for ingredient in ingredients:
+        ingredient_to_shop[ingredient] = next(shop for shop in selected_shops
+                                              if ingredient in coverage.get(shop['shop_id'], ()))
+    return selected_shops, ingredient_to_shop
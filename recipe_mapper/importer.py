@@ -0,0 +1,373 @@
+"""
+High-throughput bulk import of recipe datasets.
+
+The dataset's "recipes" array is stream-parsed one recipe at a time, so the
+whole file never has to fit in memory. Recipes are written in chunks: one
+executemany() per table and one transaction per chunk, with INSERT OR IGNORE
+and a duplicate counter instead of catching IntegrityError per row.
+
+Ingredient parsing runs in a process pool, one chunk per task, while this
+process keeps reading the file and acts as the single SQLite writer. Parsed
+chunks are written in the order they were read, so the result does not
+depend on the number of workers.
+
+Each chunk's transaction also records a checkpoint: the SHA-256 of the file
+and how many of its entries have been written. If an import is interrupted
+(a crash, or a stop requested by the caller), importing the same file again
+skips straight past those entries. The checkpoint is removed once the file
+has been imported completely.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+
+from recipe_mapper import migrations, recipe_index, units
+from recipe_mapper.ingredients import parse_many
+
+DEFAULT_CHUNK_SIZE = 1000
+READ_SIZE = 1 << 16
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class _JsonStream:
+    """Incremental reader for the handful of JSON tokens the importer needs."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size=READ_SIZE):
+        if self.eof:
+            return False
+        if self.pos > READ_SIZE:
+            # Drop what has already been consumed
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON dataset")
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Malformed JSON dataset: expected one of {chars!r}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Value not complete yet; read at least as much again as is buffered
+                if not self._fill(max(READ_SIZE, len(self.buf) - self.pos)):
+                    raise
+                continue
+            if end == len(self.buf) and self._fill():
+                # A number may continue in the next block
+                continue
+            self.pos = end
+            return value
+
+
+def iter_recipes(file_path):
+    """Yield the entries of the top-level "recipes" array one at a time."""
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        yield from iter_json_array(f)
+
+
+def iter_json_array(f, key='recipes'):
+    """Yield the entries of the array under key in the top-level object of a text stream one at a time."""
+    stream = _JsonStream(f)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name == key:
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.pos += 1
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.expect(',]') == ']':
+                        break
+        else:
+            stream.value()
+        if stream.expect(',}') == '}':
+            return
+
+
+def file_fingerprint(file_path):
+    """SHA-256 hex digest of a file's contents, identifying it for checkpoints."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_checkpoint(conn, file_hash):
+    """Number of entries of the file already imported, or 0."""
+    row = conn.execute('SELECT records_done FROM ImportCheckpoints WHERE file_hash = ?', (file_hash,)).fetchone()
+    return row[0] if row else 0
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_chunk(recipes):
+    """
+    Parse the ingredient strings of one chunk of (recipe_name, ingredient
+    strings) pairs. Runs in the worker processes.
+    """
+    parsed_recipes = []
+    for recipe_name, ingredient_strs in recipes:
+        ingredients = [(parsed['name'], parsed['quantity'], parsed['unit'])
+                       for parsed in parse_many(ingredient_strs)]
+        parsed_recipes.append((recipe_name, ingredients))
+    return parsed_recipes
+
+
+def _write_chunk(conn, dictionary, recipes, checkpoint=None):
+    """
+    Insert one chunk of (recipe_name, parsed ingredients) pairs in a single
+    transaction, together with the (file_hash, records_done) checkpoint if
+    given. Returns (recipes inserted, ingredient rows inserted). On error
+    the caller rolls the transaction back.
+    """
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    # Recipes.recipe_id is AUTOINCREMENT, so everything this chunk inserts gets
+    # an id above the current maximum.
+    cursor.execute('SELECT COALESCE(MAX(recipe_id), 0) FROM Recipes')
+    last_id = cursor.fetchone()[0]
+    cursor.executemany('INSERT OR IGNORE INTO Recipes (recipe_name) VALUES (?)',
+                       [(recipe_name,) for recipe_name, _ in recipes])
+    cursor.execute('SELECT recipe_name, recipe_id FROM Recipes WHERE recipe_id > ?', (last_id,))
+    new_ids = dict(cursor.fetchall())
+    inserted = len(new_ids)
+
+    new_recipe_ids = list(new_ids.values())
+    ingredient_rows = []
+    for recipe_name, ingredients in recipes:
+        # pop() so a name repeated inside the chunk only gets its first ingredient list
+        recipe_id = new_ids.pop(recipe_name, None)
+        if recipe_id is None:
+            continue
+        ingredient_rows.extend((recipe_id, name, quantity, unit) for name, quantity, unit in ingredients)
+    ingredient_ids = dictionary.intern_many([name for _, name, _, _ in ingredient_rows])
+    # One row per recipe, ingredient and unit family, as the unique index requires
+    ingredient_rows = [(*key, quantity, unit, canonical_quantity, family)
+                       for key, quantity, unit, canonical_quantity, family in units.merge_lines(
+                           ((recipe_id, ingredient_id), quantity, unit)
+                           for (recipe_id, _, quantity, unit), ingredient_id in zip(ingredient_rows, ingredient_ids))]
+    cursor.executemany('''
+        INSERT INTO RecipeIngredients (recipe_id, ingredient_id, quantity, unit, canonical_quantity, unit_family)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', ingredient_rows)
+    # Counted from the rows in hand: with deferred indexes a per-recipe
+    # refresh_recipe_counts() would scan the whole table for every recipe
+    recipe_ingredient_ids = {recipe_id: [] for recipe_id in new_recipe_ids}
+    for recipe_id, ingredient_id, *_ in ingredient_rows:
+        recipe_ingredient_ids[recipe_id].append(ingredient_id)
+    recipe_index.store_recipe_counts(cursor, [(recipe_id, recipe_index.required_count(ingredient_ids))
+                                              for recipe_id, ingredient_ids in recipe_ingredient_ids.items()])
+    if checkpoint is not None:
+        cursor.execute('''
+            INSERT OR REPLACE INTO ImportCheckpoints (file_hash, records_done, updated_at)
+            VALUES (?, ?, ?)
+        ''', (*checkpoint, datetime.now(timezone.utc).isoformat()))
+    conn.commit()
+    return inserted, len(ingredient_rows)
+
+
+def _read_chunks(file_path, chunk_size, stats, skip=0):
+    """
+    Yield chunks of (recipe_name, ingredient strings) after the first skip
+    entries, counting invalid entries, as (entries, recipes, bytes read) triples.
+    """
+    with open(file_path, 'rb') as raw, io.TextIOWrapper(raw, encoding='utf-8-sig') as f:
+        entries = islice(iter_json_array(f), skip, None)
+        for chunk in _chunks(entries, chunk_size):
+            recipes = []
+            for recipe in chunk:
+                if not isinstance(recipe, dict) or not isinstance(recipe.get('title'), str):
+                    stats['invalid'] += 1
+                    continue
+                ingredient_strs = [item for item in recipe.get('ingredients') or [] if isinstance(item, str)]
+                recipes.append((recipe['title'].strip(), ingredient_strs))
+            yield len(chunk), recipes, raw.tell()
+
+
+def _parsed_chunks(chunks, workers):
+    """
+    Parse chunks in a pool of worker processes and yield them in input order.
+    At most two chunks per worker are in flight, which bounds memory use.
+    """
+    if workers <= 1:
+        for size, recipes, position in chunks:
+            yield size, parse_chunk(recipes), position
+        return
+    # Workers start from a fresh interpreter rather than a fork of this
+    # process, which may be running threads (a GUI, a server). They import
+    # the caller's main module, so it must keep its work under
+    # if __name__ == '__main__'; frozen builds call multiprocessing.freeze_support()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for size, recipes, position in chunks:
+            pending.append((size, pool.submit(parse_chunk, recipes), position))
+            if len(pending) >= workers * 2:
+                size, future, position = pending.popleft()
+                yield size, future.result(), position
+        while pending:
+            size, future, position = pending.popleft()
+            yield size, future.result(), position
+
+
+class _ConsoleProgress:
+    """The tqdm bar shown when the caller does not take the progress updates itself."""
+
+    def __init__(self):
+        from tqdm import tqdm
+
+        self.bar = tqdm(desc="Importing Recipes", unit=" recipes")
+        self.done = 0
+
+    def __call__(self, update):
+        self.bar.update(update['records'] - self.done)
+        self.done = update['records']
+
+    def close(self):
+        self.bar.close()
+
+
+def bulk_import(conn, dictionary, file_path, chunk_size=DEFAULT_CHUNK_SIZE, defer_indexes=False, workers=None,
+                progress=None, stop_event=None):
+    """
+    Stream a recipe dataset into the recipes database, interning ingredient
+    names in dictionary (an IngredientDictionary). An import of the same file
+    that was interrupted earlier is resumed from its checkpoint.
+
+    workers is the number of parsing processes (default: one per CPU; 1
+    parses in this process). With defer_indexes=True the RecipeIngredients
+    indexes are dropped for the duration of the import and rebuilt once at
+    the end, which is faster for large datasets but leaves every other user
+    of the database with full table scans meanwhile, so it is meant for
+    offline loads such as the CLI's --defer-indexes.
+
+    progress, if given, is called after every committed chunk with a dict of
+    'records' (entries of the file done), 'fraction' (of the file read) and
+    'eta_seconds' (None until it can be estimated); without it a console bar
+    is shown. Setting stop_event (a threading.Event) stops the import after
+    the current chunk and keeps the checkpoint. Returns a dict of counters
+    including rows_per_second, resumed_from and stopped.
+    """
+    stats = {'recipes': 0, 'ingredients': 0, 'duplicates': 0, 'invalid': 0, 'stopped': False}
+    start = time.perf_counter()
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    file_hash = file_fingerprint(file_path)
+    file_size = os.path.getsize(file_path)
+    records_done = stats['resumed_from'] = get_checkpoint(conn, file_hash)
+    start_fraction = None
+
+    console = None
+    if progress is None:
+        progress = console = _ConsoleProgress()
+    if defer_indexes:
+        for index_name in migrations.RECIPE_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {index_name}')
+    try:
+        chunks = _read_chunks(file_path, chunk_size, stats, skip=records_done)
+        for size, recipes, position in _parsed_chunks(chunks, workers):
+            records_done += size
+            inserted, ingredient_rows = _write_chunk(conn, dictionary, recipes, (file_hash, records_done))
+            stats['recipes'] += inserted
+            stats['ingredients'] += ingredient_rows
+            stats['duplicates'] += len(recipes) - inserted
+
+            # Estimate the time left from the share of the file read since the start
+            fraction = min(position / file_size, 1.0) if file_size else 1.0
+            eta_seconds = None
+            if start_fraction is None:
+                start_fraction = fraction
+            elif fraction > start_fraction:
+                elapsed = time.perf_counter() - start
+                eta_seconds = elapsed * (1.0 - fraction) / (fraction - start_fraction)
+            progress({'records': records_done, 'fraction': fraction, 'eta_seconds': eta_seconds})
+
+            if stop_event is not None and stop_event.is_set():
+                stats['stopped'] = True
+                break
+        else:
+            # The whole file is in, so importing it again starts from the beginning
+            conn.execute('DELETE FROM ImportCheckpoints WHERE file_hash = ?', (file_hash,))
+            conn.commit()
+    except BaseException:
+        # Drop a half-written chunk, so the commit after the index rebuild
+        # below cannot save recipes without their ingredients or checkpoint
+        conn.rollback()
+        raise
+    finally:
+        if console is not None:
+            console.close()
+        if defer_indexes:
+            for index_ddl in migrations.RECIPE_INDEXES.values():
+                conn.execute(index_ddl)
+            conn.commit()
+
+    stats['seconds'] = time.perf_counter() - start
+    rows = stats['recipes'] + stats['ingredients']
+    stats['rows_per_second'] = rows / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    if console is not None:
+        # Callers with their own progress report the stats themselves
+        print(format_import_stats(stats))
+    return stats
+
+
+def format_import_stats(stats):
+    text = (f"Imported {stats['recipes']} recipes ({stats['ingredients']} ingredient rows) "
+            f"in {stats['seconds']:.1f}s, {stats['rows_per_second']:,.0f} rows/s; "
+            f"{stats['duplicates']} duplicates skipped, {stats['invalid']} invalid entries.")
+    if stats.get('resumed_from'):
+        text += f" Resumed after entry {stats['resumed_from']}."
+    if stats.get('stopped'):
+        text += " Stopped early; importing the file again resumes where it left off."
+    return text
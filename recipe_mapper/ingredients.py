@@ -0,0 +1,87 @@
+"""
+Parsing of free-text ingredient lines such as "2 cups of flour".
+
+The grammar is compiled once at import. Besides plain decimals it understands
+fractions ("1/2 cup sugar"), mixed numbers ("1 1/2 cups"), unicode vulgar
+fractions ("1 ½ tbsp oil") and ranges ("2-3 cloves garlic", "2 to 3 cloves").
+A range resolves to its upper bound so that a shop which can cover it is
+never short.
+
+Recipe corpora repeat the same lines heavily, so results are memoized in an
+LRU cache; parse_many() is the batch entry point used by imports.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+PARSE_CACHE_SIZE = 1 << 16
+
+_VULGAR_FRACTIONS = '¼½¾⅐⅑⅒⅓⅔⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞'
+
+_NUMBER = rf'''
+    (?:\d+\s+\d+\s*[/⁄]\s*\d+          # mixed number: 1 1/2
+     | \d+\s*[{_VULGAR_FRACTIONS}]      # mixed with vulgar fraction: 1 ½, 1½
+     | \d+\s*[/⁄]\s*\d+                 # fraction: 1/2
+     | \d*\.\d+ | \d+                   # decimal or integer
+     | [{_VULGAR_FRACTIONS}])           # vulgar fraction alone: ½
+'''
+
+_INGREDIENT_PATTERN = re.compile(rf'''
+    ^\s*
+    (?P<quantity>{_NUMBER})
+    (?:\s*(?:-|–|to)\s*(?P<upper>{_NUMBER}))?
+    (?:\s*(?P<unit>[^\W\d]\w*)\.?\s+(?:of\s+)?   # 2 cups of flour, 2cups flour
+     | \s+)                                    # 2 eggs
+    (?P<name>\S.*)
+''', re.VERBOSE)
+
+_NUMBER_PARTS = re.compile(rf'''
+    ^(?P<whole>\d*\.\d+|\d+)?
+    \s*
+    (?:(?P<numerator>\d+)\s*[/⁄]\s*(?P<denominator>\d+)
+     | (?P<vulgar>[{_VULGAR_FRACTIONS}]))?$
+''', re.VERBOSE)
+
+
+def _to_number(text):
+    parts = _NUMBER_PARTS.match(text.strip())
+    if not parts:
+        return None
+    value = float(parts.group('whole') or 0)
+    if parts.group('vulgar'):
+        value += unicodedata.numeric(parts.group('vulgar'))
+    elif parts.group('denominator'):
+        denominator = int(parts.group('denominator'))
+        if denominator == 0:
+            return None
+        value += int(parts.group('numerator')) / denominator
+    return value
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(ingredient_str):
+    match = _INGREDIENT_PATTERN.match(ingredient_str)
+    if match:
+        quantity = _to_number(match.group('quantity'))
+        if match.group('upper'):
+            upper = _to_number(match.group('upper'))
+            if quantity is not None and upper is not None:
+                quantity = max(quantity, upper)
+        name = match.group('name').strip()
+        if quantity is not None and name:
+            return quantity, match.group('unit'), name
+    # Handle cases without units or quantities
+    return None, None, ingredient_str.strip()
+
+
+# Function to parse ingredient string
+def parse_ingredient(ingredient_str):
+    quantity, unit, name = _parse_cached(ingredient_str)
+    return {'quantity': quantity, 'unit': unit, 'name': name}
+
+
+def parse_many(ingredient_strs):
+    """Parse a batch of ingredient lines, returning one dict per line in order."""
+    parse = _parse_cached
+    return [{'quantity': quantity, 'unit': unit, 'name': name}
+            for quantity, unit, name in map(parse, ingredient_strs)]
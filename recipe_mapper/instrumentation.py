@@ -0,0 +1,217 @@
+"""
+Per-stage timing and counters for the query pipeline.
+
+Instrumented code opens a trace around one query and marks its stages and
+counters inside it:
+
+    with instrumentation.trace('find_shops', recipe_id=recipe_id):
+        with instrumentation.stage('shop_scan'):
+            rows = ...
+        instrumentation.count('rows_scanned', len(rows))
+        instrumentation.set_result(result['type'])
+
+When the trace closes it is passed to every registered hook, a callable
+taking the finished Trace (see add_hook()). Two hooks ship here: log_trace()
+writes one DEBUG line per query to the 'recipe_mapper.instrumentation'
+logger, and a MetricsRegistry aggregates traces in memory for a stats
+endpoint or a debug view.
+
+With no hook registered trace() and stage() hand out a shared inert context
+manager and count() returns after one context variable lookup, so the
+instrumented code costs next to nothing. The current trace lives in a
+ContextVar, so queries running at the same time on different threads (the
+GUI's query worker, the server's request threads) each record into their own.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Traces a MetricsRegistry keeps for its latency percentiles and recent list
+RECENT_TRACES = 200
+
+_hooks = []
+_current = contextvars.ContextVar('recipe_mapper_trace', default=None)
+
+
+class Trace:
+    """One instrumented query: total and per-stage wall time in seconds, counters and the result type."""
+
+    __slots__ = ('name', 'attributes', 'stages', 'counters', 'result_type', 'seconds', '_start')
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.stages = {}
+        self.counters = {}
+        self.result_type = None
+        self.seconds = None
+        self._start = time.perf_counter()
+
+    def as_dict(self):
+        return {'name': self.name, 'attributes': dict(self.attributes), 'result_type': self.result_type,
+                'ms': None if self.seconds is None else self.seconds * 1000,
+                'stages_ms': {stage: seconds * 1000 for stage, seconds in self.stages.items()},
+                'counters': dict(self.counters)}
+
+
+class _Inert:
+    """Stands in for traces and stages while nothing is listening."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_INERT = _Inert()
+
+
+class _TraceContext:
+
+    def __init__(self, name, attributes):
+        self._trace = Trace(name, attributes)
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(self._trace)
+        return self._trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        query_trace = self._trace
+        query_trace.seconds = time.perf_counter() - query_trace._start
+        if exc_type is not None and query_trace.result_type is None:
+            query_trace.result_type = 'error'
+        for hook in list(_hooks):
+            try:
+                hook(query_trace)
+            except Exception:
+                logger.exception("Instrumentation hook %r failed", hook)
+        return False
+
+
+class _Stage:
+
+    __slots__ = ('_trace', '_name', '_start')
+
+    def __init__(self, query_trace, name):
+        self._trace = query_trace
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._start
+        stages = self._trace.stages
+        stages[self._name] = stages.get(self._name, 0.0) + elapsed
+        return False
+
+
+def add_hook(hook):
+    """Call hook(trace) with every finished Trace from now on."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def enabled():
+    return bool(_hooks)
+
+
+def trace(name, **attributes):
+    """Context manager recording one query named name, if any hook is registered."""
+    if not _hooks:
+        return _INERT
+    return _TraceContext(name, attributes)
+
+
+def stage(name):
+    """Context manager adding its wall time to stage name of the current trace."""
+    query_trace = _current.get()
+    if query_trace is None:
+        return _INERT
+    return _Stage(query_trace, name)
+
+
+def count(name, amount=1):
+    query_trace = _current.get()
+    if query_trace is not None:
+        query_trace.counters[name] = query_trace.counters.get(name, 0) + amount
+
+
+def set_result(result_type):
+    query_trace = _current.get()
+    if query_trace is not None:
+        query_trace.result_type = result_type
+
+
+def log_trace(query_trace):
+    """Hook: log one DEBUG line per query."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    stages = ' '.join(f"{stage}={seconds * 1000:.2f}ms" for stage, seconds in query_trace.stages.items())
+    counters = ' '.join(f"{name}={value}" for name, value in query_trace.counters.items())
+    logger.debug("%s -> %s in %.2f ms; %s; %s", query_trace.name, query_trace.result_type,
+                 query_trace.seconds * 1000, stages, counters)
+
+
+class MetricsRegistry:
+    """
+    Hook aggregating traces per query name: calls, result types, total time
+    per stage, counter totals, and p50/p95 latency over the most recent
+    traces. Thread-safe; register it with add_hook(registry).
+    """
+
+    def __init__(self, recent=RECENT_TRACES):
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._recent = deque(maxlen=recent)
+
+    def __call__(self, query_trace):
+        with self._lock:
+            metrics = self._queries.get(query_trace.name)
+            if metrics is None:
+                metrics = self._queries[query_trace.name] = {
+                    'calls': 0, 'seconds': 0.0, 'results': {}, 'stage_seconds': {}, 'counters': {},
+                    'recent_seconds': deque(maxlen=self._recent.maxlen)}
+            metrics['calls'] += 1
+            metrics['seconds'] += query_trace.seconds
+            metrics['recent_seconds'].append(query_trace.seconds)
+            metrics['results'][query_trace.result_type] = metrics['results'].get(query_trace.result_type, 0) + 1
+            for stage_name, seconds in query_trace.stages.items():
+                metrics['stage_seconds'][stage_name] = metrics['stage_seconds'].get(stage_name, 0.0) + seconds
+            for name, value in query_trace.counters.items():
+                metrics['counters'][name] = metrics['counters'].get(name, 0) + value
+            self._recent.append(query_trace)
+
+    def snapshot(self):
+        """A JSON-serializable copy of the aggregates and the most recent traces."""
+        with self._lock:
+            queries = {}
+            for name, metrics in self._queries.items():
+                latencies = sorted(metrics['recent_seconds'])
+                queries[name] = {
+                    'calls': metrics['calls'],
+                    'mean_ms': metrics['seconds'] / metrics['calls'] * 1000,
+                    'p50_ms': latencies[len(latencies) // 2] * 1000,
+                    'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+                    'results': dict(metrics['results']),
+                    'stage_mean_ms': {stage_name: seconds / metrics['calls'] * 1000
+                                      for stage_name, seconds in metrics['stage_seconds'].items()},
+                    'counters': dict(metrics['counters']),
+                }
+            return {'queries': queries, 'recent': [query_trace.as_dict() for query_trace in self._recent]}
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._recent.clear()
@@ -0,0 +1,337 @@
+"""
+Versioned schema migrations for recipes.db and shops.db.
+
+Each database records the migrations it has applied in a schema_version table.
+At startup apply_migrations() runs the pending ones in order, each inside its
+own transaction, so existing database files are upgraded in place. Migrations
+are (version, description, steps[, post_steps]) tuples where a step is either
+an SQL string or a callable taking a cursor. post_steps are SQL strings run
+after the migration has committed, for statements such as VACUUM that cannot
+run inside a transaction. Never edit a released migration; append a new one
+instead.
+"""
+import sqlite3
+from datetime import datetime, timezone
+
+from recipe_mapper import units
+from recipe_mapper.dictionary import IngredientDictionary
+
+# Rows copied per batch when a table is rebuilt
+COPY_BATCH_SIZE = 10000
+
+# Index DDL is kept by name so bulk loaders can drop and rebuild them. The
+# migrations spell out their own copy, so changing these never changes what an
+# already released migration does.
+RECIPE_INDEXES = {
+    'idx_recipeingredients_recipe':
+        'CREATE INDEX IF NOT EXISTS idx_recipeingredients_recipe ON RecipeIngredients (recipe_id)',
+    'idx_recipeingredients_ingredient':
+        'CREATE INDEX IF NOT EXISTS idx_recipeingredients_ingredient ON RecipeIngredients (ingredient_id, recipe_id)',
+}
+
+SHOP_INDEXES = {
+    'idx_shopinventory_shop':
+        'CREATE INDEX IF NOT EXISTS idx_shopinventory_shop ON ShopInventory (shop_id, ingredient_id)',
+    'idx_shopinventory_ingredient':
+        'CREATE INDEX IF NOT EXISTS idx_shopinventory_ingredient ON ShopInventory (ingredient_id, shop_id)',
+}
+
+
+def _build_recipe_counts(cursor):
+    # Counts as of version 3, when ingredients were still stored by name
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS RecipeIngredientCounts (
+        recipe_id INTEGER PRIMARY KEY,
+        ingredient_count INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipeingredientcounts_count '
+                   'ON RecipeIngredientCounts (ingredient_count)')
+    cursor.execute('''
+    INSERT INTO RecipeIngredientCounts (recipe_id, ingredient_count)
+    SELECT r.recipe_id, COUNT(DISTINCT ri.ingredient_name)
+        + COALESCE(MAX(ri.recipe_id IS NOT NULL AND ri.ingredient_name IS NULL), 0)
+    FROM Recipes r LEFT JOIN RecipeIngredients ri ON ri.recipe_id = r.recipe_id
+    GROUP BY r.recipe_id
+    ''')
+
+
+def _rebuild_with_ingredient_ids(cursor, table, create_sql):
+    """
+    Copy table (owner, ingredient_name, quantity, unit) into a new table keyed
+    by ingredient_id, interning every name in the attached dictionary, and
+    swap it in place of the old one. The old table's indexes go with it.
+    """
+    dictionary = IngredientDictionary.for_attached(cursor)
+    try:
+        cursor.execute(create_sql.format(table=f'{table}_new'))
+        read_cursor = cursor.connection.cursor()
+        read_cursor.execute(f'SELECT * FROM {table} ORDER BY rowid')
+        while True:
+            rows = read_cursor.fetchmany(COPY_BATCH_SIZE)
+            if not rows:
+                break
+            ingredient_ids = dictionary.intern_many([row[1] for row in rows])
+            cursor.executemany(f'INSERT INTO {table}_new VALUES (?, ?, ?, ?)',
+                               [(owner, ingredient_id, quantity, unit)
+                                for (owner, _, quantity, unit), ingredient_id in zip(rows, ingredient_ids)])
+    finally:
+        dictionary.close()
+    cursor.execute(f'DROP TABLE {table}')
+    cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+
+def _intern_recipe_ingredients(cursor):
+    _rebuild_with_ingredient_ids(cursor, 'RecipeIngredients', '''
+        CREATE TABLE {table} (
+            recipe_id INTEGER,
+            ingredient_id INTEGER,
+            quantity REAL,
+            unit TEXT,
+            FOREIGN KEY (recipe_id) REFERENCES Recipes(recipe_id)
+        )
+    ''')
+
+
+def _add_canonical_units(table):
+    def step(cursor):
+        units.register_sql_functions(cursor.connection)
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN canonical_quantity REAL')
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN unit_family TEXT')
+        cursor.execute(f'''
+        UPDATE {table}
+        SET canonical_quantity = canonical_quantity(quantity, unit), unit_family = unit_family(unit)
+        ''')
+    return step
+
+
+def _unique_ingredient_lines(table, owner_column, index_name):
+    """
+    Merge rows of one owner that repeat an ingredient in the same unit
+    family (units.combine() sums them), then enforce one row per (owner,
+    ingredient_id, unit_family) with a unique index.
+    """
+    def step(cursor):
+        cursor.execute(f'''
+        SELECT {owner_column}, ingredient_id, unit_family FROM {table}
+        WHERE ingredient_id IS NOT NULL
+        GROUP BY {owner_column}, ingredient_id, unit_family
+        HAVING COUNT(*) > 1
+        ''')
+        for owner_id, ingredient_id, family in cursor.fetchall():
+            match = f'{owner_column} = ? AND ingredient_id = ? AND unit_family IS ?'
+            cursor.execute(f'SELECT quantity, unit, canonical_quantity FROM {table} WHERE {match} ORDER BY rowid',
+                           (owner_id, ingredient_id, family))
+            quantity, unit, canonical = units.combine(cursor.fetchall())
+            cursor.execute(f'DELETE FROM {table} WHERE {match}', (owner_id, ingredient_id, family))
+            cursor.execute(f'''
+            INSERT INTO {table} ({owner_column}, ingredient_id, quantity, unit, canonical_quantity, unit_family)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (owner_id, ingredient_id, quantity, unit, canonical, family))
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {index_name} '
+                       f'ON {table} ({owner_column}, ingredient_id, unit_family)')
+    return step
+
+
+def _intern_shop_inventory(cursor):
+    _rebuild_with_ingredient_ids(cursor, 'ShopInventory', '''
+        CREATE TABLE {table} (
+            shop_id TEXT,
+            ingredient_id INTEGER,
+            quantity REAL,
+            unit TEXT,
+            FOREIGN KEY (shop_id) REFERENCES Shops(shop_id)
+        )
+    ''')
+
+
+RECIPES_MIGRATIONS = [
+    (1, 'Create Recipes and RecipeIngredients', [
+        '''
+        CREATE TABLE IF NOT EXISTS Recipes (
+            recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_name TEXT NOT NULL UNIQUE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS RecipeIngredients (
+            recipe_id INTEGER,
+            ingredient_name TEXT,
+            quantity REAL,
+            unit TEXT,
+            FOREIGN KEY (recipe_id) REFERENCES Recipes(recipe_id)
+        )
+        ''',
+    ]),
+    (2, 'Index RecipeIngredients by recipe and by ingredient', [
+        'CREATE INDEX IF NOT EXISTS idx_recipeingredients_recipe ON RecipeIngredients (recipe_id)',
+        'CREATE INDEX IF NOT EXISTS idx_recipeingredients_ingredient ON RecipeIngredients (ingredient_name, recipe_id)',
+        'ANALYZE',
+    ]),
+    (3, 'Required-ingredient counts for the inverted ingredient index', [
+        _build_recipe_counts,
+    ]),
+    (4, 'Store RecipeIngredients by interned ingredient_id', [
+        _intern_recipe_ingredients,
+        'CREATE INDEX IF NOT EXISTS idx_recipeingredients_recipe ON RecipeIngredients (recipe_id)',
+        'CREATE INDEX IF NOT EXISTS idx_recipeingredients_ingredient ON RecipeIngredients (ingredient_id, recipe_id)',
+        'DELETE FROM RecipeIngredientCounts',
+        '''
+        INSERT INTO RecipeIngredientCounts (recipe_id, ingredient_count)
+        SELECT r.recipe_id, COUNT(DISTINCT ri.ingredient_id)
+            + COALESCE(MAX(ri.recipe_id IS NOT NULL AND ri.ingredient_id IS NULL), 0)
+        FROM Recipes r LEFT JOIN RecipeIngredients ri ON ri.recipe_id = r.recipe_id
+        GROUP BY r.recipe_id
+        ''',
+        'ANALYZE',
+    ], ['VACUUM']),
+    (5, 'Canonical quantity and unit family on RecipeIngredients', [
+        _add_canonical_units('RecipeIngredients'),
+    ]),
+    (6, 'Case-insensitive name index for paged recipe lists', [
+        'CREATE INDEX IF NOT EXISTS idx_recipes_name_nocase ON Recipes (recipe_name COLLATE NOCASE, recipe_id)',
+        'ANALYZE',
+    ]),
+    (7, 'Checkpoints for resumable dataset imports', [
+        '''
+        CREATE TABLE IF NOT EXISTS ImportCheckpoints (
+            file_hash TEXT PRIMARY KEY,
+            records_done INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        ''',
+    ]),
+    (8, 'One RecipeIngredients row per recipe, ingredient and unit family', [
+        _unique_ingredient_lines('RecipeIngredients', 'recipe_id', 'idx_recipeingredients_unique'),
+    ]),
+]
+
+SHOPS_MIGRATIONS = [
+    (1, 'Create Shops and ShopInventory', [
+        '''
+        CREATE TABLE IF NOT EXISTS Shops (
+            shop_id TEXT PRIMARY KEY,
+            shop_name TEXT NOT NULL UNIQUE,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS ShopInventory (
+            shop_id TEXT,
+            ingredient_name TEXT,
+            quantity REAL,
+            unit TEXT,
+            FOREIGN KEY (shop_id) REFERENCES Shops(shop_id)
+        )
+        ''',
+    ]),
+    (2, 'Grid spatial index over shop coordinates', [
+        '''
+        CREATE TABLE IF NOT EXISTS ShopGrid (
+            cell_lat INTEGER NOT NULL,
+            cell_lon INTEGER NOT NULL,
+            shop_id TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            PRIMARY KEY (cell_lat, cell_lon, shop_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_shopgrid_shop_id ON ShopGrid (shop_id)',
+        'DELETE FROM ShopGrid',
+        # Cells of 0.1 degrees; CAST truncates toward zero, the comparison turns that into floor()
+        '''
+        INSERT INTO ShopGrid (cell_lat, cell_lon, shop_id, latitude, longitude)
+        SELECT CAST(latitude / 0.1 AS INTEGER) - (latitude / 0.1 < CAST(latitude / 0.1 AS INTEGER)),
+               CAST(longitude / 0.1 AS INTEGER) - (longitude / 0.1 < CAST(longitude / 0.1 AS INTEGER)),
+               shop_id, latitude, longitude
+        FROM Shops
+        ''',
+    ]),
+    (3, 'Index ShopInventory by shop and by ingredient', [
+        'CREATE INDEX IF NOT EXISTS idx_shopinventory_shop ON ShopInventory (shop_id, ingredient_name)',
+        'CREATE INDEX IF NOT EXISTS idx_shopinventory_ingredient ON ShopInventory (ingredient_name, shop_id)',
+        'ANALYZE',
+    ]),
+    (4, 'Store ShopInventory by interned ingredient_id', [
+        _intern_shop_inventory,
+        'CREATE INDEX IF NOT EXISTS idx_shopinventory_shop ON ShopInventory (shop_id, ingredient_id)',
+        'CREATE INDEX IF NOT EXISTS idx_shopinventory_ingredient ON ShopInventory (ingredient_id, shop_id)',
+        'ANALYZE',
+    ], ['VACUUM']),
+    (5, 'Canonical quantity and unit family on ShopInventory', [
+        _add_canonical_units('ShopInventory'),
+    ]),
+    (6, 'Case-insensitive name index for paged shop lists', [
+        'CREATE INDEX IF NOT EXISTS idx_shops_name_nocase ON Shops (shop_name COLLATE NOCASE, shop_id)',
+        'ANALYZE',
+    ]),
+    (7, 'One ShopInventory row per shop, ingredient and unit family', [
+        _unique_ingredient_lines('ShopInventory', 'shop_id', 'idx_shopinventory_unique'),
+    ]),
+    (8, 'Supplier external ids for shops loaded from feeds', [
+        'ALTER TABLE Shops ADD COLUMN external_id TEXT',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_shops_external_id ON Shops (external_id) WHERE external_id IS NOT NULL',
+    ]),
+]
+
+
+def configure_connection(conn):
+    """
+    Tune a connection for the read-heavy workload. journal_mode=WAL is stored
+    in the database file; the other settings only last for this connection.
+    """
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')  # Durable enough in WAL mode, far fewer fsyncs
+    conn.execute('PRAGMA cache_size=-65536')  # 64 MiB page cache
+    conn.execute('PRAGMA mmap_size=268435456')  # Map up to 256 MiB of the file
+    conn.execute('PRAGMA temp_store=MEMORY')
+
+
+def configure_reader(conn):
+    """
+    Tune a read-only connection like configure_connection(). The journal mode
+    is left to the writer, which switches the file to WAL so readers never
+    block it.
+    """
+    conn.execute('PRAGMA cache_size=-16384')  # 16 MiB per pooled reader
+    conn.execute('PRAGMA mmap_size=268435456')
+    conn.execute('PRAGMA temp_store=MEMORY')
+
+
+def get_schema_version(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def apply_migrations(conn, migrations):
+    """Apply every migration newer than the database's schema version. Returns the new version."""
+    current = get_schema_version(conn)
+    conn.commit()
+    for version, description, steps, *post_steps in sorted(migrations, key=lambda migration: migration[0]):
+        if version <= current:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN')
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                           (version, description, datetime.now(timezone.utc).isoformat()))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        for step in (post_steps[0] if post_steps else []):
+            conn.execute(step)
+        current = version
+    return current
@@ -0,0 +1,35 @@
+"""
+Keyset pagination over name-sorted tables (Recipes, Shops).
+
+Lists are ordered by (name COLLATE NOCASE, id), the order of the
+idx_*_name_nocase indexes, and a page continues after the last (id, name) row
+of the previous one instead of using OFFSET. Fetching page 1000 therefore
+costs the same as fetching page 1. An optional prefix restricts the page to
+names starting with it, case-insensitively, as a range scan on the same index.
+"""
+PAGE_SIZE = 100
+
+# Sorts after every other character, so prefix + _MAX_CHAR bounds a prefix range
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def name_page(conn, table, id_column, name_column, prefix='', after=None, limit=PAGE_SIZE):
+    """
+    Return up to limit (id, name) rows of table in name order, starting after
+    the (id, name) row `after` and restricted to names starting with prefix.
+    """
+    conditions = []
+    params = []
+    if prefix:
+        conditions.append(f'{name_column} >= ? COLLATE NOCASE AND {name_column} < ? COLLATE NOCASE')
+        params += [prefix, prefix + _MAX_CHAR]
+    if after is not None:
+        conditions.append(f'({name_column} COLLATE NOCASE, {id_column}) > (?, ?)')
+        params += [after[1], after[0]]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return conn.execute(f'''
+        SELECT {id_column}, {name_column} FROM {table}
+        {where}
+        ORDER BY {name_column} COLLATE NOCASE, {id_column}
+        LIMIT ?
+    ''', [*params, limit]).fetchall()
@@ -0,0 +1,279 @@
+"""
+The query engine: nearby shops, shops for a recipe, and what's in season.
+
+Every function takes an open Database. Results are plain dicts and lists, and
+the "find" style queries return a dict with a 'type' key ('single',
+'multiple', 'unavailable', 'no_shops', ...) that callers switch on.
+
+The distance engine (NumPy, geopy) is only imported by the first radius query.
+
+The queries are instrumented (see instrumentation.py): each records its wall
+time per stage, its row and distance counters and its result type. Errors
+are logged on the 'recipe_mapper.queries' logger and returned as 'error'
+results.
+"""
+import json
+import logging
+import sqlite3
+
+from recipe_mapper import fulfillment, instrumentation, recipe_index, spatial, units
+
+logger = logging.getLogger(__name__)
+
+
+def get_nearby_shops(db, user_location, radius_km):
+    """
+    Return the shops within radius_km of user_location. Only shops in the grid
+    cells around the user are read, and their distances are computed in one batch.
+    """
+    from recipe_mapper.distance import batch_distances
+
+    with instrumentation.stage('shop_scan'):
+        candidates = spatial.candidate_shops(db.conn_shops.cursor(), user_location, radius_km)
+    instrumentation.count('rows_scanned', len(candidates))
+
+    with instrumentation.stage('radius_filter'):
+        distances = batch_distances(user_location,
+                                    [shop[2] for shop in candidates],
+                                    [shop[3] for shop in candidates],
+                                    radius_km)
+        nearby_shops = []
+        for (shop_id, shop_name, shop_lat, shop_lon), distance in zip(candidates, distances.tolist()):
+            if distance <= radius_km:
+                nearby_shops.append({
+                    'shop_id': shop_id,
+                    'shop_name': shop_name,
+                    'latitude': shop_lat,
+                    'longitude': shop_lon,
+                    'distance': distance
+                })
+    instrumentation.count('shops_in_radius', len(nearby_shops))
+    return nearby_shops
+
+
+def find_nearby_shops_for_recipe(db, recipe_id, user_location, radius_km):
+    """
+    Find the fewest, then closest, nearby shops that together stock every
+    ingredient of a recipe in sufficient quantity. Served from db.query_cache
+    when the Database has one.
+    """
+    with instrumentation.trace('find_shops', recipe_id=recipe_id, radius_km=radius_km):
+        if db.query_cache is None:
+            result = _find_nearby_shops_for_recipe(db, recipe_id, user_location, radius_km)
+        else:
+            result = db.query_cache.get_or_compute(
+                recipe_id, user_location, radius_km,
+                lambda location: _find_nearby_shops_for_recipe(db, recipe_id, location, radius_km))
+        instrumentation.set_result(result['type'])
+        return result
+
+
+def _find_nearby_shops_for_recipe(db, recipe_id, user_location, radius_km):
+    try:
+        # Step 1: Get required ingredients
+        with instrumentation.stage('ingredients'):
+            cursor_recipes = db.conn_recipes.cursor()
+            cursor_recipes.execute('''
+                SELECT ingredient_id, quantity, unit, canonical_quantity, unit_family
+                FROM RecipeIngredients WHERE recipe_id = ?
+            ''', (recipe_id,))
+            required_ingredients = cursor_recipes.fetchall()
+        instrumentation.count('ingredient_rows', len(required_ingredients))
+
+        if not required_ingredients:
+            return {'type': 'no_ingredients', 'message': 'No ingredients found for the selected recipe.'}
+        return _find_shops_for_requirements(db, required_ingredients, user_location, radius_km)
+
+    except sqlite3.Error as db_error:
+        logger.error("Database error: %s", db_error)
+        return {'type': 'error', 'message': 'An error occurred while accessing the database.'}
+    except Exception:
+        logger.exception("Unexpected error")
+        return {'type': 'error', 'message': 'An unexpected error occurred.'}
+
+
+def find_shops_for_meal_plan(db, meal_plan, user_location, radius_km):
+    """
+    Plan one shopping trip for several recipes. meal_plan is a list of
+    (recipe_id, servings multiplier) pairs; a recipe may appear more than
+    once. The quantities of every ingredient are scaled and summed across the
+    plan, and one shop selection covers the combined demand. Returns the same
+    dicts as find_nearby_shops_for_recipe().
+    """
+    with instrumentation.trace('meal_plan', recipes=len(meal_plan), radius_km=radius_km):
+        result = _find_shops_for_meal_plan(db, meal_plan, user_location, radius_km)
+        instrumentation.set_result(result['type'])
+        return result
+
+
+def _find_shops_for_meal_plan(db, meal_plan, user_location, radius_km):
+    try:
+        # Step 1: Get the scaled ingredients of every recipe in the plan in one query
+        with instrumentation.stage('ingredients'):
+            cursor_recipes = db.conn_recipes.cursor()
+            cursor_recipes.execute('''
+                SELECT ri.ingredient_id, ri.quantity * json_extract(p.value, '$[1]'), ri.unit,
+                       ri.canonical_quantity * json_extract(p.value, '$[1]'), ri.unit_family
+                FROM json_each(?) p
+                JOIN RecipeIngredients ri ON ri.recipe_id = json_extract(p.value, '$[0]')
+                ORDER BY p.key, ri.rowid
+            ''', (json.dumps([[recipe_id, multiplier] for recipe_id, multiplier in meal_plan]),))
+            required_ingredients = cursor_recipes.fetchall()
+        instrumentation.count('ingredient_rows', len(required_ingredients))
+
+        if not required_ingredients:
+            return {'type': 'no_ingredients', 'message': 'No ingredients found for the recipes in the plan.'}
+        return _find_shops_for_requirements(db, required_ingredients, user_location, radius_km)
+
+    except sqlite3.Error as db_error:
+        logger.error("Database error: %s", db_error)
+        return {'type': 'error', 'message': 'An error occurred while accessing the database.'}
+    except Exception:
+        logger.exception("Unexpected error")
+        return {'type': 'error', 'message': 'An unexpected error occurred.'}
+
+
+def _find_shops_for_requirements(db, required_ingredients, user_location, radius_km):
+    with instrumentation.stage('ingredients'):
+        ingredients_needed, ingredient_ids = ingredient_requirements(db, required_ingredients)
+
+    # Step 2 & 3: Identify nearby shops using the spatial index
+    nearby_shops = get_nearby_shops(db, user_location, radius_km)
+    shop_ids_within_radius = [shop['shop_id'] for shop in nearby_shops]
+
+    if not nearby_shops:
+        return {'type': 'no_shops', 'message': 'No shops found within the specified radius.'}
+
+    # Step 4: Bulk fetch which shops cover which requirement, comparing
+    # canonical quantities within the same unit family. r.key is the
+    # requirement's position in the JSON array.
+    names = list(ingredients_needed)
+    requirements = json.dumps([[ingredient_ids[name], ingredients_needed[name]['canonical_quantity'],
+                                ingredients_needed[name]['unit_family']]
+                               for name in names])
+    # The shop ids go in as one JSON array, so any number of shops in the
+    # radius stays within SQLite's bound-parameter limit
+    query = '''
+        SELECT DISTINCT si.shop_id, r.key
+        FROM json_each(?) r
+        JOIN ShopInventory si
+          ON si.ingredient_id = json_extract(r.value, '$[0]')
+         AND si.unit_family = json_extract(r.value, '$[2]')
+         AND (json_extract(r.value, '$[1]') IS NULL
+              OR si.canonical_quantity >= json_extract(r.value, '$[1]') * ?)
+        WHERE si.shop_id IN (SELECT value FROM json_each(?))
+    '''
+    with instrumentation.stage('inventory_fetch'):
+        cursor_shops = db.conn_shops.cursor()
+        cursor_shops.execute(query, (requirements, 1 - units.QUANTITY_TOLERANCE,
+                                     json.dumps(shop_ids_within_radius)))
+        coverage_rows = cursor_shops.fetchall()
+    instrumentation.count('inventory_rows', len(coverage_rows))
+
+    # Step 5: Choose the fewest, then closest, shops that together have everything
+    coverage = {}
+    for shop_id, requirement_index in coverage_rows:
+        coverage.setdefault(shop_id, set()).add(names[requirement_index])
+    return plan_result(nearby_shops, coverage, ingredients_needed)
+
+
+def ingredient_requirements(db, required_ingredients):
+    """
+    Turn RecipeIngredients rows (ingredient_id, quantity, unit,
+    canonical_quantity, unit_family) into ingredients_needed, keyed by
+    ingredient name, and a name -> ingredient_id map.
+
+    Lines for the same ingredient in the same unit family are summed, so a
+    recipe listing "1 cup flour" twice, or a meal plan using flour in several
+    recipes, needs the total. An ingredient needed in two families (e.g. by
+    count and by weight) gets one entry per family, named "name (family)".
+    """
+    lines_by_requirement = {}
+    for row in required_ingredients:
+        lines_by_requirement.setdefault((row[0], row[4]), []).append(row)
+    families = {}
+    for ingredient_id, family in lines_by_requirement:
+        families[ingredient_id] = families.get(ingredient_id, 0) + 1
+    names = db.dictionary.names_of([ingredient_id for ingredient_id, _ in lines_by_requirement])
+
+    # Convert to dictionary for easy access; shops are matched by ingredient_id
+    ingredients_needed = {}
+    ingredient_ids = {}
+    for name, ((ingredient_id, family), lines) in zip(names, lines_by_requirement.items()):
+        if families[ingredient_id] > 1:
+            name = f"{name} ({family})"
+        qty, unit, canonical_qty = units.combine([line[1:4] for line in lines])
+        ingredients_needed[name] = {'quantity': qty, 'unit': unit,
+                                    'canonical_quantity': canonical_qty, 'unit_family': family}
+        ingredient_ids[name] = ingredient_id
+    return ingredients_needed, ingredient_ids
+
+
+def plan_result(nearby_shops, coverage, ingredients_needed):
+    """
+    Build the result dict from the nearby shops and coverage, {shop_id: set of
+    ingredient names the shop stocks in sufficient quantity}.
+    """
+    with instrumentation.stage('availability_check'):
+        available = set().union(*coverage.values())
+        missing = next((ingredient for ingredient in ingredients_needed if ingredient not in available), None)
+    if missing is not None:
+        # Ingredient not available in any nearby shop
+        return {
+            'type': 'unavailable',
+            'ingredient': missing
+        }
+    with instrumentation.stage('shop_selection'):
+        selected_shops, ingredient_to_shop = fulfillment.plan_fulfillment(nearby_shops, coverage, ingredients_needed)
+    instrumentation.count('selected_shops', len(selected_shops))
+    result_type = 'multiple' if len(selected_shops) > 1 else 'single'
+
+    # Return the result
+    return {
+        'type': result_type,
+        'shops': selected_shops,
+        'ingredient_to_shop': ingredient_to_shop,
+        'ingredients_needed': ingredients_needed
+    }
+
+
+def whats_in_season(db, user_location, radius_km):
+    """
+    Find the recipes whose ingredients are all stocked by some shop within
+    radius_km. Returns {'type': 'in_season', 'recipes': [(recipe_id,
+    recipe_name), ...]} or a 'no_recipes' / 'no_shops' dict with a message.
+    """
+    with instrumentation.trace('whats_in_season', radius_km=radius_km):
+        result = _whats_in_season(db, user_location, radius_km)
+        instrumentation.set_result(result['type'])
+        return result
+
+
+def _whats_in_season(db, user_location, radius_km):
+    # Step 1: Make sure there are recipes at all
+    if not db.has_recipes():
+        return {'type': 'no_recipes', 'message': 'No recipes found in the database.'}
+
+    # Step 2 & 3: Identify nearby shops using the spatial index
+    nearby_shops = get_nearby_shops(db, user_location, radius_km)
+    shop_ids_within_radius = [shop['shop_id'] for shop in nearby_shops]
+
+    if not nearby_shops:
+        return {'type': 'no_shops', 'message': 'No shops found within the specified radius.'}
+
+    # Step 4: Bulk Fetch Shop Inventories, passing the shop ids as one JSON array
+    query = '''
+        SELECT ingredient_id FROM ShopInventory
+        WHERE shop_id IN (SELECT value FROM json_each(?))
+        GROUP BY ingredient_id
+    '''
+    with instrumentation.stage('inventory_fetch'):
+        available_ingredient_ids = [row[0] for row in db.conn_shops.execute(query,
+                                                                            (json.dumps(shop_ids_within_radius),))]
+    instrumentation.count('inventory_rows', len(available_ingredient_ids))
+
+    # Step 5: One pass over the available ingredients through the inverted index
+    with instrumentation.stage('recipe_match'):
+        recipes = recipe_index.recipes_covered_by(db.conn_recipes.cursor(), available_ingredient_ids)
+    instrumentation.count('recipes_found', len(recipes))
+    return {'type': 'in_season', 'recipes': recipes}
@@ -0,0 +1,107 @@
+"""
+Inverted ingredient -> recipe index for the "What's in Season" query.
+
+The inverted index itself is idx_recipeingredients_ingredient on
+RecipeIngredients (ingredient_id, recipe_id). Next to it the
+RecipeIngredientCounts table stores how many distinct ingredients every recipe
+needs. Given the ingredients available nearby, one pass over them through the
+index counts how many of each recipe's ingredients are covered; recipes whose
+count reaches the required count are fully covered.
+
+RecipeIngredientCounts must be refreshed whenever a recipe's ingredients are
+written, in the same transaction.
+"""
+import json
+
+# A NULL ingredient can never be matched by a shop, so it counts as one more
+# required ingredient.
+_REQUIRED_COUNT = '''
+    COUNT(DISTINCT ri.ingredient_id)
+    + COALESCE(MAX(ri.recipe_id IS NOT NULL AND ri.ingredient_id IS NULL), 0)
+'''
+
+
+def create_recipe_counts(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS RecipeIngredientCounts (
+        recipe_id INTEGER PRIMARY KEY,
+        ingredient_count INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipeingredientcounts_count '
+                   'ON RecipeIngredientCounts (ingredient_count)')
+
+
+def rebuild_recipe_counts(cursor):
+    cursor.execute('DELETE FROM RecipeIngredientCounts')
+    cursor.execute(f'''
+    INSERT INTO RecipeIngredientCounts (recipe_id, ingredient_count)
+    SELECT r.recipe_id, {_REQUIRED_COUNT}
+    FROM Recipes r LEFT JOIN RecipeIngredients ri ON ri.recipe_id = r.recipe_id
+    GROUP BY r.recipe_id
+    ''')
+
+
+def ensure_recipe_counts(cursor):
+    """Rebuild the counts if recipes were added or removed by an older build."""
+    create_recipe_counts(cursor)
+    cursor.execute('SELECT (SELECT COUNT(*) FROM Recipes), (SELECT COUNT(*) FROM RecipeIngredientCounts)')
+    recipe_count, indexed_count = cursor.fetchone()
+    if recipe_count != indexed_count:
+        rebuild_recipe_counts(cursor)
+
+
+def refresh_recipe_counts(cursor, recipe_ids):
+    """Recompute the required-ingredient counts of the given (added, updated or deleted) recipes."""
+    params = [(recipe_id,) for recipe_id in recipe_ids]
+    cursor.executemany('DELETE FROM RecipeIngredientCounts WHERE recipe_id = ?', params)
+    cursor.executemany(f'''
+    INSERT INTO RecipeIngredientCounts (recipe_id, ingredient_count)
+    SELECT r.recipe_id, {_REQUIRED_COUNT}
+    FROM Recipes r LEFT JOIN RecipeIngredients ri ON ri.recipe_id = r.recipe_id
+    WHERE r.recipe_id = ?
+    GROUP BY r.recipe_id
+    ''', params)
+
+
+def required_count(ingredient_ids):
+    """The count _REQUIRED_COUNT gives a recipe with these ingredient_ids (None for a blank name)."""
+    distinct = set(ingredient_ids)
+    return len(distinct - {None}) + (None in distinct)
+
+
+def store_recipe_counts(cursor, counts):
+    """
+    Store (recipe_id, ingredient count) pairs computed by the caller, e.g. by a
+    bulk loader that still has the rows in memory and may have dropped the
+    RecipeIngredients indexes refresh_recipe_counts() relies on.
+    """
+    cursor.executemany('INSERT OR REPLACE INTO RecipeIngredientCounts (recipe_id, ingredient_count) VALUES (?, ?)',
+                       counts)
+
+
+def recipes_covered_by(cursor, available_ingredient_ids):
+    """
+    Return (recipe_id, recipe_name) for every recipe whose ingredients are all
+    in available_ingredient_ids, ordered by recipe_id.
+    """
+    # The available ids are passed as one JSON array so any number of them
+    # fits in a single statement without a temp table.
+    cursor.execute('''
+        SELECT r.recipe_id, r.recipe_name
+        FROM (
+            SELECT ri.recipe_id, COUNT(DISTINCT ri.ingredient_id) AS matched
+            FROM (SELECT DISTINCT value AS ingredient_id FROM json_each(?)) a
+            JOIN RecipeIngredients ri ON ri.ingredient_id = a.ingredient_id
+            GROUP BY ri.recipe_id
+        ) m
+        JOIN RecipeIngredientCounts c ON c.recipe_id = m.recipe_id AND c.ingredient_count = m.matched
+        JOIN Recipes r ON r.recipe_id = m.recipe_id
+        UNION ALL
+        -- A recipe without ingredients is trivially covered
+        SELECT r.recipe_id, r.recipe_name
+        FROM RecipeIngredientCounts c JOIN Recipes r ON r.recipe_id = c.recipe_id
+        WHERE c.ingredient_count = 0
+        ORDER BY 1
+    ''', (json.dumps(list(available_ingredient_ids)),))
+    return cursor.fetchall()
@@ -0,0 +1,126 @@
+"""
+Offline route planning for a shopping trip.
+
+The trip starts at the user's location, visits every selected shop once and
+ends at the last shop (an open path; there is no need to drive home through
+the planner). The pairwise great-circle distance matrix of the stops is built
+in one NumPy pass and memoized, so re-planning the same trip, e.g. for the map
+link and then the export, does not rebuild it. The order starts from a
+nearest-neighbour tour that is improved with 2-opt (reversing a stretch of
+the route) and Or-opt (moving a run of up to three stops elsewhere, either
+way round) until neither finds an improvement. Short trips repeat this from
+every possible first stop and keep the shortest result.
+"""
+from functools import lru_cache
+
+MATRIX_CACHE_SIZE = 64
+OR_OPT_MAX_SEGMENT = 3
+# Up to this many stops every shop is tried as the first stop
+MULTI_START_MAX_STOPS = 12
+_EPSILON = 1e-9
+
+
+@lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def distance_matrix(points):
+    """Great-circle distances in km between every pair of (lat, lon) points, as a tuple of rows."""
+    import numpy as np
+
+    from recipe_mapper.distance import haversine_km
+
+    latitudes = np.array([point[0] for point in points], dtype=float)
+    longitudes = np.array([point[1] for point in points], dtype=float)
+    return tuple(tuple(haversine_km(latitude, longitude, latitudes, longitudes).tolist())
+                 for latitude, longitude in points)
+
+
+def route_length(matrix, route):
+    return sum(matrix[a][b] for a, b in zip(route, route[1:]))
+
+
+def _nearest_neighbour(matrix, first=None):
+    route = [0]
+    unvisited = set(range(1, len(matrix)))
+    if first is not None:
+        route.append(first)
+        unvisited.remove(first)
+    while unvisited:
+        row = matrix[route[-1]]
+        nearest = min(unvisited, key=lambda stop: (row[stop], stop))
+        route.append(nearest)
+        unvisited.remove(nearest)
+    return route
+
+
+def _two_opt(matrix, route):
+    """Reverse route[i:j + 1] while that shortens the path. route[0] stays the start."""
+    improved = False
+    last = len(route) - 1
+    for i in range(1, last):
+        a, b = route[i - 1], route[i]
+        for j in range(i + 1, last + 1):
+            c = route[j]
+            if j == last:
+                delta = matrix[a][c] - matrix[a][b]
+            else:
+                e = route[j + 1]
+                delta = matrix[a][c] + matrix[b][e] - matrix[a][b] - matrix[c][e]
+            if delta < -_EPSILON:
+                route[i:j + 1] = reversed(route[i:j + 1])
+                improved = True
+                b = route[i]
+    return improved
+
+
+def _or_opt(matrix, route):
+    """Move a run of up to OR_OPT_MAX_SEGMENT stops to a better place, possibly reversed."""
+    for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+        for i in range(1, len(route) - length + 1):
+            segment = route[i:i + length]
+            first, last = segment[0], segment[-1]
+            before = route[i - 1]
+            after = route[i + length] if i + length < len(route) else None
+            removed = matrix[before][first] - (matrix[before][after] if after is not None else 0.0)
+            if after is not None:
+                removed += matrix[last][after]
+            rest = route[:i] + route[i + length:]
+            for k in range(len(rest)):
+                if k == i - 1:
+                    continue
+                p = rest[k]
+                q = rest[k + 1] if k + 1 < len(rest) else None
+                joined = matrix[p][q] if q is not None else 0.0
+                for head, tail in ((first, last), (last, first)):
+                    added = matrix[p][head] + (matrix[tail][q] if q is not None else 0.0) - joined
+                    if added - removed < -_EPSILON:
+                        insert = segment if head == first else segment[::-1]
+                        route[:] = rest[:k + 1] + insert + rest[k + 1:]
+                        return True
+    return False
+
+
+def plan_route(origin, shops):
+    """
+    Order shops (dicts with 'latitude' and 'longitude') into a short path from
+    origin. Returns (ordered shops, total km along the path).
+    """
+    if not shops:
+        return [], 0.0
+    points = (tuple(origin),) + tuple((shop['latitude'], shop['longitude']) for shop in shops)
+    matrix = distance_matrix(points)
+    starts = range(1, len(points)) if len(shops) <= MULTI_START_MAX_STOPS else [None]
+    best_route, best_length = None, None
+    for first in starts:
+        route = _nearest_neighbour(matrix, first)
+        while _two_opt(matrix, route) or _or_opt(matrix, route):
+            pass
+        length = route_length(matrix, route)
+        if best_length is None or length < best_length - _EPSILON:
+            best_route, best_length = route, length
+    return [shops[stop - 1] for stop in best_route[1:]], best_length
+
+
+def add_route(result, user_location):
+    """Put the shops of a 'single' or 'multiple' find-shops result in route order and add 'route_km'."""
+    if result['type'] in ('single', 'multiple'):
+        result['shops'], result['route_km'] = plan_route(user_location, result['shops'])
+    return result
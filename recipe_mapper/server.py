@@ -0,0 +1,416 @@
+"""
+Local HTTP/JSON service for the planner, for tools other than the Tk window.
+
+PlannerService answers requests with the same functions the GUI uses. Reads
+check a Database out of a ReaderPool of read-only connections (SQLite in WAL
+mode lets them run while a write is in progress); every write is run by one
+SerializedWriter thread, so writes never contend with each other for the
+database lock. All of them share one QueryCache, which the writer keeps up to
+date. serve() runs the service on a ThreadingHTTPServer, one thread per
+connection, with HTTP/1.1 keep-alive.
+
+Endpoints (bodies and responses are JSON):
+    GET    /health
+    GET    /metrics         per-stage query timings and counters (instrumentation.MetricsRegistry)
+    GET    /find-shops?recipe_id=&lat=&lon=&radius=   shops in route order
+    POST   /meal-plan       {"recipes": [[recipe_id, servings], ...], "lat", "lon", "radius"}
+    GET    /in-season?lat=&lon=&radius=
+    POST   /route           {"lat", "lon", "shops": [{"latitude", "longitude", ...}, ...]}
+    GET    /recipes?prefix=&after_id=&after_name=&limit=
+    POST   /recipes         {"name", "ingredients": [{"name", "quantity", "unit"}, ...]}
+    GET    /recipes/<id>    PUT (same body as POST)    DELETE
+    GET    /shops?prefix=&after_id=&after_name=&limit=
+    POST   /shops           {"name", "latitude", "longitude", "inventory": [...]}
+    GET    /shops/<id>      PUT (same body as POST)    DELETE
+
+Query results are the dicts of queries.py with their 'type' key; errors are
+{'type': 'error', 'message': ...} with a 4xx or 5xx status.
+
+Run from the repository root:
+    python -m recipe_mapper.server [port] [data directory]
+"""
+import json
+import logging
+import math
+import queue
+import re
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from recipe_mapper import instrumentation, paging, queries, routing, spatial
+from recipe_mapper.cache import QueryCache
+from recipe_mapper.database import Database
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_POOL_SIZE = 8
+# How long a request waits for a pooled reader before getting a 503
+POOL_TIMEOUT_SECONDS = 10.0
+# Connections the listening socket queues while every thread is busy
+LISTEN_BACKLOG = 1024
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class ReaderPool:
+    """A fixed set of read-only Database objects, each used by one thread at a time."""
+
+    def __init__(self, open_reader, size=DEFAULT_POOL_SIZE):
+        self._idle = queue.LifoQueue()  # Most recently used first, so its page cache is warm
+        self._readers = [open_reader() for _ in range(size)]
+        for db in self._readers:
+            self._idle.put(db)
+
+    @contextmanager
+    def connection(self, timeout=POOL_TIMEOUT_SECONDS):
+        """Check a reader out for the with block. Raises queue.Empty after timeout seconds."""
+        db = self._idle.get(timeout=timeout)
+        try:
+            yield db
+        finally:
+            self._idle.put(db)
+
+    def close(self):
+        for db in self._readers:
+            db.close()
+
+
+class SerializedWriter:
+    """Runs write functions one at a time on a thread that owns the only writable Database."""
+
+    def __init__(self, open_database):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._db = self._executor.submit(open_database).result()
+
+    def call(self, function, *args):
+        """Run function(db, *args) on the writer thread and return its result (or raise its error)."""
+        return self._executor.submit(function, self._db, *args).result()
+
+    def close(self):
+        self._executor.submit(self._db.close).result()
+        self._executor.shutdown()
+
+
+class PlannerService:
+
+    def __init__(self, directory, pool_size=DEFAULT_POOL_SIZE, query_cache=None):
+        self.query_cache = query_cache if query_cache is not None else QueryCache()
+        self.metrics = instrumentation.MetricsRegistry()
+        instrumentation.add_hook(self.metrics)
+        # The writer opens first: it creates or migrates the files the readers open read-only
+        self.writer = SerializedWriter(lambda: Database.in_directory(directory, self.query_cache))
+        self.readers = ReaderPool(lambda: Database.in_directory(directory, self.query_cache, read_only=True),
+                                  pool_size)
+        self.routes = [
+            ('GET', r'/health', self.health),
+            ('GET', r'/metrics', self.get_metrics),
+            ('GET', r'/find-shops', self.find_shops),
+            ('POST', r'/meal-plan', self.meal_plan),
+            ('GET', r'/in-season', self.in_season),
+            ('POST', r'/route', self.route),
+            ('GET', r'/recipes', self.list_recipes),
+            ('POST', r'/recipes', self.add_recipe),
+            ('GET', r'/recipes/(\d+)', self.get_recipe),
+            ('PUT', r'/recipes/(\d+)', self.update_recipe),
+            ('DELETE', r'/recipes/(\d+)', self.delete_recipe),
+            ('GET', r'/shops', self.list_shops),
+            ('POST', r'/shops', self.add_shop),
+            ('GET', r'/shops/([^/]+)', self.get_shop),
+            ('PUT', r'/shops/([^/]+)', self.update_shop),
+            ('DELETE', r'/shops/([^/]+)', self.delete_shop),
+        ]
+
+    def close(self):
+        instrumentation.remove_hook(self.metrics)
+        self.readers.close()
+        self.writer.close()
+
+    def handle(self, method, path, params, body):
+        """Dispatch one request. Returns (HTTP status, JSON-serializable payload)."""
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, path)
+            if match is None:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            try:
+                return handler(*match.groups(), params=params, body=body)
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, _error(f"Invalid request: {e}")
+            except queue.Empty:
+                return 503, _error('The server is busy, try again.')
+            except sqlite3.Error as db_error:
+                logger.error("Database error: %s", db_error)
+                return 500, _error('An error occurred while accessing the database.')
+        if allowed:
+            return 405, _error(f"{method} is not supported for {path}.")
+        return 404, _error(f"No endpoint at {path}.")
+
+    # Queries
+
+    def health(self, params, body):
+        return 200, {'type': 'ok', 'cache': self.query_cache.stats()}
+
+    def get_metrics(self, params, body):
+        return 200, {'type': 'metrics', **self.metrics.snapshot()}
+
+    def find_shops(self, params, body):
+        recipe_id = int(_param(params, 'recipe_id'))
+        location, radius_km = _location(params), spatial.checked_radius(_param(params, 'radius'))
+        with self.readers.connection() as db:
+            result = queries.find_nearby_shops_for_recipe(db, recipe_id, location, radius_km)
+        return _query_status(result), routing.add_route(result, location)
+
+    def meal_plan(self, params, body):
+        meal_plan = [(int(recipe_id), _servings(servings)) for recipe_id, servings in body['recipes']]
+        location, radius_km = _body_location(body), spatial.checked_radius(body['radius'])
+        with self.readers.connection() as db:
+            result = queries.find_shops_for_meal_plan(db, meal_plan, location, radius_km)
+        return _query_status(result), routing.add_route(result, location)
+
+    def in_season(self, params, body):
+        location, radius_km = _location(params), spatial.checked_radius(_param(params, 'radius'))
+        with self.readers.connection() as db:
+            result = queries.whats_in_season(db, location, radius_km)
+        return _query_status(result), result
+
+    def route(self, params, body):
+        shops = []
+        for shop in body['shops']:
+            latitude, longitude = spatial.checked_location(shop['latitude'], shop['longitude'])
+            shops.append(dict(shop, latitude=latitude, longitude=longitude))
+        ordered_shops, route_km = routing.plan_route(_body_location(body), shops)
+        return 200, {'type': 'route', 'shops': ordered_shops, 'route_km': route_km}
+
+    # Recipes
+
+    def list_recipes(self, params, body):
+        with self.readers.connection() as db:
+            rows = db.recipes_page(*_page_args(params, int))
+        return 200, {'type': 'recipes', 'recipes': [{'recipe_id': recipe_id, 'name': name} for recipe_id, name in rows]}
+
+    def get_recipe(self, recipe_id, params, body):
+        with self.readers.connection() as db:
+            recipe = db.get_recipe(int(recipe_id))
+        if recipe is None:
+            return 404, _error(f"Recipe {recipe_id} not found.")
+        name, ingredients = recipe
+        return 200, {'type': 'recipe', 'recipe_id': int(recipe_id), 'name': name,
+                     'ingredients': _items_out(ingredients)}
+
+    def add_recipe(self, params, body):
+        name, ingredients = _name(body), _items_in(body['ingredients'])
+        try:
+            recipe_id = self.writer.call(Database.add_recipe, name, ingredients)
+        except sqlite3.IntegrityError as e:
+            if not _duplicate_name(e, 'Recipes.recipe_name'):
+                raise
+            return 409, _error(f"Recipe '{name}' already exists.")
+        return 201, {'type': 'created', 'recipe_id': recipe_id}
+
+    def update_recipe(self, recipe_id, params, body):
+        name, ingredients = _name(body), _items_in(body['ingredients'])
+        try:
+            changes = self.writer.call(Database.update_recipe, int(recipe_id), name, ingredients)
+        except sqlite3.IntegrityError as e:
+            if not _duplicate_name(e, 'Recipes.recipe_name'):
+                raise
+            return 409, _error(f"Recipe name '{name}' already exists.")
+        if changes is None:
+            return 404, _error(f"Recipe {recipe_id} not found.")
+        return 200, {'type': 'updated', **changes}
+
+    def delete_recipe(self, recipe_id, params, body):
+        if not self.writer.call(Database.delete_recipe, int(recipe_id)):
+            return 404, _error(f"Recipe {recipe_id} not found.")
+        return 200, {'type': 'deleted'}
+
+    # Shops
+
+    def list_shops(self, params, body):
+        with self.readers.connection() as db:
+            rows = db.shops_page(*_page_args(params, str))
+        return 200, {'type': 'shops', 'shops': [{'shop_id': shop_id, 'name': name} for shop_id, name in rows]}
+
+    def get_shop(self, shop_id, params, body):
+        with self.readers.connection() as db:
+            shop = db.get_shop(shop_id)
+        if shop is None:
+            return 404, _error(f"Shop {shop_id} not found.")
+        name, latitude, longitude, inventory = shop
+        return 200, {'type': 'shop', 'shop_id': shop_id, 'name': name, 'latitude': latitude,
+                     'longitude': longitude, 'inventory': _items_out(inventory)}
+
+    def add_shop(self, params, body):
+        name, latitude, longitude, inventory = _shop_fields(body)
+        try:
+            shop_id = self.writer.call(Database.add_shop, name, latitude, longitude, inventory)
+        except sqlite3.IntegrityError as e:
+            if not _duplicate_name(e, 'Shops.shop_name'):
+                raise
+            return 409, _error(f"Shop name '{name}' already exists.")
+        return 201, {'type': 'created', 'shop_id': shop_id}
+
+    def update_shop(self, shop_id, params, body):
+        name, latitude, longitude, inventory = _shop_fields(body)
+        try:
+            changes = self.writer.call(Database.update_shop, shop_id, name, latitude, longitude, inventory)
+        except sqlite3.IntegrityError as e:
+            if not _duplicate_name(e, 'Shops.shop_name'):
+                raise
+            return 409, _error(f"Shop name '{name}' already exists.")
+        if changes is None:
+            return 404, _error(f"Shop {shop_id} not found.")
+        return 200, {'type': 'updated', **changes}
+
+    def delete_shop(self, shop_id, params, body):
+        if not self.writer.call(Database.delete_shop, shop_id):
+            return 404, _error(f"Shop {shop_id} not found.")
+        return 200, {'type': 'deleted'}
+
+
+def _error(message):
+    return {'type': 'error', 'message': message}
+
+
+def _query_status(result):
+    return 500 if result['type'] == 'error' else 200
+
+
+def _param(params, name):
+    values = params.get(name)
+    if not values:
+        raise ValueError(f"missing '{name}'")
+    return values[0]
+
+
+def _duplicate_name(error, column):
+    """Whether an IntegrityError is the UNIQUE constraint on column ('Table.column') and not another constraint."""
+    return str(error) == f"UNIQUE constraint failed: {column}"
+
+
+def _location(params):
+    return spatial.checked_location(_param(params, 'lat'), _param(params, 'lon'))
+
+
+def _body_location(body):
+    return spatial.checked_location(body['lat'], body['lon'])
+
+
+def _servings(value):
+    servings = float(value)
+    if not (math.isfinite(servings) and servings > 0):
+        raise ValueError(f"servings must be a positive number, got {servings}")
+    return servings
+
+
+def _page_args(params, id_type):
+    after = None
+    if params.get('after_id'):
+        after = (id_type(_param(params, 'after_id')), _param(params, 'after_name'))
+    limit = min(int(params.get('limit', [paging.PAGE_SIZE])[0]), paging.PAGE_SIZE * 10)
+    return params.get('prefix', [''])[0], after, limit
+
+
+def _name(body):
+    name = str(body['name']).strip()
+    if not name:
+        raise ValueError("'name' is empty")
+    return name
+
+
+def _items_in(items):
+    """Validate ingredient or inventory dicts from a request body."""
+    return [{'name': str(item['name']),
+             'quantity': None if item.get('quantity') is None else float(item['quantity']),
+             'unit': str(item.get('unit') or '')}
+            for item in items]
+
+
+def _items_out(rows):
+    return [{'name': name, 'quantity': quantity, 'unit': unit} for name, quantity, unit in rows]
+
+
+def _shop_fields(body):
+    return (_name(body), *spatial.checked_location(body['latitude'], body['longitude']),
+            _items_in(body.get('inventory', [])))
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY a
+    # keep-alive client waits for a delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            return self._send(413, _error('Request body is too large.'))
+        raw_body = self.rfile.read(length) if length else b''
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            return self._send(400, _error('Request body is not valid JSON.'))
+        if not isinstance(body, dict):
+            return self._send(400, _error('Request body must be a JSON object.'))
+        try:
+            status, payload = self.server.service.handle(self.command, url.path.rstrip('/') or '/',
+                                                         parse_qs(url.query), body)
+        except Exception:
+            logger.exception("Unexpected error")
+            status, payload = 500, _error('An unexpected error occurred.')
+        self._send(status, payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # One line per request would cost more than the request itself
+
+
+class _PlannerHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, address, service):
+        self.service = service
+        super().__init__(address, _RequestHandler)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """An HTTP server for service, bound but not yet serving (port 0 picks a free port)."""
+    return _PlannerHTTPServer((host, port), service)
+
+
+def serve(directory, host=DEFAULT_HOST, port=DEFAULT_PORT, pool_size=DEFAULT_POOL_SIZE):
+    """Serve the databases in directory until interrupted."""
+    service = PlannerService(directory, pool_size)
+    server = make_server(service, host, port)
+    print(f"Serving recipe planner on http://{host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    serve(sys.argv[2] if len(sys.argv) > 2 else '.', port=int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT)
@@ -0,0 +1,382 @@
+"""
+Bulk loads of shops and their inventories from supplier feeds.
+
+A feed is read as a stream, in one of three formats:
+
+    csv    one row per inventory line, with the columns shop_name, latitude,
+           longitude, ingredient, quantity and unit, and optionally
+           external_id. A shop's rows follow each other; a row without an
+           ingredient lists a shop with an empty inventory.
+    json   {"shops": [{"name", "latitude", "longitude", "external_id",
+           "inventory": [{"name", "quantity", "unit"}, ...]}, ...]}
+    jsonl  one such shop object per line
+
+These are the layouts `export shops` writes (see exporters.py), so an export
+can be loaded into another data directory.
+
+Feed shops are matched to stored ones by external_id when they have one (a
+stored shop of the same name and no external_id takes it on), otherwise by
+name. New shops are added, and matched ones renamed or moved to the feed's
+values. With mode='replace' the inventory of every shop in the feed becomes
+exactly the feed's lines; with mode='merge' the feed's lines are added or
+overwrite the stored line of the same ingredient and unit family, and the
+other lines are kept.
+
+The feed is written in chunks of about chunk_size inventory lines: each
+chunk is one transaction, with one executemany() per statement. Bad records
+are rejected without stopping the load. A shop without a name or with
+invalid coordinates, or whose name belongs to another shop, is skipped with
+its lines; an inventory line without a name or with a missing, negative or
+non-numeric quantity is skipped on its own. In replace mode a shop with a
+rejected line keeps the stored lines the feed does not list, so a malformed
+feed never wipes good inventory; its accepted lines are merged instead. The
+stats count the rejects and these kept inventories, and keep the reason for
+the first MAX_REJECT_SAMPLES.
+"""
+import csv
+import json
+import math
+import time
+import uuid
+
+from recipe_mapper import spatial, units
+from recipe_mapper.importer import iter_json_array
+
+DEFAULT_CHUNK_SIZE = 10000
+MAX_REJECT_SAMPLES = 100
+FORMATS = ('csv', 'json', 'jsonl')
+MODES = ('replace', 'merge')
+CSV_REQUIRED_COLUMNS = ('shop_name', 'latitude', 'longitude')
+
+
+def feed_format(file_path):
+    """The feed format a file name suggests: 'csv', 'jsonl' (.jsonl, .ndjson) or 'json'."""
+    suffix = file_path.rsplit('.', 1)[-1].lower()
+    if suffix == 'csv':
+        return 'csv'
+    if suffix in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'json'
+
+
+# Reading
+
+def _csv_shops(f):
+    """Yield (where, raw shop dict, problem) for every run of rows of the same shop."""
+    reader = csv.reader(f)
+    header = [column.strip() for column in next(reader, [])]
+    missing = [column for column in CSV_REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"The CSV feed is missing the columns: {', '.join(missing)}.")
+    # Missing optional columns read as the blank cell appended to every row
+    blank = len(header)
+    name, external_id, latitude, longitude, ingredient, quantity, unit = (
+        header.index(column) if column in header else blank
+        for column in ('shop_name', 'external_id', 'latitude', 'longitude', 'ingredient', 'quantity', 'unit'))
+
+    shop, shop_key = None, None
+    for row in reader:
+        cells = [cell.strip() for cell in row]
+        cells.extend([''] * (blank + 1 - len(cells)))
+        key = (cells[external_id], cells[name])
+        if key != shop_key:
+            if shop is not None:
+                yield shop['where'], shop, None
+            shop_key = key
+            shop = {'where': f"line {reader.line_num}", 'name': cells[name], 'external_id': cells[external_id],
+                    'latitude': cells[latitude], 'longitude': cells[longitude], 'inventory': []}
+        if cells[ingredient] or cells[quantity] or cells[unit]:
+            shop['inventory'].append({'name': cells[ingredient], 'quantity': cells[quantity], 'unit': cells[unit],
+                                      'line': reader.line_num})
+    if shop is not None:
+        yield shop['where'], shop, None
+
+
+def _json_shops(f):
+    for number, shop in enumerate(iter_json_array(f, 'shops'), start=1):
+        yield f"shop {number}", shop, None
+
+
+def _jsonl_shops(f):
+    for line_number, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield f"line {line_number}", json.loads(line), None
+        except ValueError as e:
+            yield f"line {line_number}", None, f"Invalid JSON: {e}"
+
+
+_READERS = {'csv': _csv_shops, 'json': _json_shops, 'jsonl': _jsonl_shops}
+
+
+# Validation
+
+def _reject(stats, counter, where, reason):
+    stats[counter] += 1
+    if len(stats['rejects']) < MAX_REJECT_SAMPLES:
+        stats['rejects'].append({'where': where, 'reason': reason})
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _number(value):
+    """A finite float, or ValueError (TypeError for None and the like)."""
+    if isinstance(value, bool):
+        raise ValueError
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError
+    return number
+
+
+def _coordinate(value, limit):
+    number = _number(value)
+    if not -limit <= number <= limit:
+        raise ValueError
+    return number
+
+
+def _validate_shop(where, raw, stats):
+    """
+    The shop as {'where', 'name', 'external_id', 'latitude', 'longitude',
+    'items': [(name, quantity, unit), ...], 'rejected_lines'}, rejecting bad
+    lines, or None if the whole shop is rejected.
+    """
+    if not isinstance(raw, dict):
+        _reject(stats, 'rejected_shops', where, 'A shop must be an object.')
+        return None
+    name = _text(raw.get('name', raw.get('shop_name')))
+    if not name:
+        _reject(stats, 'rejected_shops', where, 'The shop has no name.')
+        return None
+    try:
+        latitude = _coordinate(raw.get('latitude'), 90.0)
+        longitude = _coordinate(raw.get('longitude'), 180.0)
+    except (TypeError, ValueError):
+        _reject(stats, 'rejected_shops', where,
+                f"Invalid coordinates for {name!r}: {raw.get('latitude')!r}, {raw.get('longitude')!r}.")
+        return None
+    inventory = raw.get('inventory') or []
+    if not isinstance(inventory, list):
+        _reject(stats, 'rejected_shops', where, f"The inventory of {name!r} must be a list.")
+        return None
+
+    def item_where(number, item):
+        return f"line {item['line']}" if 'line' in item else f"{where}, item {number}"
+
+    items = []
+    rejected_lines = stats['rejected_lines']
+    for number, item in enumerate(inventory, start=1):
+        if not isinstance(item, dict):
+            _reject(stats, 'rejected_lines', f"{where}, item {number}", 'An inventory line must be an object.')
+            continue
+        item_name = _text(item.get('name'))
+        if not item_name:
+            _reject(stats, 'rejected_lines', item_where(number, item),
+                    f"An inventory line of {name!r} has no ingredient name.")
+            continue
+        try:
+            quantity = _number(item.get('quantity'))
+            if quantity < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            _reject(stats, 'rejected_lines', item_where(number, item),
+                    f"Invalid quantity for {item_name!r} at {name!r}: {item.get('quantity')!r}.")
+            continue
+        items.append((item_name, quantity, _text(item.get('unit'))))
+    return {'where': where, 'name': name, 'external_id': _text(raw.get('external_id')) or None,
+            'latitude': latitude, 'longitude': longitude, 'items': items,
+            'rejected_lines': stats['rejected_lines'] - rejected_lines}
+
+
+# Writing
+
+def _stored_shops(cursor, column, values):
+    """(shop_id, shop_name, latitude, longitude, external_id) of the shops whose column is one of values."""
+    cursor.execute(f'''
+    SELECT shop_id, shop_name, latitude, longitude, external_id FROM Shops
+    WHERE {column} IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(values),))
+    return cursor.fetchall()
+
+
+def _write_chunk(conn, dictionary, shops, mode, replaced, stats):
+    """
+    Write one chunk of validated shops in a single transaction. replaced holds
+    the ids of the shops whose inventory this load has already replaced.
+    Returns the (latitude, longitude) of every shop written or moved away from.
+    """
+    cursor = conn.cursor()
+    # Step 1: Fold repeats of a shop in the chunk into one: the last position wins, the lines add up
+    feed_shops = {}
+    for shop in shops:
+        key = ('external_id', shop['external_id']) if shop['external_id'] else ('name', shop['name'])
+        if key in feed_shops:
+            feed_shops[key]['items'].extend(shop['items'])
+            feed_shops[key]['rejected_lines'] += shop['rejected_lines']
+            feed_shops[key].update(name=shop['name'], latitude=shop['latitude'], longitude=shop['longitude'])
+        else:
+            feed_shops[key] = shop
+
+    # Step 2: Match them to stored shops
+    by_external_id = {row[4]: row for row in _stored_shops(
+        cursor, 'external_id', [shop['external_id'] for shop in feed_shops.values() if shop['external_id']])}
+    by_name = {row[1]: row for row in _stored_shops(cursor, 'shop_name',
+                                                    [shop['name'] for shop in feed_shops.values()])}
+    claimed_names = {}
+    inserts, updates, moves, positions, written = [], [], [], [], []
+    for shop in feed_shops.values():
+        named = by_name.get(shop['name'])
+        stored = by_external_id.get(shop['external_id']) if shop['external_id'] else named
+        if stored is None and named is not None and named[4] is None:
+            stored = named  # Takes on the feed's external_id
+        if named is not None and (stored is None or named[0] != stored[0]):
+            _reject(stats, 'rejected_shops', shop['where'], f"The name {shop['name']!r} belongs to another shop.")
+            continue
+        shop_id = stored[0] if stored is not None else str(uuid.uuid4())
+        if claimed_names.setdefault(shop['name'], shop_id) != shop_id:
+            _reject(stats, 'rejected_shops', shop['where'], f"The name {shop['name']!r} is used twice in the feed.")
+            continue
+
+        position = (shop['latitude'], shop['longitude'])
+        if stored is None:
+            inserts.append((shop_id, shop['name'], *position, shop['external_id']))
+            moves.append((shop_id, *position))
+            stats['shops_added'] += 1
+        else:
+            external_id = shop['external_id'] or stored[4]
+            if (shop['name'], *position, external_id) != stored[1:]:
+                updates.append((shop['name'], *position, external_id, shop_id))
+            if position != stored[2:4]:
+                moves.append((shop_id, *position))
+                positions.append(stored[2:4])
+            stats['shops_updated'] += 1
+        positions.append(position)
+        written.append((shop_id, shop['items']))
+        if mode == 'replace' and stored is not None and shop['rejected_lines'] and shop_id not in replaced:
+            # Deleting what the feed does not list could drop the lines that were rejected
+            _reject(stats, 'inventories_kept', shop['where'],
+                    f"Kept the stored inventory of {shop['name']!r}: {shop['rejected_lines']} of its lines "
+                    f"were rejected, so its accepted lines were merged instead.")
+            replaced.add(shop_id)
+
+    # Step 3: Shops and their grid cells
+    cursor.executemany('''
+    INSERT INTO Shops (shop_id, shop_name, latitude, longitude, external_id) VALUES (?, ?, ?, ?, ?)
+    ''', inserts)
+    cursor.executemany('''
+    UPDATE Shops SET shop_name = ?, latitude = ?, longitude = ?, external_id = ? WHERE shop_id = ?
+    ''', updates)
+    spatial.index_shops(cursor, moves)
+
+    # Step 4: Inventory lines, one row per shop, ingredient and unit family
+    lines = [(shop_id, *item) for shop_id, items in written for item in items]
+    ingredient_ids = dictionary.intern_many([name for _, name, _, _ in lines])
+    rows = [(*key, quantity, unit, canonical_quantity, family)
+            for key, quantity, unit, canonical_quantity, family in units.merge_lines(
+                ((shop_id, ingredient_id), quantity, unit)
+                for (shop_id, _, quantity, unit), ingredient_id in zip(lines, ingredient_ids))]
+
+    # Step 5: In replace mode, delete the stored lines the feed no longer has,
+    # the first time the load meets a shop; lines for it further down the
+    # feed, and shops with rejected lines (see Step 2), are merged like in
+    # merge mode
+    if mode == 'replace':
+        feed_keys = {shop_id: [] for shop_id, _ in written if shop_id not in replaced}
+        for shop_id, ingredient_id, _, _, _, family in rows:
+            if shop_id in feed_keys:
+                feed_keys[shop_id].append([ingredient_id, family])
+        cursor.executemany('''
+        DELETE FROM ShopInventory
+        WHERE shop_id = ? AND (ingredient_id IS NULL OR (ingredient_id, unit_family) NOT IN (
+            SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)))
+        ''', [(shop_id, json.dumps(keys)) for shop_id, keys in feed_keys.items()])
+        replaced.update(feed_keys)
+
+    # Step 6: Add or overwrite the feed's lines, leaving the unchanged ones alone
+    cursor.executemany('''
+    INSERT INTO ShopInventory (shop_id, ingredient_id, quantity, unit, canonical_quantity, unit_family)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (shop_id, ingredient_id, unit_family)
+    DO UPDATE SET quantity = excluded.quantity, unit = excluded.unit, canonical_quantity = excluded.canonical_quantity
+    WHERE quantity IS NOT excluded.quantity OR unit IS NOT excluded.unit
+    ''', rows)
+    conn.commit()
+    stats['inventory_lines'] += len(rows)
+    return positions
+
+
+def load_feed(conn, dictionary, file_path, file_format=None, mode='replace', chunk_size=DEFAULT_CHUNK_SIZE,
+              query_cache=None, progress=None):
+    """
+    Stream a shop feed into the shops database, interning ingredient names in
+    dictionary (an IngredientDictionary). file_format is one of FORMATS
+    (default: from the file name, see feed_format()) and mode one of MODES.
+
+    After every committed chunk the entries of query_cache around the shops
+    it wrote are dropped, and progress (if given) is called with a dict of
+    'shops' and 'lines' read so far. Returns a dict of counters: shops_added,
+    shops_updated, inventory_lines, rejected_shops, rejected_lines,
+    inventories_kept (replace mode only), rejects (samples of {'where',
+    'reason'}), seconds, rows_per_second and shops_per_second.
+    """
+    file_format = file_format or feed_format(file_path)
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown feed format: {file_format!r}")
+    if mode not in MODES:
+        raise ValueError(f"Unknown feed mode: {mode!r}")
+    stats = {'mode': mode, 'shops_added': 0, 'shops_updated': 0, 'inventory_lines': 0,
+             'rejected_shops': 0, 'rejected_lines': 0, 'inventories_kept': 0, 'rejects': []}
+    start = time.perf_counter()
+    replaced = set()
+    shops_read = lines_read = 0
+
+    def flush(chunk):
+        try:
+            positions = _write_chunk(conn, dictionary, chunk, mode, replaced, stats)
+        except Exception:
+            conn.rollback()
+            raise
+        if query_cache is not None and positions:
+            query_cache.invalidate_locations(positions)
+        if progress is not None:
+            progress({'shops': shops_read, 'lines': lines_read})
+
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        chunk, chunk_lines = [], 0
+        for where, raw, problem in _READERS[file_format](f):
+            shops_read += 1
+            lines_read += len(raw.get('inventory') or []) if isinstance(raw, dict) else 0
+            if problem is not None:
+                _reject(stats, 'rejected_shops', where, problem)
+                continue
+            shop = _validate_shop(where, raw, stats)
+            if shop is None:
+                continue
+            chunk.append(shop)
+            chunk_lines += len(shop['items'])
+            if chunk_lines >= chunk_size:
+                flush(chunk)
+                chunk, chunk_lines = [], 0
+        if chunk:
+            flush(chunk)
+
+    stats['seconds'] = time.perf_counter() - start
+    rows = stats['shops_added'] + stats['shops_updated'] + stats['inventory_lines']
+    stats['rows_per_second'] = rows / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    stats['shops_per_second'] = ((stats['shops_added'] + stats['shops_updated']) / stats['seconds']
+                                 if stats['seconds'] > 0 else 0.0)
+    return stats
+
+
+def format_feed_stats(stats):
+    text = (f"Loaded {stats['shops_added']} new and {stats['shops_updated']} updated shops "
+            f"({stats['inventory_lines']} inventory lines, {stats['mode']}) in {stats['seconds']:.1f}s, "
+            f"{stats['rows_per_second']:,.0f} rows/s; rejected {stats['rejected_shops']} shops and "
+            f"{stats['rejected_lines']} inventory lines.")
+    if stats.get('inventories_kept'):
+        text += f" Kept the stored inventory of {stats['inventories_kept']} shops with rejected lines."
+    return text
@@ -0,0 +1,165 @@
+"""
+Grid-bucket spatial index over Shops.latitude/longitude.
+
+Every shop is stored in the ShopGrid table under the fixed-size lat/lon cell
+that contains it. A radius query only reads the cells overlapping the search
+circle's bounding box, so exact distances are computed for a handful of
+candidates instead of for every row in Shops.
+"""
+import math
+
+# Size of one grid cell in degrees (~11 km of latitude). Changing this requires
+# a rebuild of ShopGrid, which rebuild_spatial_index() does.
+CELL_SIZE_DEG = 0.1
+
+# Polar radius of the WGS84 ellipsoid. Using the smallest radius makes the
+# bounding box slightly too large rather than too small, and the margin on top
+# covers the remaining sphere-vs-ellipsoid difference.
+EARTH_MIN_RADIUS_KM = 6356.752
+BOX_MARGIN = 0.01
+
+# Above this many latitude rows a single range scan beats one seek per row
+# (and stays clear of SQLite's bound-parameter limit).
+MAX_CELL_ROWS = 200
+
+
+def checked_location(latitude, longitude):
+    """
+    (latitude, longitude) as floats. Raises ValueError unless they are within
+    [-90, 90] and [-180, 180]; NaN and infinities would otherwise fail in
+    cell_for() or be stored.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValueError(f"lat and lon must be within [-90, 90] and [-180, 180], got {latitude}, {longitude}")
+    return latitude, longitude
+
+
+def checked_radius(radius_km):
+    """radius_km as a float. Raises ValueError unless it is a positive, finite number of km."""
+    radius_km = float(radius_km)
+    if not (math.isfinite(radius_km) and radius_km > 0):
+        raise ValueError(f"radius must be a positive number of km, got {radius_km}")
+    return radius_km
+
+
+def create_spatial_index(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ShopGrid (
+        cell_lat INTEGER NOT NULL,
+        cell_lon INTEGER NOT NULL,
+        shop_id TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        PRIMARY KEY (cell_lat, cell_lon, shop_id)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_shopgrid_shop_id ON ShopGrid (shop_id)')
+
+
+def ensure_spatial_index(cursor):
+    """
+    Create ShopGrid if needed and rebuild it when it no longer matches Shops,
+    e.g. for an existing shops.db or after shops were written by an older build.
+    """
+    create_spatial_index(cursor)
+    cursor.execute('SELECT COUNT(*), TOTAL(latitude), TOTAL(longitude) FROM Shops')
+    shops_summary = cursor.fetchone()
+    cursor.execute('SELECT COUNT(*), TOTAL(latitude), TOTAL(longitude) FROM ShopGrid')
+    grid_summary = cursor.fetchone()
+    if shops_summary != grid_summary:
+        rebuild_spatial_index(cursor)
+
+
+def rebuild_spatial_index(cursor):
+    cursor.execute('DELETE FROM ShopGrid')
+    cursor.execute('SELECT shop_id, latitude, longitude FROM Shops')
+    rows = [(*cell_for(lat, lon), shop_id, lat, lon) for shop_id, lat, lon in cursor.fetchall()]
+    cursor.executemany('''
+    INSERT INTO ShopGrid (cell_lat, cell_lon, shop_id, latitude, longitude)
+    VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+
+
+def cell_for(latitude, longitude):
+    return math.floor(latitude / CELL_SIZE_DEG), math.floor(longitude / CELL_SIZE_DEG)
+
+
+def index_shop(cursor, shop_id, latitude, longitude):
+    """Insert or move a shop in the grid. Call inside the same transaction as the Shops write."""
+    index_shops(cursor, [(shop_id, latitude, longitude)])
+
+
+def index_shops(cursor, shops):
+    """index_shop() for many (shop_id, latitude, longitude) at once, with one executemany() per statement."""
+    cursor.executemany('DELETE FROM ShopGrid WHERE shop_id = ?', [(shop_id,) for shop_id, _, _ in shops])
+    cursor.executemany('''
+    INSERT INTO ShopGrid (cell_lat, cell_lon, shop_id, latitude, longitude)
+    VALUES (?, ?, ?, ?, ?)
+    ''', [(*cell_for(latitude, longitude), shop_id, latitude, longitude) for shop_id, latitude, longitude in shops])
+
+
+def unindex_shop(cursor, shop_id):
+    cursor.execute('DELETE FROM ShopGrid WHERE shop_id = ?', (shop_id,))
+
+
+def bounding_boxes(center, radius_km):
+    """
+    Return the (min_lat, max_lat, min_lon, max_lon) boxes that contain every
+    point within radius_km of center. A box crossing the antimeridian is split
+    in two; a circle containing a pole covers all longitudes.
+    """
+    lat, lon = center
+    angular = radius_km / EARTH_MIN_RADIUS_KM * (1 + BOX_MARGIN)
+    if angular >= math.pi:
+        return [(-90.0, 90.0, -180.0, 180.0)]
+
+    delta_lat = math.degrees(angular)
+    min_lat = lat - delta_lat
+    max_lat = lat + delta_lat
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return [(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)]
+
+    # Widest longitude span of the circle (it is reached north/south of the
+    # center, not on its parallel).
+    ratio = math.sin(angular) / math.cos(math.radians(lat))
+    if ratio >= 1.0:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    delta_lon = math.degrees(math.asin(ratio))
+    min_lon = lon - delta_lon
+    max_lon = lon + delta_lon
+
+    if min_lon < -180.0:
+        return [(min_lat, max_lat, min_lon + 360.0, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360.0)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+def candidate_shops(cursor, center, radius_km):
+    """
+    Return (shop_id, shop_name, latitude, longitude) for every shop inside the
+    bounding box of the search circle. Callers still have to check the exact
+    distance; nothing outside the box can be within radius_km.
+    """
+    candidates = []
+    for min_lat, max_lat, min_lon, max_lon in bounding_boxes(center, radius_km):
+        min_cell_lat, min_cell_lon = cell_for(min_lat, min_lon)
+        max_cell_lat, max_cell_lon = cell_for(max_lat, max_lon)
+        cell_lats = list(range(min_cell_lat, max_cell_lat + 1))
+        if len(cell_lats) <= MAX_CELL_ROWS:
+            # One primary-key range seek per latitude row of cells
+            lat_clause = f"g.cell_lat IN ({','.join(['?'] * len(cell_lats))})"
+        else:
+            lat_clause = 'g.cell_lat BETWEEN ? AND ?'
+            cell_lats = [min_cell_lat, max_cell_lat]
+        cursor.execute(f'''
+            SELECT g.shop_id, s.shop_name, g.latitude, g.longitude
+            FROM ShopGrid g JOIN Shops s ON s.shop_id = g.shop_id
+            WHERE {lat_clause}
+              AND g.cell_lon BETWEEN ? AND ?
+              AND g.latitude BETWEEN ? AND ?
+              AND g.longitude BETWEEN ? AND ?
+        ''', (*cell_lats, min_cell_lon, max_cell_lon, min_lat, max_lat, min_lon, max_lon))
+        candidates.extend(cursor.fetchall())
+    return candidates
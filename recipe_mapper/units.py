@@ -0,0 +1,132 @@
+"""
+Unit normalization for ingredient quantities.
+
+Every unit belongs to a family with a base unit: mass (grams), volume
+(millilitres) or count (pieces; also used when there is no unit, as in
+"2 eggs"). normalize() turns a (quantity, unit) pair into (canonical_quantity,
+unit_family), so "500 g" and "0.25 kg" compare as 500.0 >= 250.0 in the mass
+family. Units that are not in the table, such as "cloves" or "slices", form a
+family of their own named after the unit, with plurals folded onto the
+singular, so they still match themselves.
+
+The canonical columns are computed when rows are written; matching compares
+them and never looks at the raw unit.
+"""
+from functools import lru_cache
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# family, factor to the family's base unit, aliases
+_UNIT_TABLE = [
+    (MASS, 1.0, ['g', 'gram', 'grams', 'gramme', 'grammes']),
+    (MASS, 0.001, ['mg', 'milligram', 'milligrams']),
+    (MASS, 1000.0, ['kg', 'kgs', 'kilo', 'kilos', 'kilogram', 'kilograms']),
+    (MASS, 28.349523125, ['oz', 'ounce', 'ounces']),
+    (MASS, 453.59237, ['lb', 'lbs', 'pound', 'pounds']),
+    (VOLUME, 1.0, ['ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres']),
+    (VOLUME, 10.0, ['cl', 'centiliter', 'centiliters', 'centilitre', 'centilitres']),
+    (VOLUME, 100.0, ['dl', 'deciliter', 'deciliters', 'decilitre', 'decilitres']),
+    (VOLUME, 1000.0, ['l', 'liter', 'liters', 'litre', 'litres']),
+    (VOLUME, 4.92892159375, ['tsp', 'tsps', 'teaspoon', 'teaspoons']),
+    (VOLUME, 14.78676478125, ['tbsp', 'tbsps', 'tbs', 'tbl', 'tablespoon', 'tablespoons']),
+    (VOLUME, 236.5882365, ['cup', 'cups']),
+    (VOLUME, 473.176473, ['pt', 'pint', 'pints']),
+    (VOLUME, 946.352946, ['qt', 'quart', 'quarts']),
+    (VOLUME, 3785.411784, ['gal', 'gallon', 'gallons']),
+    (COUNT, 1.0, ['', 'each', 'ea', 'piece', 'pieces', 'pc', 'pcs', 'whole']),
+]
+
+# Units canonical quantities are expressed in; an unlisted family is its own unit
+BASE_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: ''}
+
+# Relative slack for conversions that should be exact, e.g. 3 tsp == 1 tbsp
+QUANTITY_TOLERANCE = 1e-9
+
+UNIT_ALIASES = {alias: (family, factor) for family, factor, aliases in _UNIT_TABLE for alias in aliases}
+
+
+def _singular(unit):
+    if unit.endswith(('ches', 'shes', 'xes')):
+        return unit[:-2]
+    if len(unit) > 2 and unit.endswith('s') and not unit.endswith('ss'):
+        return unit[:-1]
+    return unit
+
+
+@lru_cache(maxsize=4096)
+def unit_info(unit):
+    """Return (unit_family, factor to the family's base unit) for a unit string or None."""
+    key = (unit or '').strip().lower().rstrip('.')
+    if key in UNIT_ALIASES:
+        return UNIT_ALIASES[key]
+    return _singular(key), 1.0
+
+
+def normalize(quantity, unit):
+    """Return (canonical_quantity, unit_family). A missing quantity stays None."""
+    family, factor = unit_info(unit)
+    if quantity is None:
+        return None, family
+    return quantity * factor, family
+
+
+def canonical_quantity(quantity, unit):
+    return normalize(quantity, unit)[0]
+
+
+def unit_family(unit):
+    return unit_info(unit)[0]
+
+
+def base_unit(family):
+    return BASE_UNITS.get(family, family)
+
+
+def combine(lines):
+    """
+    Sum (quantity, unit, canonical_quantity) lines of one unit family into
+    one such line. Lines in the same unit keep it; mixed units are reported
+    in the family's base unit. Missing quantities add nothing, and the total
+    is None only when every line lacks a quantity.
+    """
+    if len(lines) == 1:
+        return lines[0]
+    canonical_quantities = [line[2] for line in lines if line[2] is not None]
+    total = sum(canonical_quantities) if canonical_quantities else None
+    line_units = {line[1] for line in lines}
+    if len(line_units) == 1 and all(line[0] is not None for line in lines):
+        return sum(line[0] for line in lines), lines[0][1], total
+    return total, base_unit(unit_family(lines[0][1])), total
+
+
+def merge_lines(rows):
+    """
+    Normalize (key, quantity, unit) rows and merge the ones with the same key
+    and unit family. Returns (key, quantity, unit, canonical_quantity,
+    unit_family) rows in first-seen order.
+    """
+    lines = {}
+    for key, quantity, unit in rows:
+        canonical, family = normalize(quantity, unit)
+        lines.setdefault((key, family), []).append((quantity, unit, canonical))
+    return [(key, *combine(group), family) for (key, family), group in lines.items()]
+
+
+def satisfies(available_quantity, available_family, required_quantity, required_family):
+    """
+    True when an inventory row covers a requirement. A requirement without a
+    quantity ("salt to taste") only needs the family to match.
+    """
+    if available_family != required_family:
+        return False
+    if required_quantity is None:
+        return True
+    return available_quantity is not None and available_quantity >= required_quantity * (1 - QUANTITY_TOLERANCE)
+
+
+def register_sql_functions(conn):
+    """Make canonical_quantity(quantity, unit) and unit_family(unit) available to SQL on conn."""
+    conn.create_function('canonical_quantity', 2, canonical_quantity, deterministic=True)
+    conn.create_function('unit_family', 1, unit_family, deterministic=True)
@@ -0,0 +1,15 @@
+import pytest
+
+from recipe_mapper.cache import QueryCache
+from recipe_mapper.database import Database
+
+
+def item(name, quantity, unit=None):
+    return {'name': name, 'quantity': quantity, 'unit': unit}
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh set of database files with a query cache."""
+    with Database.in_directory(str(tmp_path), QueryCache()) as database:
+        yield database
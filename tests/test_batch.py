@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from conftest import item
+from recipe_mapper import batch, queries
+from recipe_mapper.database import Database
+
+CITIES = [(51.5, -0.12), (48.86, 2.35), (-33.87, 151.21)]
+PANTRY = ['flour', 'milk', 'egg', 'butter', 'sugar', 'salt', 'rice', 'tomato']
+UNITS = [('g', 'kg'), ('ml', 'l'), (None, None)]
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Without a query cache, which would answer single requests from rounded locations."""
+    with Database.in_directory(str(tmp_path)) as database:
+        yield database
+
+
+@pytest.fixture
+def stocked(db):
+    """Recipe ids of a random set of recipes and shops around CITIES, plus an empty recipe."""
+    rng = random.Random(11)
+    for number in range(60):
+        latitude, longitude = rng.choice(CITIES)
+        inventory = []
+        for name in rng.sample(PANTRY, rng.randint(1, 6)):
+            small, large = rng.choice(UNITS)
+            inventory.append(item(name, rng.choice([1, 2, 500]), rng.choice([small, large])))
+        db.add_shop(f'Shop {number}', latitude + rng.uniform(-0.05, 0.05), longitude + rng.uniform(-0.05, 0.05),
+                    inventory)
+    recipe_ids = []
+    for number in range(8):
+        ingredients = [item(name, rng.choice([1, 100, 750]), rng.choice(UNITS)[0])
+                       for name in rng.sample(PANTRY, rng.randint(1, 4))]
+        recipe_ids.append(db.add_recipe(f'Recipe {number}', ingredients))
+    recipe_ids.append(db.add_recipe('Nothing', []))
+    return recipe_ids
+
+
+def requests_for(recipe_ids, count, seed):
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        latitude, longitude = rng.choice(CITIES + [(0.0, 0.0)])
+        location = (latitude + rng.uniform(-0.03, 0.03), longitude + rng.uniform(-0.03, 0.03))
+        requests.append((rng.choice(recipe_ids + [99999]), location, rng.choice([0.5, 2.0, 5.0, 20.0])))
+    return requests
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_results_match_single_requests(db, stocked, seed):
+    requests = requests_for(stocked, 80, seed)
+    results = dict(batch.find_shops_batch(db, requests))
+    assert sorted(results) == list(range(len(requests)))
+    for index, request in enumerate(requests):
+        assert results[index] == queries.find_nearby_shops_for_recipe(db, *request)
+    assert {result['type'] for result in results.values()} == \
+        {'single', 'multiple', 'unavailable', 'no_shops', 'no_ingredients'}
+
+
+def test_requests_are_grouped_by_cell_and_recipe():
+    requests = [(3, (51.5, -0.12), 5), (1, (48.86, 2.35), 5), (2, (51.51, -0.12), 5), (1, (51.5, -0.11), 5)]
+    assert sorted(batch.group_requests(requests)) == [[1], [3, 2, 0]]
+
+
+def test_an_empty_batch():
+    assert list(batch.find_shops_batch(None, [])) == []
@@ -0,0 +1,101 @@
+import pytest
+
+from conftest import item
+from recipe_mapper.queries import find_nearby_shops_for_recipe
+
+HOME = (10.0, 10.0)
+
+
+@pytest.fixture
+def omelette(db):
+    """A recipe needing eggs and butter, a shop next to HOME stocking both, and the first (cached) answer."""
+    recipe_id = db.add_recipe('Omelette', [item('egg', 2), item('butter', 10, 'g')])
+    shop_id = db.add_shop('Corner Shop', 10.001, 10.001, [item('egg', 12), item('butter', 250, 'g'),
+                                                         item('flour', 1, 'kg')])
+    result = find_nearby_shops_for_recipe(db, recipe_id, HOME, 5)
+    assert result['type'] == 'single'
+    return recipe_id, shop_id
+
+
+def inventory_of(db, shop_id):
+    return [item(*line) for line in db.get_shop(shop_id)[3]]
+
+
+def query(db, recipe_id):
+    return find_nearby_shops_for_recipe(db, recipe_id, HOME, 5)
+
+
+def test_repeated_query_is_a_hit(db, omelette):
+    recipe_id, _ = omelette
+    assert query(db, recipe_id)['type'] == 'single'
+    stats = db.query_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_nearby_locations_share_an_entry(db, omelette):
+    recipe_id, _ = omelette
+    find_nearby_shops_for_recipe(db, recipe_id, (10.0001, 9.9999), 5)
+    assert db.query_cache.stats()['hits'] == 1
+
+
+def test_moving_the_shop_away_invalidates(db, omelette):
+    recipe_id, shop_id = omelette
+    db.update_shop(shop_id, 'Corner Shop', 40.0, 40.0, inventory_of(db, shop_id))
+    assert db.query_cache.stats()['invalidations'] == 1
+    assert query(db, recipe_id)['type'] == 'no_shops'
+
+
+def test_moving_a_shop_into_the_area_invalidates(db, omelette):
+    recipe_id, _ = omelette
+    far_id = db.add_shop('Far Shop', 50.0, 50.0, [])
+    db.update_shop(far_id, 'Far Shop', 10.002, 10.002, [])
+    assert db.query_cache.stats()['entries'] == 0
+
+
+def test_removing_a_needed_ingredient_invalidates(db, omelette):
+    recipe_id, shop_id = omelette
+    db.update_shop(shop_id, 'Corner Shop', 10.001, 10.001, [item('butter', 250, 'g'), item('flour', 1, 'kg')])
+    assert db.query_cache.stats()['entries'] == 0
+    assert query(db, recipe_id)['type'] == 'unavailable'
+
+
+def test_lowering_a_needed_quantity_invalidates(db, omelette):
+    recipe_id, shop_id = omelette
+    db.update_shop(shop_id, 'Corner Shop', 10.001, 10.001, [item('egg', 1), item('butter', 250, 'g'),
+                                                            item('flour', 1, 'kg')])
+    assert query(db, recipe_id)['type'] == 'unavailable'
+
+
+def test_editing_an_unneeded_ingredient_keeps_the_entry(db, omelette):
+    recipe_id, shop_id = omelette
+    db.update_shop(shop_id, 'Corner Shop', 10.001, 10.001, [item('egg', 12), item('butter', 250, 'g'),
+                                                            item('flour', 2, 'kg')])
+    assert db.query_cache.stats()['entries'] == 1
+    assert query(db, recipe_id)['type'] == 'single'
+    assert db.query_cache.stats()['hits'] == 1
+
+
+def test_renaming_the_shop_invalidates(db, omelette):
+    recipe_id, shop_id = omelette
+    db.update_shop(shop_id, 'Renamed Shop', 10.001, 10.001, inventory_of(db, shop_id))
+    assert db.query_cache.stats()['entries'] == 0
+    assert [shop['shop_name'] for shop in query(db, recipe_id)['shops']] == ['Renamed Shop']
+
+
+def test_a_change_elsewhere_keeps_the_entry(db, omelette):
+    db.add_shop('Elsewhere', -30.0, 100.0, [item('egg', 6)])
+    assert db.query_cache.stats()['entries'] == 1
+
+
+def test_deleting_the_shop_invalidates(db, omelette):
+    recipe_id, shop_id = omelette
+    db.delete_shop(shop_id)
+    assert query(db, recipe_id)['type'] == 'no_shops'
+
+
+def test_editing_the_recipe_invalidates_only_on_ingredient_changes(db, omelette):
+    recipe_id, _ = omelette
+    db.update_recipe(recipe_id, 'Plain Omelette', [item('egg', 2), item('butter', 10, 'g')])
+    assert db.query_cache.stats()['entries'] == 1
+    db.update_recipe(recipe_id, 'Plain Omelette', [item('egg', 3), item('butter', 10, 'g')])
+    assert db.query_cache.stats()['entries'] == 0
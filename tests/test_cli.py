@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from conftest import item
+from recipe_mapper import cli
+from recipe_mapper.database import Database
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    with Database.in_directory(str(tmp_path)) as db:
+        db.add_recipe('Omelette', [item('egg', 2)])
+        db.add_shop('Corner Shop', 10.001, 10.001, [item('egg', 12)])
+    return str(tmp_path)
+
+
+def run(capsys, data_dir, command, queries, tmp_path):
+    path = tmp_path / 'queries.jsonl'
+    path.write_text('\n'.join(queries), encoding='utf-8')
+    assert cli.main(['--data-dir', data_dir, command, str(path)]) == 0
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+@pytest.mark.parametrize('command', ['find-shops', 'in-season'])
+def test_bad_queries_give_error_records_and_the_batch_carries_on(capsys, data_dir, tmp_path, command):
+    queries = [
+        '{"recipe_id": 1, "lat": NaN, "lon": 10}',
+        '{"recipe_id": 1, "lat": 10, "lon": Infinity}',
+        '{"recipe_id": 1, "lat": 91, "lon": 10}',
+        '{"recipe_id": 1, "lat": 10, "lon": -181}',
+        '{"recipe_id": 1, "lat": 10, "lon": 10, "radius": -5}',
+        '{"recipe_id": 1, "lat": 10, "lon": 10, "radius": NaN}',
+        'not json',
+        '{"recipe_id": 1, "lat": 10, "lon": 10, "id": "good"}',
+    ]
+    records = run(capsys, data_dir, command, queries, tmp_path)
+    assert [record['id'] for record in records] == [1, 2, 3, 4, 5, 6, 7, 'good']
+    assert [record['type'] for record in records[:7]] == ['error'] * 7
+    assert records[7]['type'] != 'error'
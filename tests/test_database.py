@@ -0,0 +1,101 @@
+from conftest import item
+
+PANCAKES = [item('flour', 200, 'g'), item('milk', 300, 'ml'), item('egg', 2)]
+PANTRY = [item('flour', 1, 'kg'), item('milk', 1, 'l'), item('egg', 12)]
+
+
+def rowids(conn, table, owner_column, owner_id):
+    return conn.execute(f'SELECT rowid FROM {table} WHERE {owner_column} = ? ORDER BY rowid',
+                        (owner_id,)).fetchall()
+
+
+def line_count(conn, table):
+    return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+def test_update_recipe_without_changes_rewrites_nothing(db):
+    recipe_id = db.add_recipe('Pancakes', PANCAKES)
+    before = rowids(db.conn_recipes, 'RecipeIngredients', 'recipe_id', recipe_id)
+    changes = db.update_recipe(recipe_id, 'Pancakes', PANCAKES)
+    assert changes == {'renamed': False, 'added': [], 'removed': [], 'changed': []}
+    assert rowids(db.conn_recipes, 'RecipeIngredients', 'recipe_id', recipe_id) == before
+
+
+def test_update_recipe_reports_each_kind_of_change(db):
+    recipe_id = db.add_recipe('Pancakes', PANCAKES)
+    before = dict(db.conn_recipes.execute('''
+    SELECT i.canonical_name, ri.rowid
+    FROM RecipeIngredients ri JOIN dictionary.Ingredients i ON i.ingredient_id = ri.ingredient_id
+    ''').fetchall())
+    changes = db.update_recipe(recipe_id, 'Crepes', [item('flour', 200, 'g'), item('milk', 400, 'ml'),
+                                                     item('sugar', 1, 'tbsp')])
+    assert changes == {'renamed': True, 'added': ['sugar'], 'removed': ['egg'], 'changed': ['milk']}
+    assert db.get_recipe(recipe_id) == ('Crepes', [('flour', 200.0, 'g'), ('milk', 400.0, 'ml'),
+                                                   ('sugar', 1.0, 'tbsp')])
+    after = dict(db.conn_recipes.execute('''
+    SELECT i.canonical_name, ri.rowid
+    FROM RecipeIngredients ri JOIN dictionary.Ingredients i ON i.ingredient_id = ri.ingredient_id
+    ''').fetchall())
+    # Unchanged and changed lines are kept in place
+    assert after['flour'] == before['flour'] and after['milk'] == before['milk']
+
+
+def test_update_recipe_refreshes_the_ingredient_count(db):
+    recipe_id = db.add_recipe('Pancakes', PANCAKES)
+    db.update_recipe(recipe_id, 'Pancakes', PANCAKES[:1])
+    assert db.conn_recipes.execute('SELECT ingredient_count FROM RecipeIngredientCounts WHERE recipe_id = ?',
+                                   (recipe_id,)).fetchone() == (1,)
+
+
+def test_duplicate_lines_are_merged_per_unit_family(db):
+    recipe_id = db.add_recipe('Bread', [item('flour', 500, 'g')])
+    changes = db.update_recipe(recipe_id, 'Bread', [item('flour', 400, 'g'), item('Flour', 0.1, 'kg'),
+                                                    item('flour', 1, 'cup')])
+    assert changes == {'renamed': False, 'added': ['flour'], 'removed': [], 'changed': []}
+    assert db.get_recipe(recipe_id) == ('Bread', [('flour', 500.0, 'g'), ('flour', 1.0, 'cup')])
+
+
+def test_a_unit_change_within_a_family_is_a_change(db):
+    recipe_id = db.add_recipe('Bread', [item('flour', 500, 'g')])
+    changes = db.update_recipe(recipe_id, 'Bread', [item('flour', 0.5, 'kg')])
+    assert changes['changed'] == ['flour']
+    assert db.get_recipe(recipe_id)[1] == [('flour', 0.5, 'kg')]
+
+
+def test_update_shop_reports_moves_and_inventory_changes(db):
+    shop_id = db.add_shop('Grocer', 51.5, -0.1, PANTRY)
+    before = rowids(db.conn_shops, 'ShopInventory', 'shop_id', shop_id)
+    assert db.update_shop(shop_id, 'Grocer', 51.5, -0.1, PANTRY) == \
+        {'renamed': False, 'moved': False, 'added': [], 'removed': [], 'changed': []}
+    assert rowids(db.conn_shops, 'ShopInventory', 'shop_id', shop_id) == before
+
+    changes = db.update_shop(shop_id, 'Grocer', 51.6, -0.1, [item('flour', 2, 'kg'), item('egg', 12),
+                                                             item('butter', 250, 'g')])
+    assert changes == {'renamed': False, 'moved': True, 'added': ['butter'], 'removed': ['milk'],
+                       'changed': ['flour']}
+    assert db.get_shop(shop_id) == ('Grocer', 51.6, -0.1, [('flour', 2.0, 'kg'), ('egg', 12.0, None),
+                                                           ('butter', 250.0, 'g')])
+
+
+def test_updating_an_unknown_recipe_writes_nothing(db):
+    assert db.update_recipe(12345, 'Ghost', PANCAKES) is None
+    assert line_count(db.conn_recipes, 'Recipes') == 0
+    assert line_count(db.conn_recipes, 'RecipeIngredients') == 0
+    assert line_count(db.conn_recipes, 'RecipeIngredientCounts') == 0
+
+
+def test_updating_an_unknown_shop_writes_nothing(db):
+    assert db.update_shop('missing', 'Ghost', 1.0, 1.0, PANTRY) is None
+    assert line_count(db.conn_shops, 'Shops') == 0
+    assert line_count(db.conn_shops, 'ShopInventory') == 0
+    assert line_count(db.conn_shops, 'ShopGrid') == 0
+
+
+def test_deletes_report_whether_a_row_was_removed(db):
+    recipe_id = db.add_recipe('Pancakes', PANCAKES)
+    shop_id = db.add_shop('Grocer', 51.5, -0.1, PANTRY)
+    assert db.delete_recipe(recipe_id) is True
+    assert db.delete_recipe(recipe_id) is False
+    assert db.delete_shop(shop_id) is True
+    assert db.delete_shop(shop_id) is False
+    assert line_count(db.conn_recipes, 'RecipeIngredients') == line_count(db.conn_shops, 'ShopGrid') == 0
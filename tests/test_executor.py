@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from recipe_mapper.database import Database
+from recipe_mapper.executor import QueryExecutor
+
+# Counts far enough to run for minutes unless it is interrupted
+ENDLESS_QUERY = '''
+WITH RECURSIVE numbers(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM numbers)
+SELECT COUNT(*) FROM (SELECT n FROM numbers LIMIT 10000000000)
+'''
+
+
+@pytest.fixture
+def executor(tmp_path):
+    opened = []
+
+    def open_database():
+        database = Database.in_directory(str(tmp_path))
+        opened.append((database, threading.get_ident()))
+        return database
+
+    executor = QueryExecutor(open_database)
+    executor.opened = opened
+    yield executor
+    executor.shutdown()
+
+
+def wait(executor, timeout=10.0):
+    """Deliver results like the GUI's after() loop until the latest job is done."""
+    deadline = time.monotonic() + timeout
+    while executor.deliver():
+        assert time.monotonic() < deadline, 'the query executor did not finish in time'
+        time.sleep(0.005)
+
+
+def test_runs_queries_on_its_own_thread_and_database(executor):
+    results = []
+    executor.submit(lambda db, a, b: (db, threading.get_ident(), a + b), 2, 3, on_result=results.append)
+    assert executor.busy
+    wait(executor)
+    db, thread_id, total = results[0]
+    assert total == 5
+    assert executor.opened == [(db, thread_id)]
+    assert thread_id != threading.get_ident()
+
+
+def test_errors_go_to_on_error(executor):
+    results, errors = [], []
+
+    def fail(db):
+        raise ValueError('bad query')
+
+    executor.submit(fail, on_result=results.append, on_error=errors.append)
+    wait(executor)
+    assert results == []
+    assert [str(error) for error in errors] == ['bad query']
+
+
+def test_a_newer_job_supersedes_a_queued_one(executor):
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def blocked(db):
+        started.set()
+        release.wait(10)
+        return 'blocked'
+
+    executor.submit(blocked, on_result=results.append)
+    assert started.wait(10)
+    executor.submit(lambda db: 'queued', on_result=results.append)
+    executor.submit(lambda db: 'latest', on_result=results.append)
+    release.set()
+    wait(executor)
+    # The running job finished but was superseded; the queued one never ran
+    assert results == ['latest']
+
+
+def test_a_newer_job_interrupts_a_running_query(executor):
+    started = threading.Event()
+    results, errors = [], []
+
+    def endless(db):
+        started.set()
+        return db.conn_recipes.execute(ENDLESS_QUERY).fetchone()
+
+    executor.submit(endless, on_result=results.append, on_error=errors.append)
+    assert started.wait(10)
+    start = time.monotonic()
+    executor.submit(lambda db: 'next', on_result=results.append, on_error=errors.append)
+    wait(executor)
+    assert time.monotonic() - start < 5
+    assert (results, errors) == (['next'], [])
+
+
+def test_cancel_drops_the_running_job(executor):
+    started = threading.Event()
+    results, errors = [], []
+
+    def endless(db):
+        started.set()
+        return db.conn_recipes.execute(ENDLESS_QUERY).fetchone()
+
+    executor.submit(endless, on_result=results.append, on_error=errors.append)
+    assert started.wait(10)
+    executor.cancel()
+    assert not executor.busy
+    # The worker is free again once the interrupted query has unwound
+    executor.submit(lambda db: 'after cancel', on_result=results.append)
+    wait(executor)
+    assert (results, errors) == (['after cancel'], [])
+
+
+def test_cancel_stops_queries_started_after_it(executor):
+    started, release = threading.Event(), threading.Event()
+    results, errors = [], []
+
+    def slow_then_endless(db):
+        started.set()
+        release.wait(10)
+        return db.conn_recipes.execute(ENDLESS_QUERY).fetchone()
+
+    executor.submit(slow_then_endless, on_result=results.append, on_error=errors.append)
+    assert started.wait(10)
+    executor.cancel()
+    release.set()
+    executor.submit(lambda db: 'after cancel', on_result=results.append)
+    wait(executor)
+    assert (results, errors) == (['after cancel'], [])
+
+
+def test_shutdown_closes_the_database(tmp_path):
+    opened = []
+    executor = QueryExecutor(lambda: opened.append(Database.in_directory(str(tmp_path))) or opened[-1])
+    executor.submit(lambda db: None)
+    wait(executor)
+    executor.shutdown()
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].conn_recipes.execute('SELECT 1')
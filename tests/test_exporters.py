@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+import re
+import zlib
+
+import pytest
+
+from conftest import item
+from recipe_mapper import exporters, shop_feed
+from recipe_mapper.database import Database
+
+
+@pytest.fixture
+def catalogue(db):
+    """Two recipes (one without ingredients) and two shops (one empty); returns the recipe ids."""
+    pancakes = db.add_recipe('Pancakes', [item('flour', 200, 'g'), item('milk', 300, 'ml'), item('egg', 2)])
+    air = db.add_recipe('Air', [])
+    db.add_shop('Grocer', 51.5, -0.1, [item('flour', 1, 'kg'), item('milk', 1, 'l'), item('egg', 12)])
+    db.add_shop('Baker', 51.51, -0.1, [])
+    return pancakes, air
+
+
+def exported(db, kind, export_format, requests=None):
+    output = io.StringIO()
+    count = exporters.export(db, kind, export_format, output, requests)
+    return count, output.getvalue()
+
+
+def test_recipes_as_jsonl(db, catalogue):
+    pancakes, air = catalogue
+    count, text = exported(db, 'recipes', 'jsonl')
+    records = [json.loads(line) for line in text.splitlines()]
+    assert count == 2
+    assert [(record['recipe_id'], record['name']) for record in records] == [(air, 'Air'), (pancakes, 'Pancakes')]
+    assert records[0]['ingredients'] == []
+    assert records[1]['ingredients'][0] == {'name': 'flour', 'quantity': 200, 'unit': 'g',
+                                            'canonical_quantity': 200, 'unit_family': 'mass'}
+    assert [line['name'] for line in records[1]['ingredients']] == ['flour', 'milk', 'egg']
+
+
+def test_recipes_as_csv(db, catalogue):
+    count, text = exported(db, 'recipes', 'csv')
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert count == len(rows) == 4
+    assert list(rows[0]) == exporters.RECIPE_FIELDS
+    # A recipe without ingredients still gets a row
+    assert (rows[0]['recipe_name'], rows[0]['ingredient']) == ('Air', '')
+    assert [(row['ingredient'], row['quantity'], row['unit']) for row in rows[1:]] == \
+        [('flour', '200.0', 'g'), ('milk', '300.0', 'ml'), ('egg', '2.0', '')]
+
+
+def comparable(shop_records):
+    """Shop records without their ids; a feed stores a count's missing unit as ''."""
+    return [{**record, 'shop_id': None, 'inventory': [{**line, 'unit': line['unit'] or None}
+                                                      for line in record['inventory']]}
+            for record in shop_records]
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'jsonl'])
+def test_shops_export_loads_as_a_feed(db, catalogue, tmp_path, export_format):
+    _, text = exported(db, 'shops', export_format)
+    path = tmp_path / f'shops.{export_format}'
+    path.write_text(text, encoding='utf-8')
+    copy_directory = tmp_path / 'copy'
+    copy_directory.mkdir()
+    with Database.in_directory(str(copy_directory)) as copy:
+        stats = shop_feed.load_feed(copy.conn_shops, copy.dictionary, str(path))
+        assert (stats['shops_added'], stats['rejected_shops'], stats['rejected_lines']) == (2, 0, 0)
+        assert comparable(exporters.shop_records(copy)) == comparable(exporters.shop_records(db))
+
+
+def test_shopping_lists(db, catalogue):
+    pancakes, air = catalogue
+    requests = [('near', pancakes, (51.5, -0.1), 5), ('far', pancakes, (0.0, 0.0), 5), ('empty', air, (51.5, -0.1), 5)]
+    records = {record['id']: record for record in exporters.shopping_list_records(db, requests, batch_size=2)}
+    assert records['near']['type'] == 'single'
+    assert records['near']['route_km'] == pytest.approx(0.0, abs=0.01)
+    assert [(line['stop'], line['shop_name'], line['ingredient']) for line in records['near']['items']] == \
+        [(1, 'Grocer', 'flour'), (1, 'Grocer', 'milk'), (1, 'Grocer', 'egg')]
+    assert (records['far']['type'], records['far']['items']) == ('no_shops', [])
+    assert records['empty']['type'] == 'no_ingredients' and 'message' in records['empty']
+
+    count, text = exported(db, 'shopping-lists', 'csv', iter(requests))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert count == len(rows) == 5
+    assert [row['id'] for row in rows].count('near') == 3
+
+
+def test_an_unavailable_ingredient_is_named(db, catalogue):
+    pancakes, _ = catalogue
+    db.add_shop('Dairy', 40.0, 0.0, [item('milk', 1, 'l')])
+    [record] = exporters.shopping_list_records(db, [('dairy', pancakes, (40.0, 0.0), 1)])
+    assert (record['type'], record['ingredient']) == ('unavailable', 'flour')
+    assert exporters._shopping_list_rows(record)[0]['ingredient'] == 'flour'
+    assert exporters._shopping_list_lines(record)[0] == \
+        f'dairy: recipe {pancakes}: flour is not available in any nearby shop'
+
+
+def pdf_pages(data):
+    """Check the cross-reference table of a PDF and return the text drawn on each page."""
+    xref = int(re.search(rb'startxref\n(\d+)\n%%EOF\n$', data).group(1))
+    size, entries = re.match(rb'xref\n0 (\d+)\n(.*?)trailer\n', data[xref:], re.S).groups()
+    entries = entries.split(b' \n')[:-1]
+    assert len(entries) == int(size) and entries[0] == b'0000000000 65535 f'
+    for object_id, entry in enumerate(entries[1:], start=1):
+        assert data[int(entry[:10]):].startswith(b'%d 0 obj' % object_id)
+    contents = dict(re.findall(rb'(\d+) 0 obj\n<< /Length \d+ /Filter /FlateDecode >>\nstream\n(.*?)\nendstream',
+                               data, re.S))
+    kids = re.search(rb'/Kids \[([^\]]*)\]', data).group(1).split(b' 0 R')
+    pages = []
+    for kid in filter(None, (kid.strip() for kid in kids)):
+        page = re.search(rb'\n' + kid + rb' 0 obj\n<< /Type /Page .*?/Contents (\d+) 0 R', data).group(1)
+        stream = zlib.decompress(contents[page]).decode('latin-1')
+        pages.append([text.replace('\\(', '(').replace('\\)', ')') for text in re.findall(r'\((.*?)\) Tj', stream)])
+    return pages
+
+
+def test_pdf_export(db, catalogue, tmp_path):
+    path = tmp_path / 'recipes.pdf'
+    count = exporters.export(db, 'recipes', 'pdf', str(path))
+    assert count == 7
+    [page] = pdf_pages(path.read_bytes())
+    assert page == ['Recipes', 'Air', '', 'Pancakes', '200 g flour', '300 ml milk', '2 egg', '']
+
+
+def test_pdf_wraps_long_lines_and_adds_pages(tmp_path):
+    path = tmp_path / 'long.pdf'
+    lines = ['    ' + ' '.join(['word'] * 40)] + [f'line {number} (with parentheses)' for number in range(120)]
+    assert exporters.write_pdf(iter(lines), str(path), 'Long') == 121
+    pages = pdf_pages(path.read_bytes())
+    assert len(pages) == 3
+    assert pages[0][0] == 'Long'
+    wrapped = [text for text in pages[0][1:] if text.startswith('word')]
+    assert len(wrapped) > 1 and ' '.join(wrapped).split() == ['word'] * 40
+    assert [text for page in pages for text in page if text.startswith('line')] == \
+        [f'line {number} (with parentheses)' for number in range(120)]
+
+
+def test_unknown_kinds_and_formats(db):
+    with pytest.raises(ValueError):
+        exporters.export(db, 'ingredients', 'csv', io.StringIO())
+    with pytest.raises(ValueError):
+        exporters.export(db, 'recipes', 'xml', io.StringIO())
@@ -0,0 +1,101 @@
+import pytest
+
+from recipe_mapper import fulfillment
+
+# Two shops cover everything (one ingredient row each), but the greedy cover
+# starts with the shop covering the most and ends up needing three
+ROW_1 = [0, 1, 2, 3, 4, 5, 6]
+ROW_2 = [7, 8, 9, 10, 11, 12, 13]
+GREEDY_TRAP = {
+    'row_1': ROW_1,
+    'row_2': ROW_2,
+    'big': [0, 1, 2, 3, 7, 8, 9, 10],
+    'medium': [4, 5, 11, 12],
+    'small': [6, 13],
+}
+INGREDIENTS = [f'ingredient {bit}' for bit in range(14)]
+
+
+def mask(bits):
+    return sum(1 << bit for bit in bits)
+
+
+def candidates(shops, distance=1.0):
+    return [(mask(bits), distance) for bits in shops.values()]
+
+
+def shops_and_coverage(shops, distances=None):
+    distances = distances or {}
+    nearby = [{'shop_id': shop_id, 'distance': distances.get(shop_id, 1.0)} for shop_id in shops]
+    coverage = {shop_id: {INGREDIENTS[bit] for bit in bits} for shop_id, bits in shops.items()}
+    return nearby, coverage
+
+
+def test_greedy_cover_misses_the_optimum():
+    chosen = fulfillment.greedy_cover(candidates(GREEDY_TRAP), mask(range(14)))
+    assert sorted(chosen) == [2, 3, 4]
+
+
+def test_exact_cover_finds_the_optimum():
+    chosen = fulfillment.exact_cover(candidates(GREEDY_TRAP), mask(range(14)))
+    assert sorted(chosen) == [0, 1]
+
+
+def test_covers_return_none_when_something_is_missing():
+    shops = [(mask([0]), 1.0), (mask([1]), 1.0)]
+    assert fulfillment.greedy_cover(shops, mask([0, 1, 2])) is None
+    assert fulfillment.exact_cover(shops, mask([0, 1, 2])) is None
+
+
+def test_exact_cover_breaks_ties_by_distance():
+    shops = [(mask([0, 1]), 5.0), (mask([0]), 1.0), (mask([1]), 1.0), (mask([0, 1]), 3.0)]
+    assert fulfillment.exact_cover(shops, mask([0, 1])) == [3]
+
+
+def test_greedy_cover_drops_redundant_shops():
+    shops = [(mask([0, 1, 2]), 1.0), (mask([2, 3]), 2.0), (mask([0, 1, 3]), 1.5)]
+    chosen = fulfillment.greedy_cover(shops, mask([0, 1, 2, 3]))
+    assert sorted(chosen) == [0, 2]
+
+
+@pytest.mark.parametrize('strategy, expected', [
+    ('greedy', ['big', 'medium', 'small']),
+    ('exact', ['row_1', 'row_2']),
+    ('auto', ['row_1', 'row_2']),
+])
+def test_plan_fulfillment_strategies(strategy, expected):
+    nearby, coverage = shops_and_coverage(GREEDY_TRAP)
+    selected, ingredient_to_shop = fulfillment.plan_fulfillment(nearby, coverage, INGREDIENTS, strategy)
+    assert sorted(shop['shop_id'] for shop in selected) == expected
+    for ingredient, shop in ingredient_to_shop.items():
+        assert ingredient in coverage[shop['shop_id']]
+    assert set(ingredient_to_shop) == set(INGREDIENTS)
+
+
+def test_plan_fulfillment_prefers_one_shop_then_the_closest():
+    nearby, coverage = shops_and_coverage({'far': range(14), 'near': range(14), 'part': range(7)},
+                                          {'far': 9.0, 'near': 2.0, 'part': 0.5})
+    selected, ingredient_to_shop = fulfillment.plan_fulfillment(nearby, coverage, INGREDIENTS)
+    assert [shop['shop_id'] for shop in selected] == ['near']
+    assert {shop['shop_id'] for shop in ingredient_to_shop.values()} == {'near'}
+
+
+def test_plan_fulfillment_assigns_each_ingredient_to_the_closest_selected_shop():
+    nearby, coverage = shops_and_coverage({'a': [0, 1, 2], 'b': [2, 3]}, {'a': 4.0, 'b': 1.0})
+    selected, ingredient_to_shop = fulfillment.plan_fulfillment(nearby, coverage, INGREDIENTS[:4])
+    assert [shop['shop_id'] for shop in selected] == ['b', 'a']
+    assert ingredient_to_shop[INGREDIENTS[2]]['shop_id'] == 'b'
+
+
+def test_plan_fulfillment_raises_for_an_unavailable_ingredient():
+    nearby, coverage = shops_and_coverage({'a': [0]})
+    with pytest.raises(ValueError):
+        fulfillment.plan_fulfillment(nearby, coverage, INGREDIENTS[:2])
+
+
+def test_plan_fulfillment_with_many_shops_uses_the_vectorized_filter():
+    # Shop i covers ingredient i % 14; only the closest shop per ingredient is useful
+    nearby = [{'shop_id': i, 'distance': float(i)} for i in range(fulfillment.VECTORIZE_MIN_SHOPS + 50)]
+    coverage = {shop['shop_id']: {INGREDIENTS[shop['shop_id'] % 14]} for shop in nearby}
+    selected, _ = fulfillment.plan_fulfillment(nearby, coverage, INGREDIENTS)
+    assert [shop['shop_id'] for shop in selected] == list(range(14))
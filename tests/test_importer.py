@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from recipe_mapper import recipe_index
+
+
+def write_dataset(tmp_path, count):
+    path = tmp_path / 'recipes.json'
+    path.write_text(json.dumps({'recipes': [{'title': f'Recipe {number}', 'ingredients': ['2 cups flour', '12 eggs']}
+                                            for number in range(count)]}), encoding='utf-8')
+    return str(path)
+
+
+def count(db, sql):
+    return db.conn_recipes.execute(sql).fetchone()[0]
+
+
+def test_import(db, tmp_path):
+    stats = db.import_recipes(write_dataset(tmp_path, 25), chunk_size=10, workers=1, progress=lambda update: None)
+    assert stats['recipes'] == 25
+    assert db.get_recipe(1) == ('Recipe 0', [('flour', 2.0, 'cups'), ('eggs', 12.0, None)])
+    assert count(db, 'SELECT COUNT(*) FROM RecipeIngredientCounts') == 25
+
+
+def test_a_failed_chunk_is_rolled_back_and_the_import_resumes(db, tmp_path, monkeypatch):
+    path = write_dataset(tmp_path, 50)
+    store_recipe_counts = recipe_index.store_recipe_counts
+    calls = []
+
+    def failing(cursor, counts):
+        calls.append(counts)
+        if len(calls) == 3:
+            raise RuntimeError('disk on fire')
+        store_recipe_counts(cursor, counts)
+
+    monkeypatch.setattr(recipe_index, 'store_recipe_counts', failing)
+    with pytest.raises(RuntimeError):
+        db.import_recipes(path, chunk_size=10, workers=1, progress=lambda update: None)
+    # The third chunk left nothing behind, the checkpoint is at the second
+    assert count(db, 'SELECT COUNT(*) FROM Recipes') == 20
+    assert count(db, 'SELECT COUNT(DISTINCT recipe_id) FROM RecipeIngredients') == 20
+    assert count(db, 'SELECT MAX(records_done) FROM ImportCheckpoints') == 20
+
+    monkeypatch.setattr(recipe_index, 'store_recipe_counts', store_recipe_counts)
+    stats = db.import_recipes(path, chunk_size=10, workers=1, progress=lambda update: None)
+    assert (stats['recipes'], stats['resumed_from']) == (30, 20)
+    assert count(db, 'SELECT COUNT(*) FROM Recipes') == 50
+    assert count(db, 'SELECT COUNT(*) FROM RecipeIngredientCounts') == 50
@@ -0,0 +1,44 @@
+import pytest
+
+from recipe_mapper.ingredients import parse_ingredient, parse_many
+
+
+@pytest.mark.parametrize('text, quantity, unit, name', [
+    ('2 cups of flour', 2.0, 'cups', 'flour'),
+    ('2cups flour', 2.0, 'cups', 'flour'),
+    ('250 g butter', 250.0, 'g', 'butter'),
+    ('1 tbsp. sugar', 1.0, 'tbsp', 'sugar'),
+    ('0.5 l milk', 0.5, 'l', 'milk'),
+    ('.5 l milk', 0.5, 'l', 'milk'),
+    ('1/2 cup sugar', 0.5, 'cup', 'sugar'),
+    ('1 1/2 cups rice', 1.5, 'cups', 'rice'),
+    ('1 ½ tbsp oil', 1.5, 'tbsp', 'oil'),
+    ('½ tsp salt', 0.5, 'tsp', 'salt'),
+    ('2-3 cloves garlic', 3.0, 'cloves', 'garlic'),
+    ('2 to 3 cloves garlic', 3.0, 'cloves', 'garlic'),
+])
+def test_quantity_unit_and_name(text, quantity, unit, name):
+    assert parse_ingredient(text) == {'quantity': quantity, 'unit': unit, 'name': name}
+
+
+@pytest.mark.parametrize('text, quantity, name', [
+    ('12 eggs', 12.0, 'eggs'),
+    ('2 eggs', 2.0, 'eggs'),
+    ('3 onions, chopped', 3.0, 'onions, chopped'),
+])
+def test_unitless_counts(text, quantity, name):
+    assert parse_ingredient(text) == {'quantity': quantity, 'unit': None, 'name': name}
+
+
+@pytest.mark.parametrize('text', ['salt to taste', 'Fresh basil', '  pepper  '])
+def test_lines_without_a_quantity(text):
+    assert parse_ingredient(text) == {'quantity': None, 'unit': None, 'name': text.strip()}
+
+
+def test_zero_denominator_is_not_a_quantity():
+    assert parse_ingredient('1/0 cup sugar')['quantity'] is None
+
+
+def test_parse_many_keeps_the_order():
+    lines = ['12 eggs', '2 cups of flour', 'salt to taste', '12 eggs']
+    assert parse_many(lines) == [parse_ingredient(line) for line in lines]
@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import item
+from recipe_mapper import queries
+from recipe_mapper.database import Database
+
+HERE = (51.5, -0.1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Without a query cache; meal plans are never cached anyway."""
+    with Database.in_directory(str(tmp_path)) as database:
+        yield database
+
+
+def test_quantities_are_scaled_and_summed_across_the_plan(db):
+    pancakes = db.add_recipe('Pancakes', [item('flour', 200, 'g'), item('milk', 300, 'ml'), item('egg', 2)])
+    bread = db.add_recipe('Bread', [item('flour', 0.5, 'kg'), item('salt', 1, 'tsp')])
+    db.add_shop('Grocer', *HERE, [item('flour', 1, 'kg'), item('milk', 1, 'l'), item('egg', 12),
+                                  item('salt', 500, 'g')])
+    result = queries.find_shops_for_meal_plan(db, [(pancakes, 1.5), (bread, 1)], HERE, 5)
+    # The salt is needed by volume and the grocer only sells it by weight
+    assert (result['type'], result['ingredient']) == ('unavailable', 'salt')
+    db.add_shop('Spice Shop', *HERE, [item('salt', 1, 'cup')])
+    result = queries.find_shops_for_meal_plan(db, [(pancakes, 1.5), (bread, 1)], HERE, 5)
+    assert result['type'] == 'multiple'
+    needed = result['ingredients_needed']
+    # 300 g and 0.5 kg of flour are one mass requirement of 800 g
+    assert needed['flour']['canonical_quantity'] == pytest.approx(800)
+    assert needed['milk']['canonical_quantity'] == pytest.approx(450)
+    assert needed['egg']['quantity'] == pytest.approx(3)
+    assert result['ingredient_to_shop']['flour']['shop_name'] == 'Grocer'
+
+
+def test_a_repeated_recipe_needs_the_total(db):
+    bread = db.add_recipe('Bread', [item('flour', 600, 'g')])
+    db.add_shop('Corner Shop', *HERE, [item('flour', 1, 'kg')])
+    assert queries.find_shops_for_meal_plan(db, [(bread, 1)], HERE, 5)['type'] == 'single'
+    result = queries.find_shops_for_meal_plan(db, [(bread, 1), (bread, 1)], HERE, 5)
+    assert (result['type'], result['ingredient']) == ('unavailable', 'flour')
+    db.add_shop('Mill', *HERE, [item('flour', 25, 'kg')])
+    result = queries.find_shops_for_meal_plan(db, [(bread, 1), (bread, 1)], HERE, 5)
+    assert [shop['shop_name'] for shop in result['shops']] == ['Mill']
+
+
+def test_a_plan_matches_the_single_recipe_query(db):
+    pancakes = db.add_recipe('Pancakes', [item('flour', 200, 'g'), item('milk', 300, 'ml'), item('egg', 2)])
+    db.add_shop('Grocer', 51.501, -0.1, [item('flour', 1, 'kg'), item('milk', 1, 'l')])
+    db.add_shop('Farm', 51.49, -0.1, [item('egg', 6)])
+    assert queries.find_shops_for_meal_plan(db, [(pancakes, 1)], HERE, 5) == \
+        queries.find_nearby_shops_for_recipe(db, pancakes, HERE, 5)
+
+
+def test_empty_plans_and_no_shops(db):
+    empty = db.add_recipe('Air', [])
+    bread = db.add_recipe('Bread', [item('flour', 600, 'g')])
+    assert queries.find_shops_for_meal_plan(db, [], HERE, 5)['type'] == 'no_ingredients'
+    assert queries.find_shops_for_meal_plan(db, [(empty, 3), (12345, 1)], HERE, 5)['type'] == 'no_ingredients'
+    assert queries.find_shops_for_meal_plan(db, [(bread, 1), (empty, 1)], HERE, 5)['type'] == 'no_shops'
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+
+import pytest
+
+from recipe_mapper import migrations, spatial
+from recipe_mapper.database import Database
+
+# The schema and data of a database created before the first migration
+BASELINE_RECIPES = '''
+CREATE TABLE Recipes (recipe_id INTEGER PRIMARY KEY AUTOINCREMENT, recipe_name TEXT NOT NULL UNIQUE);
+CREATE TABLE RecipeIngredients (recipe_id INTEGER, ingredient_name TEXT, quantity REAL, unit TEXT,
+                                FOREIGN KEY (recipe_id) REFERENCES Recipes(recipe_id));
+INSERT INTO Recipes VALUES (1, 'Cake'), (2, 'Toast');
+INSERT INTO RecipeIngredients VALUES (1, 'flour', 200, 'g'), (1, 'Flour', 0.1, 'kg'), (1, 'egg', 2, ''),
+                                     (2, 'bread', 1, 'slice');
+'''
+BASELINE_SHOPS = '''
+CREATE TABLE Shops (shop_id TEXT PRIMARY KEY, shop_name TEXT NOT NULL UNIQUE,
+                    latitude REAL NOT NULL, longitude REAL NOT NULL);
+CREATE TABLE ShopInventory (shop_id TEXT, ingredient_name TEXT, quantity REAL, unit TEXT,
+                            FOREIGN KEY (shop_id) REFERENCES Shops(shop_id));
+INSERT INTO Shops VALUES ('a', 'Bakery', 51.5, -0.1);
+INSERT INTO ShopInventory VALUES ('a', 'flour', 1, 'kg'), ('a', 'egg', 12, '');
+'''
+
+
+def schema_version(conn):
+    return conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0]
+
+
+def names(conn, kind):
+    return {row[0] for row in conn.execute('SELECT name FROM sqlite_master WHERE type = ?', (kind,))}
+
+
+def columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+@pytest.fixture
+def baseline_dir(tmp_path):
+    for file_name, script in (('recipes.db', BASELINE_RECIPES), ('shops.db', BASELINE_SHOPS)):
+        conn = sqlite3.connect(os.path.join(str(tmp_path), file_name))
+        conn.executescript(script)
+        conn.close()
+    return str(tmp_path)
+
+
+def test_baseline_databases_are_upgraded_to_the_latest_version(baseline_dir):
+    with Database.in_directory(baseline_dir) as db:
+        assert schema_version(db.conn_recipes) == max(m[0] for m in migrations.RECIPES_MIGRATIONS)
+        assert schema_version(db.conn_shops) == max(m[0] for m in migrations.SHOPS_MIGRATIONS)
+        assert 'ingredient_name' not in columns(db.conn_recipes, 'RecipeIngredients')
+        assert {'ingredient_id', 'canonical_quantity', 'unit_family'} <= columns(db.conn_recipes, 'RecipeIngredients')
+        assert 'external_id' in columns(db.conn_shops, 'Shops')
+        assert {'RecipeIngredientCounts', 'ImportCheckpoints'} <= names(db.conn_recipes, 'table')
+        assert 'ShopGrid' in names(db.conn_shops, 'table')
+        assert {'idx_recipeingredients_unique', 'idx_recipes_name_nocase'} <= names(db.conn_recipes, 'index')
+        assert {'idx_shopinventory_unique', 'idx_shops_external_id'} <= names(db.conn_shops, 'index')
+
+
+def test_upgrade_keeps_and_merges_the_data(baseline_dir):
+    with Database.in_directory(baseline_dir) as db:
+        # The two flour lines differ only in case and unit, so they become one line in grams
+        assert db.get_recipe(1) == ('Cake', [('egg', 2.0, ''), ('flour', 300.0, 'g')])
+        assert db.get_recipe(2) == ('Toast', [('bread', 1.0, 'slice')])
+        assert db.get_shop('a') == ('Bakery', 51.5, -0.1, [('flour', 1.0, 'kg'), ('egg', 12.0, '')])
+        assert db.conn_recipes.execute('SELECT recipe_id, ingredient_count FROM RecipeIngredientCounts '
+                                       'ORDER BY recipe_id').fetchall() == [(1, 2), (2, 1)]
+        assert db.conn_shops.execute('SELECT COUNT(*) FROM ShopGrid').fetchone() == (1,)
+
+
+def test_grid_migration_puts_shops_in_the_cells_of_cell_for(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'shops.db'))
+    positions = [(51.5, -0.1), (-33.87, 151.21), (-0.05, -179.95), (0.0, 0.0), (-90.0, 180.0), (12.3, -45.6)]
+    migrations.apply_migrations(conn, migrations.SHOPS_MIGRATIONS[:1])
+    conn.executemany('INSERT INTO Shops VALUES (?, ?, ?, ?)',
+                     [(str(number), f'Shop {number}', *position) for number, position in enumerate(positions)])
+    conn.commit()
+    migrations.apply_migrations(conn, migrations.SHOPS_MIGRATIONS[:2])
+    cells = conn.execute('SELECT cell_lat, cell_lon FROM ShopGrid ORDER BY CAST(shop_id AS INTEGER)').fetchall()
+    assert cells == [spatial.cell_for(*position) for position in positions]
+    conn.close()
+
+
+def test_reopening_applies_nothing(baseline_dir):
+    with Database.in_directory(baseline_dir):
+        pass
+    with Database.in_directory(baseline_dir) as db:
+        assert db.conn_recipes.execute('SELECT COUNT(*) FROM schema_version').fetchone() == \
+            (len(migrations.RECIPES_MIGRATIONS),)
+        assert migrations.apply_migrations(db.conn_shops, migrations.SHOPS_MIGRATIONS) == \
+            schema_version(db.conn_shops)
+
+
+def test_a_failing_migration_is_rolled_back(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'test.db'))
+    broken = [
+        (1, 'Create a table', ['CREATE TABLE First (id INTEGER)']),
+        (2, 'Fails half way', ['CREATE TABLE Second (id INTEGER)', 'INSERT INTO Missing VALUES (1)']),
+    ]
+    with pytest.raises(sqlite3.OperationalError):
+        migrations.apply_migrations(conn, broken)
+    assert migrations.get_schema_version(conn) == 1
+    assert 'Second' not in names(conn, 'table')
+    conn.close()
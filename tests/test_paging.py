@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+NAMES = ['apple pie', 'Apple Crumble', 'apple pie', 'Banana Bread', 'banana split', 'Çorba', 'cherry tart',
+         'Zucchini Fritters', 'zabaglione', '10-minute soup', 'APPLE SAUCE']
+
+
+@pytest.fixture
+def recipes(db):
+    """(recipe_id, recipe_name) of NAMES plus 200 shuffled generated names, stored in random order."""
+    names = NAMES + [f'Recipe {number:03d}' for number in range(200)]
+    random.Random(3).shuffle(names)
+    with db.conn_recipes:
+        # Recipes.recipe_name is UNIQUE, so the repeated name gets a trailing space
+        rows = [(name if name not in names[:index] else name + ' ',) for index, name in enumerate(names)]
+        db.conn_recipes.executemany('INSERT INTO Recipes (recipe_name) VALUES (?)', rows)
+    return db.conn_recipes.execute('SELECT recipe_id, recipe_name FROM Recipes').fetchall()
+
+
+def in_name_order(rows):
+    return sorted(rows, key=lambda row: (row[1].lower(), row[0]))
+
+
+def all_pages(page, limit, prefix=''):
+    rows, after = [], None
+    while True:
+        chunk = page(prefix, after, limit)
+        assert len(chunk) <= limit
+        if not chunk:
+            return rows
+        rows.extend(chunk)
+        after = chunk[-1]
+
+
+@pytest.mark.parametrize('limit', [1, 7, 100, 1000])
+def test_pages_walk_the_whole_table_in_name_order(db, recipes, limit):
+    assert all_pages(db.recipes_page, limit) == in_name_order(recipes)
+
+
+@pytest.mark.parametrize('prefix', ['apple', 'APPLE', 'b', 'recipe 1', 'z', '1', 'nothing'])
+def test_prefix_pages_are_case_insensitive(db, recipes, prefix):
+    expected = [row for row in in_name_order(recipes) if row[1].lower().startswith(prefix.lower())]
+    assert all_pages(db.recipes_page, 3, prefix) == expected
+
+
+def test_names_equal_but_for_case_are_ordered_by_id(db):
+    first = db.add_recipe('Soup', [])
+    second = db.add_recipe('soup', [])
+    third = db.add_recipe('SOUP', [])
+    assert db.recipes_page('', None, 2) == [(first, 'Soup'), (second, 'soup')]
+    assert db.recipes_page('', (second, 'soup'), 2) == [(third, 'SOUP')]
+
+
+def test_a_page_after_a_deleted_row_still_continues(db, recipes):
+    page = db.recipes_page('', None, 10)
+    db.delete_recipe(page[-1][0])
+    rest = db.recipes_page('', page[-1], 5)
+    assert rest == in_name_order(recipes)[10:15]
+
+
+def test_pages_use_the_name_index(db, recipes):
+    plan = db.conn_recipes.execute('''
+        EXPLAIN QUERY PLAN
+        SELECT recipe_id, recipe_name FROM Recipes
+        WHERE (recipe_name COLLATE NOCASE, recipe_id) > (?, ?)
+        ORDER BY recipe_name COLLATE NOCASE, recipe_id LIMIT 10
+    ''', ('m', 0)).fetchall()
+    assert any('idx_recipes_name_nocase' in row[-1] for row in plan)
+    assert not any('TEMP B-TREE' in row[-1] for row in plan)
+
+
+def test_shop_pages(db):
+    shop_ids = {name: db.add_shop(name, 0.0, 0.0, []) for name in ['delta', 'Alpha', 'charlie', 'Bravo']}
+    first = db.shops_page('', None, 2)
+    assert first == [(shop_ids['Alpha'], 'Alpha'), (shop_ids['Bravo'], 'Bravo')]
+    assert db.shops_page('', first[-1], 2) == [(shop_ids['charlie'], 'charlie'), (shop_ids['delta'], 'delta')]
+    assert db.shops_page('C') == [(shop_ids['charlie'], 'charlie')]
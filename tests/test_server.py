@@ -0,0 +1,166 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from recipe_mapper.server import PlannerService, make_server
+
+OMELETTE = {'name': 'Omelette', 'ingredients': [{'name': 'egg', 'quantity': 2, 'unit': ''},
+                                                 {'name': 'butter', 'quantity': 10, 'unit': 'g'}]}
+CORNER_SHOP = {'name': 'Corner Shop', 'latitude': 10.001, 'longitude': 10.001, 'inventory': [
+    {'name': 'egg', 'quantity': 12, 'unit': ''}, {'name': 'butter', 'quantity': 250, 'unit': 'g'}]}
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = PlannerService(str(tmp_path), pool_size=2)
+    yield service
+    service.close()
+
+
+def call(service, method, path, body=None, **params):
+    return service.handle(method, path, {name: [str(value)] for name, value in params.items()}, body or {})
+
+
+@pytest.fixture
+def stocked(service):
+    """The ids of OMELETTE and CORNER_SHOP, added through the service."""
+    status, created = call(service, 'POST', '/recipes', OMELETTE)
+    assert status == 201
+    status, shop = call(service, 'POST', '/shops', CORNER_SHOP)
+    assert status == 201
+    return created['recipe_id'], shop['shop_id']
+
+
+def test_find_shops(service, stocked):
+    recipe_id, shop_id = stocked
+    status, result = call(service, 'GET', '/find-shops', recipe_id=recipe_id, lat=10, lon=10, radius=5)
+    assert status == 200
+    assert result['type'] == 'single'
+    assert [shop['shop_id'] for shop in result['shops']] == [shop_id]
+    assert result['route_km'] > 0
+
+
+def test_meal_plan_and_in_season(service, stocked):
+    recipe_id, _ = stocked
+    status, result = call(service, 'POST', '/meal-plan',
+                          {'recipes': [[recipe_id, 2]], 'lat': 10, 'lon': 10, 'radius': 5})
+    assert (status, result['type']) == (200, 'single')
+    status, result = call(service, 'GET', '/in-season', lat=10, lon=10, radius=5)
+    assert (status, result['type']) == (200, 'in_season')
+    assert [recipe_id for recipe_id, _ in result['recipes']] == [recipe_id]
+
+
+@pytest.mark.parametrize('lat, lon, radius', [
+    ('nan', 10, 5), (10, 'inf', 5), (91, 10, 5), (10, -180.5, 5), (10, 10, 'nan'), (10, 10, 0), (10, 10, -5),
+    (10, 10, 'far'),
+])
+def test_queries_reject_bad_locations_and_radii(service, stocked, lat, lon, radius):
+    recipe_id, _ = stocked
+    status, result = call(service, 'GET', '/find-shops', recipe_id=recipe_id, lat=lat, lon=lon, radius=radius)
+    assert (status, result['type']) == (400, 'error')
+    status, result = call(service, 'GET', '/in-season', lat=lat, lon=lon, radius=radius)
+    assert (status, result['type']) == (400, 'error')
+    status, result = call(service, 'POST', '/meal-plan',
+                          {'recipes': [[recipe_id, 1]], 'lat': lat, 'lon': lon, 'radius': radius})
+    assert (status, result['type']) == (400, 'error')
+
+
+@pytest.mark.parametrize('servings', [0, -1, float('nan'), float('inf')])
+def test_meal_plan_rejects_bad_servings(service, stocked, servings):
+    recipe_id, _ = stocked
+    status, _ = call(service, 'POST', '/meal-plan', {'recipes': [[recipe_id, servings]], 'lat': 10, 'lon': 10,
+                                                     'radius': 5})
+    assert status == 400
+
+
+def test_route_orders_the_shops(service):
+    status, result = call(service, 'POST', '/route', {'lat': 0, 'lon': 0, 'shops': [
+        {'name': 'far', 'latitude': 0, 'longitude': 0.2}, {'name': 'near', 'latitude': 0, 'longitude': 0.1}]})
+    assert status == 200
+    assert [shop['name'] for shop in result['shops']] == ['near', 'far']
+    status, _ = call(service, 'POST', '/route', {'lat': 0, 'lon': 0, 'shops': [{'latitude': 95, 'longitude': 0}]})
+    assert status == 400
+
+
+def test_recipe_crud(service):
+    status, created = call(service, 'POST', '/recipes', OMELETTE)
+    recipe_id = created['recipe_id']
+    assert status == 201
+    assert call(service, 'POST', '/recipes', OMELETTE)[0] == 409
+
+    status, recipe = call(service, 'GET', f'/recipes/{recipe_id}')
+    assert (status, recipe['name']) == (200, 'Omelette')
+    status, changes = call(service, 'PUT', f'/recipes/{recipe_id}',
+                           {'name': 'Omelette', 'ingredients': OMELETTE['ingredients'][:1]})
+    assert (status, changes['removed']) == (200, ['butter'])
+    status, page = call(service, 'GET', '/recipes', prefix='om')
+    assert [recipe['recipe_id'] for recipe in page['recipes']] == [recipe_id]
+
+    assert call(service, 'DELETE', f'/recipes/{recipe_id}')[0] == 200
+    assert call(service, 'DELETE', f'/recipes/{recipe_id}')[0] == 404
+    assert call(service, 'GET', f'/recipes/{recipe_id}')[0] == 404
+    assert call(service, 'PUT', f'/recipes/{recipe_id}', OMELETTE)[0] == 404
+
+
+def test_shop_crud(service):
+    status, created = call(service, 'POST', '/shops', CORNER_SHOP)
+    shop_id = created['shop_id']
+    assert status == 201
+    status, result = call(service, 'POST', '/shops', CORNER_SHOP)
+    assert (status, result['message']) == (409, "Shop name 'Corner Shop' already exists.")
+
+    status, changes = call(service, 'PUT', f'/shops/{shop_id}', {**CORNER_SHOP, 'latitude': 10.5})
+    assert (status, changes['moved']) == (200, True)
+    status, shop = call(service, 'GET', f'/shops/{shop_id}')
+    assert (status, shop['latitude']) == (200, 10.5)
+
+    assert call(service, 'DELETE', f'/shops/{shop_id}')[0] == 200
+    assert call(service, 'DELETE', f'/shops/{shop_id}')[0] == 404
+    assert call(service, 'DELETE', '/shops/no-such-shop')[0] == 404
+    assert call(service, 'PUT', f'/shops/{shop_id}', CORNER_SHOP)[0] == 404
+
+
+@pytest.mark.parametrize('latitude, longitude', [(float('nan'), 0), (95, 0), (0, 181), (float('-inf'), 0),
+                                                 (None, 0), ('north', 0)])
+def test_shops_with_bad_coordinates_are_rejected(service, latitude, longitude):
+    status, result = call(service, 'POST', '/shops', {**CORNER_SHOP, 'latitude': latitude, 'longitude': longitude})
+    assert (status, result['type']) == (400, 'error')
+    assert call(service, 'GET', '/shops')[1]['shops'] == []
+
+    shop_id = call(service, 'POST', '/shops', CORNER_SHOP)[1]['shop_id']
+    status, _ = call(service, 'PUT', f'/shops/{shop_id}', {**CORNER_SHOP, 'latitude': latitude, 'longitude': longitude})
+    assert status == 400
+    assert call(service, 'GET', f'/shops/{shop_id}')[1]['latitude'] == CORNER_SHOP['latitude']
+
+
+def test_unknown_paths_and_methods(service):
+    assert call(service, 'GET', '/nowhere')[0] == 404
+    assert call(service, 'PATCH', '/recipes')[0] == 405
+    assert call(service, 'GET', '/find-shops', lat=10, lon=10, radius=5)[0] == 400
+
+
+def test_over_http(service, stocked):
+    recipe_id, _ = stocked
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=10)
+        connection.request('GET', f'/find-shops?recipe_id={recipe_id}&lat=10&lon=10&radius=5')
+        response = connection.getresponse()
+        assert (response.status, json.loads(response.read())['type']) == (200, 'single')
+        # NaN is not valid JSON for a strict client, but Python's json accepts it
+        connection.request('POST', '/meal-plan', body='{"recipes": [], "lat": 10, "lon": 10, "radius": NaN}',
+                           headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        assert (response.status, json.loads(response.read())['type']) == (400, 'error')
+        connection.request('POST', '/shops', body='not json')
+        response = connection.getresponse()
+        assert response.status == 400
+        response.read()
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+from recipe_mapper.shop_feed import format_feed_stats
+
+BAKERY = {'name': 'Bakery', 'latitude': 51.5, 'longitude': -0.1, 'inventory': [
+    {'name': 'flour', 'quantity': 1, 'unit': 'kg'},
+    {'name': 'egg', 'quantity': 12, 'unit': ''},
+]}
+DAIRY = {'name': 'Dairy', 'latitude': 51.6, 'longitude': -0.2, 'inventory': [
+    {'name': 'milk', 'quantity': 1, 'unit': 'l'},
+]}
+
+
+def shop(template, inventory):
+    return {**template, 'inventory': inventory}
+
+
+@pytest.fixture
+def load(db, tmp_path):
+    """Write shops to a JSON lines feed and load it, returning the stats."""
+    feeds = []
+
+    def load(shops, mode='replace', **options):
+        path = tmp_path / f'feed{len(feeds)}.jsonl'
+        path.write_text('\n'.join(json.dumps(raw) for raw in shops), encoding='utf-8')
+        feeds.append(path)
+        return db.import_shops(str(path), mode=mode, **options)
+    return load
+
+
+def inventories(db):
+    return {name: sorted(db.get_shop(shop_id)[3]) for shop_id, name in db.get_all_shops()}
+
+
+def test_a_clean_feed_is_loaded(db, load):
+    stats = load([BAKERY, DAIRY])
+    assert (stats['shops_added'], stats['shops_updated'], stats['inventory_lines']) == (2, 0, 3)
+    assert (stats['rejected_shops'], stats['rejected_lines'], stats['rejects']) == (0, 0, [])
+    assert inventories(db) == {'Bakery': [('egg', 12.0, ''), ('flour', 1.0, 'kg')], 'Dairy': [('milk', 1.0, 'l')]}
+
+
+def test_replace_mode_drops_lines_the_feed_no_longer_has(db, load):
+    load([BAKERY, DAIRY])
+    stats = load([shop(BAKERY, [{'name': 'flour', 'quantity': 2, 'unit': 'kg'}])])
+    assert (stats['shops_added'], stats['shops_updated'], stats['inventories_kept']) == (0, 1, 0)
+    assert inventories(db) == {'Bakery': [('flour', 2.0, 'kg')], 'Dairy': [('milk', 1.0, 'l')]}
+
+
+def test_replace_mode_clears_a_shop_listed_without_lines(db, load):
+    load([BAKERY])
+    load([shop(BAKERY, [])])
+    assert inventories(db) == {'Bakery': []}
+
+
+def test_replace_mode_keeps_the_inventory_of_a_shop_with_rejected_lines(db, load):
+    load([BAKERY, DAIRY])
+    stats = load([
+        shop(BAKERY, [{'name': 'egg', 'quantity': 'x', 'unit': ''}, {'name': 'flour', 'quantity': -1, 'unit': 'kg'}]),
+        shop(DAIRY, [{'name': 'milk', 'quantity': None, 'unit': 'l'}, {'name': 'butter', 'quantity': 250, 'unit': 'g'}]),
+    ])
+    assert (stats['rejected_shops'], stats['rejected_lines'], stats['inventories_kept']) == (0, 3, 2)
+    # The accepted lines are merged into the stored ones
+    assert inventories(db) == {'Bakery': [('egg', 12.0, ''), ('flour', 1.0, 'kg')],
+                               'Dairy': [('butter', 250.0, 'g'), ('milk', 1.0, 'l')]}
+    assert 'Kept the stored inventory of 2 shops' in format_feed_stats(stats)
+
+
+def test_replace_mode_does_not_keep_anything_for_a_new_shop(db, load):
+    stats = load([shop(DAIRY, [{'name': 'milk', 'quantity': 'lots', 'unit': 'l'},
+                               {'name': 'cream', 'quantity': 1, 'unit': 'l'}])])
+    assert (stats['shops_added'], stats['rejected_lines'], stats['inventories_kept']) == (1, 1, 0)
+    assert inventories(db) == {'Dairy': [('cream', 1.0, 'l')]}
+
+
+def test_merge_mode_keeps_unlisted_lines_and_skips_rejected_ones(db, load):
+    load([BAKERY, DAIRY])
+    stats = load([shop(BAKERY, [{'name': 'flour', 'quantity': 5, 'unit': 'kg'},
+                                {'name': 'egg', 'quantity': float('nan'), 'unit': ''},
+                                {'name': '', 'quantity': 1, 'unit': 'g'},
+                                {'name': 'sugar', 'quantity': 500, 'unit': 'g'}])], mode='merge')
+    assert (stats['shops_updated'], stats['rejected_lines'], stats['inventories_kept']) == (1, 2, 0)
+    assert inventories(db) == {'Bakery': [('egg', 12.0, ''), ('flour', 5.0, 'kg'), ('sugar', 500.0, 'g')],
+                               'Dairy': [('milk', 1.0, 'l')]}
+
+
+@pytest.mark.parametrize('latitude, longitude', [(91, 0), (0, -180.5), ('north', 0), (None, 0), (float('inf'), 0)])
+def test_a_shop_with_bad_coordinates_is_rejected(db, load, latitude, longitude):
+    stats = load([{**BAKERY, 'latitude': latitude, 'longitude': longitude}, DAIRY])
+    assert (stats['shops_added'], stats['rejected_shops']) == (1, 1)
+    assert stats['rejects'][0]['where'] == 'line 1'
+    assert list(inventories(db)) == ['Dairy']
+
+
+@pytest.mark.parametrize('mode', ['replace', 'merge'])
+def test_rejected_shops_leave_the_stored_shop_alone(db, load, mode):
+    load([BAKERY])
+    stats = load([{**BAKERY, 'latitude': 'bad', 'inventory': []}, {'name': '', 'latitude': 0, 'longitude': 0}],
+                 mode=mode)
+    assert (stats['shops_updated'], stats['rejected_shops']) == (0, 2)
+    assert inventories(db) == {'Bakery': [('egg', 12.0, ''), ('flour', 1.0, 'kg')]}
+
+
+def test_repeats_of_a_shop_are_folded_into_one(db, load):
+    stats = load([BAKERY, shop(BAKERY, [{'name': 'sugar', 'quantity': 500, 'unit': 'g'}])])
+    assert (stats['shops_added'], stats['rejected_shops']) == (1, 0)
+    assert inventories(db) == {'Bakery': [('egg', 12.0, ''), ('flour', 1.0, 'kg'), ('sugar', 500.0, 'g')]}
+
+
+def test_a_name_used_by_two_shops_is_rejected(db, load):
+    stats = load([{**BAKERY, 'external_id': 'b-1'}, {**DAIRY, 'name': 'Bakery', 'external_id': 'b-2'}])
+    assert (stats['shops_added'], stats['rejected_shops']) == (1, 1)
+    assert inventories(db) == {'Bakery': [('egg', 12.0, ''), ('flour', 1.0, 'kg')]}
+
+
+def test_a_csv_feed_with_rejects(db, tmp_path):
+    path = tmp_path / 'feed.csv'
+    path.write_text('shop_name,latitude,longitude,ingredient,quantity,unit\n'
+                    'Bakery,51.5,-0.1,flour,1,kg\n'
+                    'Bakery,51.5,-0.1,egg,-2,\n'
+                    'Dairy,95,0,milk,1,l\n'
+                    'Deli,51.7,-0.3,,,\n', encoding='utf-8')
+    stats = db.import_shops(str(path))
+    assert (stats['shops_added'], stats['rejected_shops'], stats['rejected_lines']) == (2, 1, 1)
+    assert inventories(db) == {'Bakery': [('flour', 1.0, 'kg')], 'Deli': []}
+
+
+def test_unknown_mode_or_format(db, load, tmp_path):
+    with pytest.raises(ValueError):
+        load([BAKERY], mode='append')
+    with pytest.raises(ValueError):
+        db.import_shops(str(tmp_path / 'feed.json'), file_format='xml')
@@ -0,0 +1,85 @@
+import pytest
+from geographiclib.geodesic import Geodesic
+
+from recipe_mapper import spatial
+
+
+def in_boxes(boxes, latitude, longitude):
+    return any(min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+               for min_lat, max_lat, min_lon, max_lon in boxes)
+
+
+def points_on_circle(center, radius_km, count=72):
+    """Points exactly radius_km (geodesic, WGS84) from center, every 360/count degrees."""
+    for step in range(count):
+        point = Geodesic.WGS84.Direct(center[0], center[1], step * 360.0 / count, radius_km * 1000.0)
+        longitude = (point['lon2'] + 180.0) % 360.0 - 180.0
+        yield point['lat2'], longitude
+
+
+def test_box_around_an_ordinary_point():
+    boxes = spatial.bounding_boxes((51.5, -0.1), 10)
+    assert len(boxes) == 1
+    min_lat, max_lat, min_lon, max_lon = boxes[0]
+    assert min_lat < 51.5 < max_lat and min_lon < -0.1 < max_lon
+    # About 0.09 degrees of latitude, and more degrees of longitude this far north
+    assert max_lat - 51.5 == pytest.approx(0.0909, abs=0.001)
+    assert max_lon + 0.1 > max_lat - 51.5
+
+
+@pytest.mark.parametrize('center', [(89.9, 0.0), (-89.95, 10.0), (90.0, 45.0)])
+def test_circle_around_a_pole_covers_all_longitudes(center):
+    boxes = spatial.bounding_boxes(center, 50)
+    assert len(boxes) == 1
+    min_lat, max_lat, min_lon, max_lon = boxes[0]
+    assert (min_lon, max_lon) == (-180.0, 180.0)
+    assert -90.0 <= min_lat and max_lat <= 90.0
+    assert max_lat == 90.0 if center[0] > 0 else min_lat == -90.0
+
+
+@pytest.mark.parametrize('center', [(0.0, 179.95), (10.0, -179.95), (-60.0, 180.0), (0.0, -180.0)])
+def test_circle_across_the_antimeridian_is_split(center):
+    boxes = spatial.bounding_boxes(center, 20)
+    assert len(boxes) == 2
+    assert sorted((box[2] == -180.0, box[3] == 180.0) for box in boxes) == [(False, True), (True, False)]
+    for min_lat, max_lat, min_lon, max_lon in boxes:
+        assert -180.0 <= min_lon <= max_lon <= 180.0
+
+
+def test_circle_larger_than_the_earth_covers_everything():
+    assert spatial.bounding_boxes((12.0, 34.0), 25000) == [(-90.0, 90.0, -180.0, 180.0)]
+
+
+@pytest.mark.parametrize('center, radius_km', [
+    ((51.5, -0.1), 10), ((0.0, 0.0), 500), ((89.0, 0.0), 100), ((89.9, 120.0), 50),
+    ((-89.5, -60.0), 30), ((0.0, 179.95), 20), ((65.0, -179.9), 40), ((-33.9, 151.2), 2000),
+])
+def test_boxes_contain_the_whole_circle(center, radius_km):
+    boxes = spatial.bounding_boxes(center, radius_km)
+    for latitude, longitude in points_on_circle(center, radius_km):
+        assert in_boxes(boxes, latitude, longitude), (latitude, longitude)
+
+
+def test_candidate_shops_across_the_antimeridian(db):
+    east = db.add_shop('East', 0.0, 179.99, [])
+    west = db.add_shop('West', 0.0, -179.99, [])
+    db.add_shop('Far', 0.0, 170.0, [])
+    found = {shop[0] for shop in spatial.candidate_shops(db.conn_shops.cursor(), (0.0, 179.995), 5)}
+    assert found == {east, west}
+
+
+def test_candidate_shops_near_a_pole(db):
+    shop_ids = {db.add_shop(f'Shop {longitude}', 89.95, longitude, []) for longitude in (-170.0, 0.0, 90.0)}
+    db.add_shop('South', 88.0, 0.0, [])
+    found = {shop[0] for shop in spatial.candidate_shops(db.conn_shops.cursor(), (90.0, 0.0), 10)}
+    assert found == shop_ids
+
+
+def test_moving_a_shop_moves_its_grid_cell(db):
+    shop_id = db.add_shop('Mover', 10.0, 10.0, [])
+    db.update_shop(shop_id, 'Mover', -20.0, 30.0, [])
+    cursor = db.conn_shops.cursor()
+    assert cursor.execute('SELECT cell_lat, cell_lon FROM ShopGrid WHERE shop_id = ?', (shop_id,)).fetchall() == \
+        [spatial.cell_for(-20.0, 30.0)]
+    db.delete_shop(shop_id)
+    assert cursor.execute('SELECT COUNT(*) FROM ShopGrid').fetchone() == (0,)
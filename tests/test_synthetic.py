@@ -0,0 +1,50 @@
+import math
+
+from benchmarks.synthetic import CITIES, CITY_SPREAD_KM, SyntheticData
+from recipe_mapper import units
+from recipe_mapper.distance import haversine_km
+from recipe_mapper.ingredients import parse_ingredient
+
+
+def test_the_same_seed_gives_the_same_data():
+    first, second = SyntheticData(5, ingredient_count=300), SyntheticData(5, ingredient_count=300)
+    assert first.recipes(20) == second.recipes(20)
+    assert first.shops(10) == second.shops(10)
+    assert first.locations(10) == second.locations(10)
+    assert SyntheticData(6, ingredient_count=300).recipes(20) != first.recipes(20)
+
+
+def test_streams_do_not_shift_each_other():
+    data = SyntheticData(5, ingredient_count=300)
+    shops = data.shops(10)
+    data.recipes(50)
+    data.locations(50)
+    assert data.shops(10) == shops
+    assert data.shops(4) == shops[:4]
+    assert data.locations(3, stream='other') != data.locations(3)
+
+
+def test_recipe_and_shop_units_share_a_family():
+    data = SyntheticData(1, ingredient_count=300)
+    for recipe in data.recipes(30):
+        for line in recipe['ingredients']:
+            parsed = parse_ingredient(line)
+            assert units.unit_family(parsed['unit']) == data.families[parsed['name']]
+    for _, _, _, inventory in data.shops(5):
+        assert len({line['name'] for line in inventory}) == len(inventory)
+        for line in inventory:
+            assert units.unit_family(line['unit'] or None) == data.families[line['name']]
+
+
+def test_popular_ingredients_come_first_and_locations_stay_near_cities():
+    data = SyntheticData(2, ingredient_count=300)
+    counts = {}
+    for recipe in data.recipes(300):
+        for line in recipe['ingredients']:
+            name = parse_ingredient(line)['name']
+            counts[name] = counts.get(name, 0) + 1
+    assert counts.get(data.ingredients[0], 0) > counts.get(data.ingredients[-1], 0)
+    assert max(counts, key=counts.get) in data.ingredients[:5]
+    for latitude, longitude in data.locations(200):
+        assert min(float(haversine_km(latitude, longitude, city[0], city[1])) for city in CITIES) < \
+            6 * CITY_SPREAD_KM * math.sqrt(2)
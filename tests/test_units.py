@@ -0,0 +1,75 @@
+import pytest
+
+from recipe_mapper import units
+
+
+@pytest.mark.parametrize('quantity, unit, canonical, family', [
+    (500, 'g', 500.0, units.MASS),
+    (0.25, 'kg', 250.0, units.MASS),
+    (1, 'lb', 453.59237, units.MASS),
+    (2, 'cups', 473.176473, units.VOLUME),
+    (3, 'tsp', 14.78676478125, units.VOLUME),
+    (1, 'L', 1000.0, units.VOLUME),
+    (1, 'tbsp.', 14.78676478125, units.VOLUME),
+    (12, None, 12.0, units.COUNT),
+    (12, '', 12.0, units.COUNT),
+    (2, 'pieces', 2.0, units.COUNT),
+])
+def test_normalize(quantity, unit, canonical, family):
+    result = units.normalize(quantity, unit)
+    assert result[0] == pytest.approx(canonical)
+    assert result[1] == family
+
+
+def test_unknown_units_are_their_own_family_with_plurals_folded():
+    assert units.normalize(3, 'cloves') == (3, 'clove')
+    assert units.unit_family('clove') == units.unit_family('Cloves') == 'clove'
+    assert units.unit_family('pinches') == 'pinch'
+
+
+def test_missing_quantity_keeps_the_family():
+    assert units.normalize(None, 'g') == (None, units.MASS)
+
+
+def test_combine_keeps_a_shared_unit():
+    assert units.combine([(1, 'cup', 236.5882365), (2, 'cup', 473.176473)]) == (3, 'cup', pytest.approx(709.7647095))
+
+
+def test_combine_reports_mixed_units_in_the_base_unit():
+    assert units.combine([(1, 'kg', 1000.0), (500, 'g', 500.0)]) == (1500.0, 'g', 1500.0)
+    assert units.combine([(1, 'tbsp', 14.78676478125), (3, 'tsp', 14.78676478125)]) == \
+        (pytest.approx(29.5735295625), 'ml', pytest.approx(29.5735295625))
+
+
+def test_combine_skips_missing_quantities():
+    assert units.combine([(None, 'g', None), (100, 'g', 100.0)]) == (100.0, 'g', 100.0)
+    assert units.combine([(None, 'g', None), (None, 'g', None)]) == (None, 'g', None)
+
+
+def test_merge_lines_merges_per_key_and_family():
+    rows = [('flour', 200, 'g'), ('flour', 0.1, 'kg'), ('flour', 1, 'cup'), ('eggs', 2, None), ('eggs', 1, '')]
+    merged = {(key, family): (quantity, unit, canonical)
+              for key, quantity, unit, canonical, family in units.merge_lines(rows)}
+    assert merged == {
+        ('flour', units.MASS): (300.0, 'g', 300.0),
+        ('flour', units.VOLUME): (1, 'cup', 236.5882365),
+        ('eggs', units.COUNT): (3.0, '', 3.0),
+    }
+
+
+def test_merge_lines_keeps_first_seen_order():
+    rows = [('b', 1, 'g'), ('a', 1, 'g'), ('b', 1, 'ml')]
+    assert [(key, family) for key, *_, family in units.merge_lines(rows)] == \
+        [('b', units.MASS), ('a', units.MASS), ('b', units.VOLUME)]
+
+
+def test_satisfies():
+    assert units.satisfies(500.0, units.MASS, 250.0, units.MASS)
+    assert not units.satisfies(200.0, units.MASS, 250.0, units.MASS)
+    assert not units.satisfies(1000.0, units.VOLUME, 250.0, units.MASS)
+    # 3 tsp are exactly 1 tbsp despite the floating point conversion
+    assert units.satisfies(units.canonical_quantity(3, 'tsp'), units.VOLUME,
+                           units.canonical_quantity(1, 'tbsp'), units.VOLUME)
+    # "Salt to taste" only needs the family
+    assert units.satisfies(None, units.MASS, None, units.MASS)
+    assert not units.satisfies(None, units.MASS, 1.0, units.MASS)